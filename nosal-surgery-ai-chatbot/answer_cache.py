@@ -0,0 +1,247 @@
+"""
+Persistent answer cache for the Meko Clinic chatbot.
+
+Answers are keyed on (normalized query, language, retrieved context,
+conversation history before the question) and stored in SQLite so they
+survive restarts. Lookups try an exact key match first and then a
+near-duplicate match, comparing the query's TF-IDF vector from the semantic
+search index against cached queries that share the same language, history
+and index version. A reworded question often retrieves slightly different
+chunks, so the near-duplicate tier does not require the same context.
+
+Character n-grams see "Can I fly 2 days after surgery" and "... 20 days ..."
+as near-identical, as they do a question and its negation, so a near-duplicate
+only counts when both queries carry the same numbers and negation words and
+the query is long enough for the similarity to mean something.
+
+The cache only ever saves work: a SQLite error (a locked, full or corrupt
+database file) counts as a miss on lookup and skips the store, and is
+tallied in ``stats()`` instead of failing the answer.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "answer_cache.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    language TEXT NOT NULL,
+    context_hash TEXT NOT NULL,
+    history_hash TEXT,
+    index_version TEXT,
+    query TEXT NOT NULL,
+    query_vector TEXT,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_answers_last_access ON answers (last_access);
+"""
+
+
+# Negation words of the supported languages, matched as whole words
+NEGATION_WORDS = {
+    "no", "not", "never", "none", "nothing", "without", "cannot", "cant", "dont", "doesnt", "isnt", "arent",
+    "wont", "shouldnt", "wouldnt", "didnt", "nunca", "sin", "ni", "ne", "pas", "jamais", "sans", "aucun",
+    "nicht", "kein", "keine", "keinen", "nie", "ohne", "non", "mai", "senza", "não", "nao", "sem", "не", "нет",
+    "нельзя", "без", "değil", "yok", "hiç", "안", "못", "لا", "لم", "لن", "ليس", "بدون", "नहीं", "मत", "बिना",
+    "نہیں", "مت", "بغیر"
+}
+# Negation markers of languages written without spaces, matched anywhere in the query
+NEGATION_MARKERS = ("ไม่", "ห้าม", "อย่า", "ไม่ได้", "不", "没", "沒", "别", "別", "無", "无", "ない", "ません", "ず", "않")
+NUMBER_WORDS = {
+    "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten", "eleven", "twelve",
+    "fifteen", "twenty", "thirty", "forty", "fifty", "hundred", "thousand", "first", "second", "third", "half",
+    "once", "twice", "several"
+}
+
+# Near-duplicate matching is skipped for queries shorter than this (in characters, after normalization)
+MIN_NEAR_DUPLICATE_CHARS = 24
+
+
+def query_signature(normalized):
+    """Numbers and negation words of a normalized query, which a near-duplicate must share"""
+    words = [word.replace("’", "'") for word in re.findall(r"\w+(?:['’]\w+)*", normalized)]
+    numbers = re.findall(r"\d+(?:[.,]\d+)?", normalized) + [word for word in words if word in NUMBER_WORDS]
+    negations = {word for word in words if word in NEGATION_WORDS or word.endswith("n't")}
+    negations.update(marker for marker in NEGATION_MARKERS if marker in normalized)
+    return sorted(numbers), sorted(negations)
+
+
+def normalize_query(query):
+    """Casefold, collapse whitespace and drop trailing punctuation"""
+    return " ".join(query.casefold().split()).strip(" ?!.,;:。？！")
+
+
+def _hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _scope_hash(context, history):
+    """Hash of the retrieved context and the conversation history the answer was written for"""
+    return _hash(f"{context}\x00{history}" if history else context)
+
+
+class AnswerCache:
+    """SQLite-backed answer cache with TTL expiry and LRU eviction"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=7 * 24 * 3600, max_entries=5000,
+                 similarity_threshold=0.95, max_candidates=500):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.max_candidates = max_candidates
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        # Caches created before history_hash existed gain the column; their rows never match near-duplicates
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(answers)")}
+        if "history_hash" not in columns:
+            self._conn.execute("ALTER TABLE answers ADD COLUMN history_hash TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_history ON answers (language, history_hash)")
+        self._conn.commit()
+
+    def _vectorize(self, normalized, search_index):
+        """Sparse TF-IDF vector of the query as {column: weight}, using the search index vectorizer"""
+        if not search_index:
+            return None
+        try:
+            vector = search_index["vectorizer"].transform([normalized]).tocsr()
+        except Exception:
+            return None
+        if vector.nnz == 0:
+            return None
+        return dict(zip(vector.indices.tolist(), vector.data.tolist()))
+
+    def lookup(self, query, language, context, search_index=None, history=""):
+        """Return a cached response for the query, or None on a miss"""
+        try:
+            return self._lookup(query, language, context, search_index, history)
+        except sqlite3.Error:
+            with self._lock:
+                self.errors += 1
+                self.misses += 1
+            return None
+
+    def _lookup(self, query, language, context, search_index, history):
+        normalized = normalize_query(query)
+        context_hash = _scope_hash(context, history)
+        key = _hash(f"{language}\x00{context_hash}\x00{normalized}")
+        history_hash = _hash(history)
+        now = time.time()
+        expires_before = now - self.ttl_seconds
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM answers WHERE key = ? AND created_at >= ?",
+                (key, expires_before)
+            ).fetchone()
+            if row:
+                self._touch(key, now)
+                self.hits += 1
+                return row[0]
+
+            vector = None
+            if len(normalized) >= MIN_NEAR_DUPLICATE_CHARS:
+                vector = self._vectorize(normalized, search_index)
+            index_version = search_index.get("version") if search_index else None
+            if vector and index_version:
+                signature = query_signature(normalized)
+                candidates = self._conn.execute(
+                    "SELECT key, query, query_vector, response FROM answers "
+                    "WHERE language = ? AND history_hash = ? AND index_version = ? "
+                    "AND created_at >= ? AND query_vector IS NOT NULL "
+                    "ORDER BY last_access DESC LIMIT ?",
+                    (language, history_hash, index_version, expires_before, self.max_candidates)
+                ).fetchall()
+
+                best_key, best_response, best_score = None, None, 0.0
+                for candidate_key, candidate_query, candidate_vector, response in candidates:
+                    # A different number or negation changes the answer however similar the wording
+                    if query_signature(candidate_query) != signature:
+                        continue
+                    cached_vector = json.loads(candidate_vector)
+                    # Vectors are L2-normalized, so the dot product is the cosine similarity
+                    score = sum(weight * cached_vector.get(str(column), 0.0) for column, weight in vector.items())
+                    if score > best_score:
+                        best_key, best_response, best_score = candidate_key, response, score
+
+                if best_key and best_score >= self.similarity_threshold:
+                    self._touch(best_key, now)
+                    self.hits += 1
+                    self.near_hits += 1
+                    return best_response
+
+            self.misses += 1
+            return None
+
+    def store(self, query, language, context, response, search_index=None, history=""):
+        """Cache a response and evict expired and least recently used entries"""
+        try:
+            self._store(query, language, context, response, search_index, history)
+        except sqlite3.Error:
+            with self._lock:
+                self.errors += 1
+
+    def _store(self, query, language, context, response, search_index, history):
+        normalized = normalize_query(query)
+        context_hash = _scope_hash(context, history)
+        key = _hash(f"{language}\x00{context_hash}\x00{normalized}")
+        vector = self._vectorize(normalized, search_index)
+        index_version = search_index.get("version") if search_index else None
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers "
+                "(key, language, context_hash, history_hash, index_version, query, query_vector, response, "
+                "created_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, language, context_hash, _hash(history), index_version, normalized,
+                 json.dumps(vector) if vector else None, response, now, now)
+            )
+            self._conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM answers WHERE key IN ("
+                "SELECT key FROM answers ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def _touch(self, key, now):
+        self._conn.execute("UPDATE answers SET last_access = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+
+    def stats(self):
+        """Hit/miss counters for this process plus the number of stored entries"""
+        with self._lock:
+            try:
+                entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            except sqlite3.Error:
+                entries = 0
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "errors": self.errors,
+            "entries": entries
+        }
+
+    def clear(self):
+        """Remove every cached answer"""
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
@@ -1,30 +1,30 @@
 import streamlit as st
 import os
-from openai import OpenAI
-from bs4 import BeautifulSoup
-import html2text
-import re
-from langdetect import detect
-import tempfile
-import base64
 from audio_recorder_streamlit import audio_recorder
 from dotenv import load_dotenv
 import hashlib
 import json
 import time
 from datetime import datetime
-import pandas as pd
-from collections import defaultdict
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import pickle
-import requests
-from urllib.parse import urlparse, urljoin
+from clinic_content import get_fallback_content
+from clinic_data import LANGUAGES, QUICK_RESPONSES
+from engine import ChatEngine
+from engine_client import LocalEngineClient, RemoteEngineClient
+from memory_usage import format_bytes, object_bytes
+from session_records import ChatMessage, SessionAnalytics, cap_messages
+from openai_client import HealthCheck, create_client
+from speech import DEFAULT_PRERENDERED_DIR, load_prerendered_audio
+from streamlit.errors import StreamlitAPIException
 
 # Load environment variables
 load_dotenv()
 
+# Messages rendered per page of chat history, and how often the sidebar analytics refresh on their own.
+# Off by default: each refresh of an idle session calls engine.info() (an HTTP request with ENGINE_URL)
+# and walks the session state for its memory figure
+HISTORY_WINDOW = int(os.getenv("HISTORY_WINDOW", 6))
+ANALYTICS_REFRESH_SECONDS = int(os.getenv("ANALYTICS_REFRESH_SECONDS", 0)) or None
+
 # Page configuration
 st.set_page_config(
     page_title="Meko Clinic Rhinoplasty Chatbot",
@@ -33,128 +33,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Language mapping with voice support
-LANGUAGES = {
-    "English": {"code": "en", "native": "English", "voice": "alloy"},
-    "Spanish": {"code": "es", "native": "Español", "voice": "nova"},
-    "French": {"code": "fr", "native": "Français", "voice": "alloy"},
-    "German": {"code": "de", "native": "Deutsch", "voice": "echo"},
-    "Italian": {"code": "it", "native": "Italiano", "voice": "alloy"},
-    "Portuguese": {"code": "pt", "native": "Português", "voice": "nova"},
-    "Russian": {"code": "ru", "native": "Русский", "voice": "fable"},
-    "Chinese": {"code": "zh", "native": "中文", "voice": "shimmer"},
-    "Japanese": {"code": "ja", "native": "日本語", "voice": "shimmer"},
-    "Korean": {"code": "ko", "native": "한국어", "voice": "onyx"},
-    "Arabic": {"code": "ar", "native": "العربية", "voice": "onyx"},
-    "Hindi": {"code": "hi", "native": "हिंदी", "voice": "nova"},
-    "Urdu": {"code": "ur", "native": "اردو", "voice": "nova"},
-    "Turkish": {"code": "tr", "native": "Türkçe", "voice": "echo"},
-    "Thai": {"code": "th", "native": "ไทย", "voice": "alloy"}
-}
-
-# Language detection mapping
-LANG_DETECT_MAP = {
-    "en": "English", "es": "Spanish", "fr": "French", "de": "German",
-    "it": "Italian", "pt": "Portuguese", "ru": "Russian", "zh": "Chinese",
-    "zh-cn": "Chinese", "zh-tw": "Chinese", "ja": "Japanese", "ko": "Korean",
-    "ar": "Arabic", "hi": "Hindi", "ur": "Urdu", "tr": "Turkish", "th": "Thai"
-}
-
-# Quick response templates for common questions
-QUICK_RESPONSES = {
-    "pricing": {
-        "Thai": "💰 ราคาเสริมจมูกแบบ Open เริ่มต้นที่ 99,000 บาท\n\nรายละเอียดเพิ่มเติม:\n- ราคาขึ้นอยู่กับความซับซ้อนของเคส\n- รวมค่าแพทย์ ค่าห้องผ่าตัด และการดูแลหลังผ่าตัด\n- มีโปรโมชั่นและผ่อนชำระได้\n\nติดต่อสอบถามราคา: +66 2 272 0022",
-        "English": "💰 Open Rhinoplasty pricing starts at 99,000 THB\n\nDetails:\n- Price varies based on case complexity\n- Includes surgeon, operating room, and post-op care\n- Promotions and payment plans available\n\nContact for pricing: +66 2 272 0022"
-    },
-    "consultation": {
-        "Thai": "📋 การปรึกษาแพทย์\n\n✅ ปรึกษาฟรีผ่านออนไลน์\n✅ ประเมินใบหน้าดิจิทัล\n✅ วางแผนการผ่าตัด\n✅ คำแนะนำก่อนผ่าตัด\n\nนัดหมาย: +66 2 272 0022\nหรือ Facebook Messenger: @MEKOCLINIC",
-        "English": "📋 Consultation Process\n\n✅ Free online consultation\n✅ Digital facial assessment\n✅ Surgical planning\n✅ Pre-operative instructions\n\nBook appointment: +66 2 272 0022\nOr Facebook Messenger: @MEKOCLINIC"
-    },
-    "recovery": {
-        "Thai": "🩹 ระยะเวลาพักฟื้น\n\n• 1-2 สัปดาห์: แผลเริ่มหาย\n• 2-3 สัปดาห์: กลับไปทำงานได้\n• 6-12 เดือน: ผลลัพธ์เต็มที่\n\nการดูแลหลังผ่าตัด:\n- หลีกเลี่ยงการกระทบกระเทือน\n- ทำความสะอาดตามคำแนะนำ\n- มาพบแพทย์ตามนัด",
-        "English": "🩹 Recovery Timeline\n\n• 1-2 weeks: Initial healing\n• 2-3 weeks: Return to work\n• 6-12 months: Full results\n\nPost-op care:\n- Avoid trauma to nose\n- Follow cleaning instructions\n- Attend follow-up appointments"
-    },
-    "contact": {
-        "Thai": "📞 ติดต่อเมโกะคลินิก\n\n📱 เบอร์โทร: +66 2 272 0022\n💬 Facebook Messenger: @MEKOCLINIC\n📧 WhatsApp: +66 2 272 0022\n🌐 เว็บไซต์: mekoclinic.com\n\n📍 สาขา: กรุงเทพฯ, ประเทศไทย",
-        "English": "📞 Contact Meko Clinic\n\n📱 Phone: +66 2 272 0022\n💬 Facebook Messenger: @MEKOCLINIC\n📧 WhatsApp: +66 2 272 0022\n🌐 Website: mekoclinic.com\n\n📍 Location: Bangkok, Thailand"
-    }
-}
-
-# Related links and resources database
-RELATED_RESOURCES = {
-    "rhinoplasty": {
-        "videos": [
-            {
-                "title": "เสริมจมูก ครั้งแรกในชีวิตถึงกับร้องโอโหห ต้องที่ เมโกะคลินิก",
-                "url": "https://www.youtube.com/watch?v=example1",
-                "description": "รีวิวจากผู้ป่วยจริงที่ทำเสริมจมูกครั้งแรก"
-            },
-            {
-                "title": "คุณพลอย พลอยพรรณ เผยจมูกใหม่สวยเป๊ะ ที่เมโกะ คลินิก",
-                "url": "https://www.youtube.com/watch?v=example2",
-                "description": "ผลลัพธ์หลังเสริมจมูก Open technique"
-            },
-            {
-                "title": "เสริมจมูก Open ปรับเปลี่ยนโครงสร้างจมูกให้สโลปสวย",
-                "url": "https://www.youtube.com/watch?v=example3",
-                "description": "เทคนิคการเสริมจมูกแบบเปิด"
-            }
-        ],
-        "websites": [
-            {
-                "title": "Meko Clinic Official Website",
-                "url": "https://mekoclinic.com",
-                "description": "เว็บไซต์หลักของเมโกะคลินิก"
-            },
-            {
-                "title": "Rhinoplasty Information - Mayo Clinic",
-                "url": "https://www.mayoclinic.org/tests-procedures/rhinoplasty/about/pac-20384532",
-                "description": "ข้อมูลทางการแพทย์เกี่ยวกับการเสริมจมูก"
-            },
-            {
-                "title": "American Society of Plastic Surgeons - Rhinoplasty",
-                "url": "https://www.plasticsurgery.org/cosmetic-procedures/rhinoplasty",
-                "description": "ข้อมูลจากสมาคมศัลยกรรมพลาสติกอเมริกัน"
-            }
-        ]
-    },
-    "recovery": {
-        "videos": [
-            {
-                "title": "การดูแลหลังเสริมจมูก - 7 วันแรก",
-                "url": "https://www.youtube.com/watch?v=recovery1",
-                "description": "คำแนะนำการดูแลหลังผ่าตัด"
-            }
-        ],
-        "websites": [
-            {
-                "title": "Post-Operative Care Guide",
-                "url": "https://mekoclinic.com/recovery-guide",
-                "description": "คู่มือการดูแลหลังผ่าตัด"
-            }
-        ]
-    },
-    "consultation": {
-        "videos": [
-            {
-                "title": "ขั้นตอนการปรึกษาแพทย์ที่เมโกะคลินิก",
-                "url": "https://www.youtube.com/watch?v=consult1",
-                "description": "ขั้นตอนการนัดปรึกษาและประเมิน"
-            }
-        ],
-        "websites": [
-            {
-                "title": "Book Consultation - Meko Clinic",
-                "url": "https://mekoclinic.com/book-consultation",
-                "description": "จองนัดปรึกษาแพทย์ออนไลน์"
-            }
-        ]
-    }
-}
-
-# Initialize OpenAI client
-@st.cache_resource
-def init_openai_client():
+# Resolve the OpenAI API key without prompting
+def get_api_key():
     # Try multiple sources for API key
     api_key = None
     
@@ -176,7 +56,13 @@ def init_openai_client():
         except:
             pass
     
-    # 4. Show configuration help if no key found
+    return api_key
+
+# API key for the OpenAI clients, asking for one when none is configured
+def require_api_key():
+    api_key = get_api_key()
+    
+    # Show configuration help if no key found
     if not api_key:
         st.error("⚠️ OpenAI API Key not found!")
         st.markdown("""
@@ -213,11 +99,15 @@ def init_openai_client():
         st.error("❌ Invalid API key format. API key should start with 'sk-'")
         st.stop()
     
+    return api_key
+
+# Initialize OpenAI client lazily on first use, without a connection probe
+@st.cache_resource
+def init_openai_client():
+    api_key = require_api_key()
+    
     try:
-        client = OpenAI(api_key=api_key)
-        # Test the connection
-        client.models.list()
-        return client
+        return create_client(api_key)
     except Exception as e:
         st.error(f"❌ Failed to initialize OpenAI client: {str(e)}")
         st.markdown("""
@@ -230,647 +120,86 @@ def init_openai_client():
         """)
         st.stop()
 
-# Enhanced language detection
-def detect_language(text):
-    try:
-        text_lower = text.lower()
-        
-        # Check for native scripts
-        if re.search(r'[\u0600-\u06FF]', text):
-            urdu_words = ['یہ', 'کیا', 'ہے', 'اور', 'میں']
-            arabic_words = ['هذا', 'في', 'من', 'على']
-            urdu_count = sum(1 for word in urdu_words if word in text)
-            arabic_count = sum(1 for word in arabic_words if word in text)
-            return "Urdu" if urdu_count > arabic_count else "Arabic"
-        
-        if re.search(r'[\u0E00-\u0E7F]', text): return "Thai"
-        if re.search(r'[\u0900-\u097F]', text): return "Hindi"
-        if re.search(r'[\u4e00-\u9fff]', text): return "Chinese"
-        if re.search(r'[\u3040-\u309f\u30a0-\u30ff]', text): return "Japanese"
-        if re.search(r'[\uac00-\ud7af]', text): return "Korean"
-        if re.search(r'[\u0400-\u04FF]', text): return "Russian"
-        
-        # Check for Roman scripts
-        thai_patterns = [r'\b(chai|mai|krub|krab|arai|yang|ngai|sabai)\b']
-        urdu_patterns = [r'\b(kya|hai|yaar|kar|hona|lagta|hota|mera|tera)\b']
-        hindi_patterns = [r'\b(kya|hai|kar|hona|mera|tera|hamara|mata)\b']
-        
-        thai_score = sum(1 for p in thai_patterns if re.search(p, text_lower))
-        urdu_score = sum(1 for p in urdu_patterns if re.search(p, text_lower))
-        hindi_score = sum(1 for p in hindi_patterns if re.search(p, text_lower))
-        
-        if thai_score > 0: return "Thai"
-        if urdu_score > hindi_score: return "Urdu"
-        if hindi_score > 0: return "Hindi"
-        
-        # Use langdetect for other languages
-        detected = detect(text)
-        return LANG_DETECT_MAP.get(detected, "English")
-        
-    except:
-        return "English"
-
-# Extract links and videos from HTML content
-def extract_links_from_html(html_content):
-    """Extract video and website links from HTML content"""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    links = {
-        "videos": [],
-        "websites": []
-    }
-    
-    # Extract video links
-    video_elements = soup.find_all(['video', 'iframe'])
-    for video in video_elements:
-        src = video.get('src', '')
-        if src:
-            links["videos"].append({
-                "title": video.get('title', 'Video'),
-                "url": src,
-                "description": "Video content from clinic website"
-            })
-    
-    # Extract website links
-    website_links = soup.find_all('a', href=True)
-    for link in website_links:
-        href = link.get('href')
-        if href and not href.startswith('#'):
-            # Filter for relevant links
-            if any(keyword in href.lower() for keyword in ['rhinoplasty', 'nose', 'surgery', 'clinic', 'meko']):
-                links["websites"].append({
-                    "title": link.get_text(strip=True) or "Related Link",
-                    "url": href,
-                    "description": "Related information from clinic website"
-                })
-    
-    return links
+# Optional background connectivity check, reported in the sidebar
+@st.cache_resource
+def get_openai_health_check():
+    return HealthCheck(init_openai_client()).start()
 
-# Web search functionality using OpenAI's web search
-def search_web_for_resources(query, language="English"):
-    """Get related resources from predefined database instead of web search"""
-    try:
-        # Return predefined resources based on query keywords
-        query_lower = query.lower()
-        
-        # Define search keywords and their corresponding resources
-        search_keywords = {
-            "rhinoplasty": ["rhinoplasty", "nose surgery", "เสริมจมูก", "จมูก"],
-            "recovery": ["recovery", "healing", "post-op", "พักฟื้น", "หาย"],
-            "consultation": ["consultation", "appointment", "ปรึกษา", "นัด"],
-            "pricing": ["price", "cost", "ราคา", "ค่าใช้จ่าย"],
-            "contact": ["contact", "phone", "email", "ติดต่อ", "โทร"]
-        }
-        
-        # Find matching resources
-        matching_resources = []
-        for category, keywords in search_keywords.items():
-            if any(keyword in query_lower for keyword in keywords):
-                if category in RELATED_RESOURCES:
-                    resources = RELATED_RESOURCES[category]
-                    if "videos" in resources:
-                        matching_resources.extend(resources["videos"][:2])
-                    if "websites" in resources:
-                        matching_resources.extend(resources["websites"][:2])
-        
-        # If no specific matches, return general rhinoplasty resources
-        if not matching_resources and "rhinoplasty" in RELATED_RESOURCES:
-            resources = RELATED_RESOURCES["rhinoplasty"]
-            if "videos" in resources:
-                matching_resources.extend(resources["videos"][:2])
-            if "websites" in resources:
-                matching_resources.extend(resources["websites"][:2])
-        
-        return matching_resources
-        
-    except Exception as e:
-        st.error(f"Resource search error: {str(e)}")
-        return []
+# Quick response clips rendered ahead of time by `python cli.py prerender-audio`
+@st.cache_resource
+def get_prerendered_audio():
+    return load_prerendered_audio(os.getenv("PRERENDERED_AUDIO_DIR", DEFAULT_PRERENDERED_DIR))
 
-# Get related resources based on query
-def get_related_resources(user_query, language="English"):
-    """Get related video and website links based on user query"""
-    query_lower = user_query.lower()
-    
-    # Check predefined resources first
-    related_links = []
-    
-    for category, resources in RELATED_RESOURCES.items():
-        if category in query_lower or any(word in query_lower for word in ["rhinoplasty", "nose", "surgery", "เสริมจมูก", "จมูก", "ผ่าตัด"]):
-            if "videos" in resources:
-                related_links.extend(resources["videos"][:2])  # Limit to 2 videos
-            if "websites" in resources:
-                related_links.extend(resources["websites"][:2])  # Limit to 2 websites
+# Enhanced language detection, remembering the last detection of the session
+def detect_language(text):
+    last_detection = st.session_state.get("last_language_detection")
+    if last_detection and last_detection["text"] == text:
+        return last_detection["language"]
     
-    # If no predefined resources found, try the updated search function
-    if not related_links:
-        try:
-            search_results = search_web_for_resources(user_query, language)
-            if search_results:
-                related_links = search_results[:4]  # Limit to 4 results
-        except Exception as e:
-            # Silently handle any errors to prevent chatbot crashes
-            pass
+    try:
+        # Short replies with no language signal ("ok", "555") keep the conversation language
+        language = get_engine().detect_language(text, last_detection["language"] if last_detection else None)
+    except Exception:
+        language = "English"
     
-    return related_links
+    st.session_state.last_language_detection = {"text": text, "language": language}
+    return language
 
-# Format related resources for display
-def format_related_resources(links, language="English"):
-    """Format related resources for display in the response"""
-    if not links:
-        return ""
-    
-    if language == "Thai":
-        header = "\n\n📺 **วิดีโอและลิงก์ที่เกี่ยวข้อง:**\n"
-    else:
-        header = "\n\n📺 **Related Videos & Links:**\n"
-    
-    formatted_links = header
-    
-    for i, link in enumerate(links[:4], 1):  # Limit to 4 links
-        title = link.get("title", "Related Resource")
-        url = link.get("url", "#")
-        description = link.get("description", "")
-        
-        formatted_links += f"{i}. **{title}**\n"
-        formatted_links += f"   🔗 [{url}]({url})\n"
-        if description:
-            formatted_links += f"   📝 {description}\n"
-        formatted_links += "\n"
+# Chat engine: in-process by default, or the HTTP service (service.py) at ENGINE_URL
+@st.cache_resource
+def get_engine():
+    engine_url = os.getenv("ENGINE_URL")
+    if engine_url:
+        return RemoteEngineClient(engine_url)
     
-    return formatted_links
+    # The engine creates its OpenAI clients on first request, keeping openai out of startup
+    return LocalEngineClient(ChatEngine.from_env(api_key=require_api_key()))
 
 # Enhanced content processing with structured data extraction
-@st.cache_data
-def load_and_process_html_content():
+def show_content_status():
     try:
-        # Try multiple possible paths for the HTML file
-        possible_paths = [
-            "meko_clinic_rhinoplasty.html",
-            "./meko_clinic_rhinoplasty.html",
-            os.path.join(os.getcwd(), "meko_clinic_rhinoplasty.html"),
-            os.path.join(os.path.dirname(__file__), "meko_clinic_rhinoplasty.html")
-        ]
-        
-        html_content = None
-        used_path = None
-        
-        for path in possible_paths:
-            try:
-                if os.path.exists(path):
-                    with open(path, "r", encoding="utf-8") as file:
-                        html_content = file.read()
-                        used_path = path
-                        break
-            except Exception as e:
-                continue
-        
-        if not html_content:
-            # Try to find the file in the current directory
-            try:
-                current_dir = os.getcwd()
-                files = os.listdir(current_dir)
-                html_files = [f for f in files if f.endswith('.html')]
-                
-                if html_files:
-                    # Use the first HTML file found
-                    html_file_path = os.path.join(current_dir, html_files[0])
-                    with open(html_file_path, "r", encoding="utf-8") as file:
-                        html_content = file.read()
-                        used_path = html_file_path
-                        st.info(f"📄 Found HTML file: {html_files[0]}")
-            except Exception as e:
-                pass
+        engine_info = get_engine().info()
         
-        if not html_content:
+        if engine_info["fallback"]:
             st.warning("⚠️ HTML file 'meko_clinic_rhinoplasty.html' not found. Using fallback content.")
             st.info("💡 This might be due to deployment environment differences. The app will still work with fallback content.")
-            return get_fallback_content(), {}
-        
-        # Log which path was used (for debugging)
-        if used_path:
-            st.success(f"✅ Successfully loaded HTML content from: {used_path}")
-        
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Remove unwanted elements
-        for script in soup(["script", "style", "nav", "footer", "header"]):
-            script.decompose()
-        
-        # Extract structured data
-        structured_data = {
-            "procedures": [],
-            "pricing": [],
-            "contact": [],
-            "reviews": [],
-            "gallery": [],
-            "videos": [],
-            "doctors": [],
-            "locations": []
-        }
-        
-        # Extract text content
-        h = html2text.HTML2Text()
-        h.ignore_links = True
-        h.ignore_images = True
-        h.body_width = 0
-        text_content = h.handle(str(soup))
-        
-        # Clean up the text
-        text_content = re.sub(r'\n\s*\n', '\n\n', text_content)
-        text_content = re.sub(r'\s+', ' ', text_content)
-        
-        # Extract specific information patterns
-        # Pricing
-        price_patterns = [
-            r'(\d{2,3}(?:,\d{3})*)\s*บาท',
-            r'เริ่มเพียง\s*(\d{2,3}(?:,\d{3})*)\s*บาท',
-            r'ราคา\s*(\d{2,3}(?:,\d{3})*)\s*บาท'
-        ]
-        for pattern in price_patterns:
-            matches = re.findall(pattern, text_content)
-            structured_data["pricing"].extend(matches)
-        
-        # Contact information
-        contact_patterns = [
-            r'\+66\s*2\s*272\s*0022',
-            r'@MEKOCLINIC',
-            r'mekoclinic\.com'
-        ]
-        for pattern in contact_patterns:
-            matches = re.findall(pattern, text_content)
-            structured_data["contact"].extend(matches)
-        
-        # Procedures
-        procedure_keywords = [
-            "เสริมจมูกแบบเปิด", "Open Rhinoplasty", "เสริมจมูก", "nose surgery",
-            "ตะไบจมูก", "ปรับโครงสร้าง", "แก้จมูก", "revision rhinoplasty"
-        ]
-        for keyword in procedure_keywords:
-            if keyword in text_content:
-                structured_data["procedures"].append(keyword)
-        
-        # Extract links from HTML
-        extracted_links = extract_links_from_html(html_content)
-        structured_data["videos"] = extracted_links["videos"]
-        structured_data["websites"] = extracted_links["websites"]
-        
-        return text_content, structured_data
+        else:
+            # Log which pages were used (for debugging)
+            pages = ", ".join(engine_info["pages"][:3])
+            if len(engine_info["pages"]) > 3:
+                pages += f" and {len(engine_info['pages']) - 3} more"
+            st.success(f"✅ Successfully loaded clinic content from: {pages}")
         
     except Exception as e:
         st.error(f"Error loading HTML content: {str(e)}")
         st.info("💡 Using fallback content. The app will still function normally.")
-        return get_fallback_content(), {}
-
-# Fallback content when HTML file is not available
-def get_fallback_content():
-    return """
-    MEKO CLINIC - RHINOPLASTY SPECIALISTS
-    
-    About Us:
-    Meko Clinic is a leading medical facility specializing in rhinoplasty (nose surgery) procedures. 
-    We provide comprehensive cosmetic and reconstructive nose surgery services.
-    
-    Our Services:
-    - Primary Rhinoplasty
-    - Revision Rhinoplasty 
-    - Ethnic Rhinoplasty
-    - Functional Rhinoplasty
-    - Non-surgical Nose Jobs
-    - Consultation Services
-    
-    Why Choose Meko Clinic:
-    - Expert surgeons with years of experience
-    - State-of-the-art facilities
-    - Personalized treatment plans
-    - Comprehensive aftercare support
-    - Natural-looking results
-    
-    Procedure Information:
-    Rhinoplasty can address various concerns including:
-    - Nose size and shape
-    - Nostril size and shape
-    - Nasal tip refinement
-    - Bridge adjustments
-    - Breathing improvements
-    
-    Recovery Process:
-    - Initial healing: 1-2 weeks
-    - Return to normal activities: 2-3 weeks
-    - Full results visible: 6-12 months
-    
-    Consultation Process:
-    - Initial assessment
-    - Digital imaging
-    - Surgical planning
-    - Pre-operative instructions
-    - Follow-up care
-    
-    Contact Information:
-    For consultations and appointments, please contact Meko Clinic directly.
-    We offer both in-person and virtual consultations.
-    """
-
-# Smart query classification
-def classify_query(user_message, clinic_content):
-    """Classify if the query is clinic-related or general"""
-    clinic_keywords = [
-        "rhinoplasty", "nose surgery", "nose job", "เสริมจมูก", "จมูก", "surgery",
-        "clinic", "doctor", "procedure", "recovery", "consultation", "price",
-        "cost", "appointment", "meko", "เมโกะ", "ผ่าตัด", "ศัลยกรรม"
-    ]
-    
-    user_lower = user_message.lower()
-    clinic_score = sum(1 for keyword in clinic_keywords if keyword in user_lower)
-    
-    # Check if query contains clinic-specific content
-    clinic_content_lower = clinic_content.lower()
-    content_matches = sum(1 for keyword in clinic_keywords if keyword in clinic_content_lower)
-    
-    # If query has clinic keywords or matches clinic content, it's clinic-related
-    if clinic_score > 0 or content_matches > 0:
-        return "clinic_related"
-    else:
-        return "general"
-
-# Enhanced semantic search
-@st.cache_data
-def create_semantic_search_index(clinic_content):
-    """Create a semantic search index for better content retrieval"""
-    try:
-        # Split content into chunks
-        chunks = re.split(r'\n\n+', clinic_content)
-        chunks = [chunk.strip() for chunk in chunks if len(chunk.strip()) > 50]
-        
-        # Create TF-IDF vectorizer
-        vectorizer = TfidfVectorizer(
-            stop_words='english',
-            ngram_range=(1, 2),
-            max_features=1000
-        )
-        
-        # Fit and transform
-        tfidf_matrix = vectorizer.fit_transform(chunks)
-        
-        return {
-            'vectorizer': vectorizer,
-            'tfidf_matrix': tfidf_matrix,
-            'chunks': chunks
-        }
-    except Exception as e:
-        st.error(f"Error creating search index: {str(e)}")
-        return None
-
-def semantic_search(query, search_index, top_k=3):
-    """Perform semantic search on clinic content"""
-    if not search_index:
-        return []
-    
-    try:
-        # Transform query
-        query_vector = search_index['vectorizer'].transform([query])
-        
-        # Calculate similarities
-        similarities = cosine_similarity(query_vector, search_index['tfidf_matrix'])
-        
-        # Get top matches
-        top_indices = similarities[0].argsort()[-top_k:][::-1]
-        
-        results = []
-        for idx in top_indices:
-            if similarities[0][idx] > 0.1:  # Minimum similarity threshold
-                results.append({
-                    'content': search_index['chunks'][idx],
-                    'similarity': similarities[0][idx]
-                })
-        
-        return results
-    except Exception as e:
-        st.error(f"Error in semantic search: {str(e)}")
-        return []
 
-# Token counting function
-def count_tokens(text):
-    """Rough token count estimation (1 token ≈ 4 characters)"""
-    return len(text) // 4
-
-# Smart content selection based on user query with better token management
-def select_relevant_content(user_message, clinic_content, search_index=None, max_tokens=1500):
-    """Select the most relevant content based on user query with strict token limits"""
-    
-    # First try semantic search if available
-    if search_index:
-        semantic_results = semantic_search(user_message, search_index, top_k=1)  # Reduced to 1 result
-        if semantic_results:
-            selected_content = semantic_results[0]['content']
-            if count_tokens(selected_content) <= max_tokens:
-                return selected_content
-    
-    # Fallback to keyword-based selection
-    keywords_map = {
-        "procedure": ["procedure", "surgery", "operation", "rhinoplasty", "nose job", "plastic surgery", "เสริมจมูก", "ผ่าตัด"],
-        "recovery": ["recovery", "healing", "aftercare", "post-op", "swelling", "bruising", "rest", "พักฟื้น", "หาย"],
-        "cost": ["cost", "price", "fee", "payment", "insurance", "financing", "expensive", "ราคา", "ค่าใช้จ่าย"],
-        "consultation": ["consultation", "appointment", "visit", "meet", "doctor", "surgeon", "ปรึกษา", "นัดหมาย"],
-        "types": ["types", "kinds", "different", "options", "primary", "revision", "ethnic", "แบบ", "ประเภท"],
-        "results": ["results", "outcome", "before", "after", "expect", "appearance", "look", "ผลลัพธ์", "ผลงาน"]
-    }
-    
-    user_lower = user_message.lower()
-    
-    # Split content into sections
-    sections = clinic_content.split('\n\n')
-    scored_sections = []
-    
-    for section in sections:
-        if len(section.strip()) < 50:  # Skip very short sections
-            continue
-            
-        section_lower = section.lower()
-        score = 0
-        
-        # Score based on keyword matches
-        for category, keywords in keywords_map.items():
-            for keyword in keywords:
-                if keyword in user_lower:
-                    score += section_lower.count(keyword) * 2
-                score += section_lower.count(keyword)
-        
-        # Boost score for sections with general medical terms
-        medical_terms = ["rhinoplasty", "nose", "surgery", "procedure", "clinic", "doctor", "patient", "จมูก", "เมโกะ"]
-        for term in medical_terms:
-            score += section_lower.count(term)
-        
-        scored_sections.append((score, section))
-    
-    # Sort by relevance and select top sections with strict token limit
-    scored_sections.sort(key=lambda x: x[0], reverse=True)
-    
-    selected_content = ""
-    current_tokens = 0
-    
-    for score, section in scored_sections:
-        section_tokens = count_tokens(section)
-        if current_tokens + section_tokens <= max_tokens:
-            selected_content += section + "\n\n"
-            current_tokens += section_tokens
-        else:
-            # If we can't fit the full section, try to fit a portion
-            if current_tokens < max_tokens * 0.8:  # Leave some buffer
-                words = section.split()
-                partial_section = ""
-                for word in words:
-                    test_section = partial_section + " " + word if partial_section else word
-                    if count_tokens(test_section) <= max_tokens - current_tokens:
-                        partial_section = test_section
-                    else:
-                        break
-                if partial_section:
-                    selected_content += partial_section + "\n\n"
-            break
-    
-    return selected_content.strip() if selected_content else clinic_content[:max_tokens*3]  # Reduced multiplier
-
-# Enhanced response generation with smart context management and related resources
-def generate_response(user_message, detected_language, clinic_content, search_index=None, conversation_history=None):
+# Content, cache and memory figures of the shared engine (content and index live there once per process)
+def load_engine_info():
     try:
-        client = init_openai_client()
-        
-        # Classify query
-        query_type = classify_query(user_message, clinic_content)
-        
-        # Check for quick response templates
-        user_lower = user_message.lower()
-        for key, responses in QUICK_RESPONSES.items():
-            if key in user_lower or any(word in user_lower for word in ["ราคา", "price", "cost", "ปรึกษา", "consult", "ติดต่อ", "contact", "พักฟื้น", "recovery"]):
-                if detected_language in responses:
-                    base_response = responses[detected_language]
-                    # Add related resources to quick responses
-                    related_links = get_related_resources(user_message, detected_language)
-                    if related_links:
-                        base_response += format_related_resources(related_links, detected_language)
-                    return base_response
-        
-        lang_info = LANGUAGES.get(detected_language, LANGUAGES["English"])
-        native_name = lang_info["native"]
-        
-        # Select relevant content with reduced token limit
-        relevant_content = select_relevant_content(user_message, clinic_content, search_index, max_tokens=1000)
-        
-        # Build conversation context with strict limits
-        context = ""
-        if conversation_history and len(conversation_history) > 0:
-            # Only use last 2 messages to save tokens
-            recent_messages = conversation_history[-2:]
-            context_parts = []
-            for msg in recent_messages:
-                # Truncate long messages
-                content = msg['content'][:200] if len(msg['content']) > 200 else msg['content']
-                context_parts.append(f"{msg['role']}: {content}")
-            context = "\n".join(context_parts)
-        
-        # Get related resources
-        related_links = get_related_resources(user_message, detected_language)
-        
-        # Create system prompt based on query type with reduced content
-        if query_type == "clinic_related":
-            system_prompt = f"""You are a medical assistant for Meko Clinic specializing in rhinoplasty.
-
-LANGUAGE: Respond in {detected_language} ({native_name} script)
-
-ROLE: Provide expert information about rhinoplasty procedures, recovery, consultations, and clinic services.
+        return get_engine().info()
+    except Exception:
+        return {"content_chars": len(get_fallback_content()), "pages": [], "fallback": True}
 
-CLINIC INFO:
-{relevant_content}
+# Approximate memory held by this session: its conversation, analytics and widget state
+def session_memory_bytes():
+    return object_bytes({key: st.session_state[key] for key in st.session_state})
 
-CONVERSATION CONTEXT:
-{context}
-
-GUIDELINES:
-- Be professional, empathetic, and detailed
-- Use the provided clinic information as primary source
-- Recommend consulting doctors for medical advice
-- Include specific details about procedures, timelines, and care
-- Maintain medical confidentiality and ethics
-- If information is not in clinic data, clearly state it's general information"""
-        else:
-            system_prompt = f"""You are a helpful AI assistant.
-
-LANGUAGE: Respond in {detected_language} ({native_name} script)
-
-ROLE: Provide helpful information on general topics.
-
-GUIDELINES:
-- Be informative and helpful
-- Provide accurate information
-- Be conversational and friendly
-- If medical advice is requested, recommend consulting healthcare professionals"""
-
-        # Calculate remaining tokens for response with strict limits
-        system_tokens = count_tokens(system_prompt)
-        user_tokens = count_tokens(user_message)
-        max_response_tokens = min(800, 7000 - system_tokens - user_tokens - 500)  # Reduced limits
-        
-        # Ensure we don't exceed token limits
-        if max_response_tokens < 100:
-            max_response_tokens = 100
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.7,
-            max_tokens=max_response_tokens,
-            top_p=0.9,
-            frequency_penalty=0.1,
-            presence_penalty=0.1
-        )
-        
-        base_response = response.choices[0].message.content
-        
-        # Add related resources to the response if not already included (with token check)
-        if related_links and "📺" not in base_response and "Related" not in base_response:
-            resources_text = format_related_resources(related_links, detected_language)
-            if count_tokens(base_response + resources_text) < 1500:  # Check total response length
-                base_response += resources_text
-        
-        return base_response
-        
-    except Exception as e:
-        error_messages = {
-            "Thai": f"❌ เกิดข้อผิดพลาดในการประมวลผล: {str(e)}",
-            "Urdu": f"❌ جواب بناتے وقت خرابی: {str(e)}",
-            "Arabic": f"❌ خطأ في معالجة الطلب: {str(e)}",
-            "Hindi": f"❌ उत्तर बनाने में त्रुटि: {str(e)}",
-            "Spanish": f"❌ Error al procesar la solicitud: {str(e)}",
-            "French": f"❌ Erreur lors du traitement: {str(e)}",
-            "German": f"❌ Fehler bei der Verarbeitung: {str(e)}",
-            "Chinese": f"❌ 处理请求时出错: {str(e)}",
-            "Japanese": f"❌ 処理エラー: {str(e)}"
-        }
-        return error_messages.get(detected_language, f"❌ Error generating response: {str(e)}")
+# Pass a response stream through while recording time to first token
+def track_first_token(stream, analytics):
+    start_time = time.time()
+    first = True
+    for delta in stream:
+        if first:
+            analytics.first_token_times.add(time.time() - start_time)
+            first = False
+        yield delta
 
 # Enhanced transcription with better error handling
-def transcribe_audio(audio_bytes):
+def transcribe_audio(audio_bytes, language=None):
+    """Return (transcription, stage timings), or (None, {}) after showing the error"""
     try:
-        client = init_openai_client()
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
-            tmp_file.write(audio_bytes)
-            tmp_file_path = tmp_file.name
-        
-        with open(tmp_file_path, "rb") as audio_file:
-            transcription = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                response_format="text",
-                language=None,
-                temperature=0.2
-            )
-        
-        os.unlink(tmp_file_path)
-        return transcription.strip()
+        return get_engine().transcribe(audio_bytes, language)
     except Exception as e:
         # Handle short audio error gracefully
         error_str = str(e)
@@ -878,138 +207,248 @@ def transcribe_audio(audio_bytes):
             st.warning("⚠️ Audio too short. Please record a longer message (at least 0.5 seconds). Try again!")
         else:
             st.error(f"❌ Transcription error: {error_str}")
-        return None
-
-# Enhanced speech generation with better quality
-def generate_speech(text, language):
+        return None, {}
+
+# Page-level player that plays the speech segments rendered by st.audio back to back. The script is
+# static: segments reach the page as media URLs on hidden players in a "speech-<id>" container, not
+# inlined in it, and it lives in the page (not in a component iframe that is removed on the next
+# rerun), so playback continues across reruns
+SPEECH_PLAYER_SCRIPT = """
+(function (page) {
+    if (page.mekoSpeech) return;
+    page.eval(`window.mekoSpeech = {
+        group: null,
+        queue: [],
+        audio: null,
+        seen: new WeakMap(),
+        reset(group) { if (this.audio) this.audio.pause(); this.group = group; this.queue = []; this.audio = null; },
+        push(src) { this.queue.push(src); if (!this.audio) this.next(); },
+        next() {
+            const src = this.queue.shift();
+            this.audio = src ? new Audio(src) : null;
+            if (this.audio) {
+                this.audio.onended = () => this.next();
+                this.audio.play().catch(() => this.next());
+            }
+        },
+        scan() {
+            for (const player of document.querySelectorAll('[class*="st-key-speech-"] audio[src]')) {
+                if (this.seen.get(player) === player.src) continue;
+                this.seen.set(player, player.src);
+                const group = [...player.closest('[class*="st-key-speech-"]').classList]
+                    .find((name) => name.startsWith('st-key-speech-'));
+                if (group !== this.group) this.reset(group);
+                this.push(player.src);
+            }
+        }
+    };
+    new MutationObserver(() => window.mekoSpeech.scan())
+        .observe(document.body, {childList: true, subtree: true, attributes: true, attributeFilter: ['src']});
+    window.mekoSpeech.scan();`);
+})(window.frameElement ? window.parent : window);
+"""
+SPEECH_SEGMENTS_STYLE = '<style>[class*="st-key-speech-"] { display: none; }</style>'
+
+# Run the player script in the page: st.html where it allows JavaScript, else a zero-height component
+def run_page_script(script):
     try:
-        client = init_openai_client()
-        voice = LANGUAGES.get(language, LANGUAGES["English"])["voice"]
-        
-        # Truncate text if too long, but try to cut at sentence boundaries
-        max_length = 2000
-        if len(text) > max_length:
-            truncated = text[:max_length]
-            last_sentence = truncated.rfind('.')
-            if last_sentence > max_length * 0.8:
-                text = truncated[:last_sentence + 1]
-            else:
-                text = truncated + "..."
-        
-        response = client.audio.speech.create(
-            model="tts-1-hd",
-            voice=voice,
-            input=text,
-            speed=0.9
-        )
-        return response.content
+        st.html(f"<script>{script}</script>", unsafe_allow_javascript=True)
+    except TypeError:
+        import streamlit.components.v1 as components
+        components.html(f"<script>{script}</script>", height=0)
+
+# Pipelined speech: each segment is served as soon as it is synthesized and queued on the page's
+# player, the whole clip stays for replays
+def play_speech(text, language):
+    st.html(SPEECH_SEGMENTS_STYLE)
+    run_page_script(SPEECH_PLAYER_SCRIPT)
+    segment_players = st.container(key=f"speech-{time.time_ns()}")
+    segments = []
+    try:
+        with st.spinner("🎵 Generating high-quality audio..."):
+            for segment in get_engine().speak_stream(text, language):
+                segment_players.audio(segment, format="audio/mp3")
+                segments.append(segment)
     except Exception as e:
         st.error(f"❌ Speech generation error: {str(e)}")
-        return None
-
-# Create audio player with better styling
-def create_audio_player(audio_content):
-    audio_base64 = base64.b64encode(audio_content).decode()
-    return f"""
-    <div style="margin: 10px 0;">
-        <audio controls style="width: 100%; max-width: 400px;">
-            <source src="data:audio/mp3;base64,{audio_base64}" type="audio/mp3">
-            Your browser does not support the audio element.
-        </audio>
-    </div>
-    """
+        return
+    
+    st.audio(b"".join(segments), format="audio/mp3")
 
 # Export conversation
 def export_conversation(messages, format="json"):
     if format == "json":
-        return json.dumps(messages, indent=2, ensure_ascii=False)
+        return json.dumps([msg.as_dict() for msg in messages], indent=2, ensure_ascii=False)
     elif format == "txt":
         text = "Meko Clinic Chatbot Conversation\n"
         text += "=" * 40 + "\n\n"
         for msg in messages:
-            text += f"{msg['role'].upper()}: {msg['content']}\n\n"
+            text += f"{msg.role.upper()}: {msg.content}\n\n"
         return text
     elif format == "csv":
-        df = pd.DataFrame(messages)
+        import pandas as pd
+        df = pd.DataFrame([msg.as_dict() for msg in messages])
         return df.to_csv(index=False)
 
-# Function to manage conversation history and prevent token overflow
-def manage_conversation_history(messages, max_messages=10):
-    """Keep conversation history manageable to prevent token overflow"""
-    if len(messages) > max_messages:
-        # Keep the first message (greeting) and the last max_messages-1 messages
-        return [messages[0]] + messages[-(max_messages-1):]
-    return messages
-
 # Initialize session state
 if "messages" not in st.session_state:
     st.session_state.messages = []
-if "clinic_content" not in st.session_state:
-    st.session_state.clinic_content, st.session_state.structured_data = load_and_process_html_content()
+if "content_status_shown" not in st.session_state:
+    show_content_status()
+    st.session_state.content_status_shown = True
 if "voice_enabled" not in st.session_state:
     st.session_state.voice_enabled = True
 if "last_audio_hash" not in st.session_state:
     st.session_state.last_audio_hash = None
-if "conversation_context" not in st.session_state:
-    st.session_state.conversation_context = []
-if "search_index" not in st.session_state:
-    st.session_state.search_index = create_semantic_search_index(st.session_state.clinic_content)
 if "analytics" not in st.session_state:
-    st.session_state.analytics = {
-        "total_queries": 0,
-        "clinic_queries": 0,
-        "general_queries": 0,
-        "voice_queries": 0,
-        "text_queries": 0,
-        "languages_used": defaultdict(int),
-        "response_times": []
-    }
+    st.session_state.analytics = SessionAnalytics()
+if "history_shown" not in st.session_state:
+    st.session_state.history_shown = HISTORY_WINDOW
 
-# Manage conversation history to prevent token overflow
-st.session_state.messages = manage_conversation_history(st.session_state.messages)
+# Add a message, capping the history (MAX_SESSION_MESSAGES) so long-lived sessions stay bounded
+def add_message(message):
+    st.session_state.messages = cap_messages(st.session_state.messages + [message])
 
-# Enhanced sidebar with more options
-with st.sidebar:
+# Language chosen in the sidebar, read by the chat fragment on its own reruns
+def language_override():
+    return st.session_state.get("language_override", "Auto-detect")
+
+# Redraw only the chat after a turn; a turn submitted during a full run reruns the app
+def rerun_chat():
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+# Analytics panel, refreshed on its own every ANALYTICS_REFRESH_SECONDS when set
+@st.fragment(run_every=ANALYTICS_REFRESH_SECONDS)
+def render_analytics():
+    engine_info = load_engine_info()
+    analytics = st.session_state.analytics
+    if analytics.total_queries > 0:
+        st.markdown("### 📊 Analytics")
+        st.metric("Total Queries", analytics.total_queries)
+        st.metric("Clinic Queries", analytics.clinic_queries)
+        st.metric("Voice Queries", analytics.voice_queries)
+        
+        # Percentiles over the last ANALYTICS_WINDOW queries
+        if len(analytics.response_times):
+            latency = analytics.response_times.summary()
+            st.metric("Median Response Time", f"{latency['p50']:.1f}s",
+                      help=f"p95 {latency['p95']:.1f}s, p99 {latency['p99']:.1f}s "
+                           f"over the last {len(analytics.response_times)} queries")
+        
+        if len(analytics.first_token_times):
+            first_token = analytics.first_token_times.summary()
+            st.metric("Median Time to First Token", f"{first_token['p50']:.1f}s",
+                      help=f"p95 {first_token['p95']:.1f}s, p99 {first_token['p99']:.1f}s")
+        
+        if analytics.stage_times:
+            with st.expander("⏱️ Pipeline Stages"):
+                for stage, durations in analytics.stage_times.items():
+                    stage_latency = durations.summary()
+                    st.write(f"**{stage}:** {stage_latency['p50'] * 1000:.0f} ms p50, "
+                             f"{stage_latency['p95'] * 1000:.0f} ms p95 ({durations.count} runs)")
+        
+        languages_used = analytics.languages_used()
+        if languages_used:
+            st.markdown("**Languages:** " + ", ".join(f"{language} ({count})" for language, count in languages_used.items()))
+        
+        cache_stats = engine_info.get("answer_cache")
+        if cache_stats and cache_stats["hits"] + cache_stats["misses"] > 0:
+            st.metric(
+                "Answer Cache Hit Ratio",
+                f"{cache_stats['hit_ratio']:.0%}",
+                help=f"{cache_stats['hits']} hits ({cache_stats['near_hits']} near-duplicate), "
+                     f"{cache_stats['misses']} misses, {cache_stats['entries']} cached answers"
+            )
+    
+    # Conversation stats
+    if st.session_state.messages:
+        total_messages = len(st.session_state.messages)
+        user_messages = len([m for m in st.session_state.messages if m.role == "user"])
+        st.markdown(f"**Messages:** {total_messages} ({user_messages} from you)")
+    
+    # Memory report: shared content and index are held once per process, sessions only hold conversations
+    memory = engine_info.get("memory")
+    if memory:
+        with st.expander("🧠 Memory"):
+            shared = {
+                "Clinic content": memory["clinic_content"],
+                "Keyword table": memory["term_table"],
+                "Search index": memory["search_index"],
+                "Embeddings": memory["embeddings"]
+            }
+            for component, num_bytes in shared.items():
+                if num_bytes is not None:
+                    st.write(f"**{component}:** {format_bytes(num_bytes)} (shared)")
+            st.write(f"**This session:** {format_bytes(session_memory_bytes())}")
+            process_label = "Engine process" if os.getenv("ENGINE_URL") else "Process"
+            st.metric(process_label, format_bytes(memory["process"]))
+
+# Enhanced sidebar with more options; its widgets rerun only the sidebar
+@st.fragment
+def render_sidebar():
     st.title("🏥 Meko Clinic")
     st.markdown("### Advanced Rhinoplasty Chatbot")
     
     # Display content status
-    content_length = len(st.session_state.clinic_content)
+    content_length = load_engine_info()["content_chars"]
     st.info(f"📄 Clinic content loaded: {content_length:,} characters")
     
-    # Quick actions
+    # Quick actions add to the conversation, so they rerun the whole app
     st.markdown("### ⚡ Quick Actions")
+    quick_action = None
     col1, col2 = st.columns(2)
     
     with col1:
         if st.button("💰 Pricing", help="Get pricing information"):
-            st.session_state.quick_action = "pricing"
+            quick_action = "pricing"
     
     with col2:
         if st.button("📋 Consultation", help="Book consultation"):
-            st.session_state.quick_action = "consultation"
+            quick_action = "consultation"
     
     col3, col4 = st.columns(2)
     with col3:
         if st.button("🩹 Recovery", help="Recovery information"):
-            st.session_state.quick_action = "recovery"
+            quick_action = "recovery"
     
     with col4:
         if st.button("📞 Contact", help="Contact information"):
-            st.session_state.quick_action = "contact"
+            quick_action = "contact"
+    
+    if quick_action:
+        st.session_state.quick_action = quick_action
+        st.rerun()
     
-    # Voice settings
+    # Voice settings change the input area, so they rerun the whole app
     voice_enabled = st.toggle("🎙️ Enable Voice Features", value=st.session_state.voice_enabled)
-    st.session_state.voice_enabled = voice_enabled
+    if voice_enabled != st.session_state.voice_enabled:
+        st.session_state.voice_enabled = voice_enabled
+        st.rerun()
     
     # Language selection
-    selected_language = st.selectbox(
+    st.selectbox(
         "🌐 Language Override",
         options=["Auto-detect"] + list(LANGUAGES.keys()),
         index=0,
+        key="language_override",
         help="Select a specific language or use auto-detection"
     )
     
+    # API connectivity (checked in the background, never blocks a request)
+    if os.getenv("ENGINE_URL"):
+        st.info(f"🔗 Chat engine: {os.getenv('ENGINE_URL')}")
+    elif os.getenv("OPENAI_HEALTH_CHECK", "1") == "1" and get_api_key():
+        health = get_openai_health_check()
+        if health.status == "ok":
+            st.success(f"🟢 OpenAI API reachable ({health.latency * 1000:.0f} ms)")
+        elif health.status == "error":
+            st.error(f"🔴 OpenAI API unreachable: {health.error}")
+        else:
+            st.info("⏳ Checking OpenAI API connectivity...")
+    
     # Model settings
     st.markdown("### ⚙️ AI Model Settings")
     st.info("Using GPT-4 for high-quality responses")
@@ -1033,25 +472,11 @@ with st.sidebar:
     if st.button("🗑️ Clear Chat History"):
         st.session_state.messages = []
         st.session_state.last_audio_hash = None
-        st.session_state.conversation_context = []
+        st.session_state.history_shown = HISTORY_WINDOW
         st.rerun()
     
     # Analytics
-    if st.session_state.analytics["total_queries"] > 0:
-        st.markdown("### 📊 Analytics")
-        st.metric("Total Queries", st.session_state.analytics["total_queries"])
-        st.metric("Clinic Queries", st.session_state.analytics["clinic_queries"])
-        st.metric("Voice Queries", st.session_state.analytics["voice_queries"])
-        
-        if st.session_state.analytics["response_times"]:
-            avg_time = np.mean(st.session_state.analytics["response_times"])
-            st.metric("Avg Response Time", f"{avg_time:.1f}s")
-    
-    # Conversation stats
-    if st.session_state.messages:
-        total_messages = len(st.session_state.messages)
-        user_messages = len([m for m in st.session_state.messages if m["role"] == "user"])
-        st.markdown(f"**Messages:** {total_messages} ({user_messages} from you)")
+    render_analytics()
     
     # Supported languages
     st.markdown("### 🌍 Supported Languages")
@@ -1061,7 +486,7 @@ with st.sidebar:
     **Features:** Voice input/output, native script support, cultural context awareness
     """)
     
-
+    
     # Tips
     st.markdown("### 💡 Tips for Better Results")
     st.markdown("""
@@ -1073,248 +498,177 @@ with st.sidebar:
     - Use quick action buttons for common questions
     """)
 
-# Main interface with enhanced styling
-st.title("💬 Meko Clinic Rhinoplasty Assistant")
-st.markdown("*Ask me anything about rhinoplasty procedures, recovery, consultations, and our services*")
-
-# Handle quick actions
-if hasattr(st.session_state, 'quick_action') and st.session_state.quick_action:
-    action = st.session_state.quick_action
-    detected_lang = selected_language if selected_language != "Auto-detect" else "English"
-    
-    if action in QUICK_RESPONSES and detected_lang in QUICK_RESPONSES[action]:
-        response = QUICK_RESPONSES[action][detected_lang]
-        
-        # Add to conversation
-        st.session_state.messages.append({
-            "role": "user",
-            "content": f"Quick action: {action}",
-            "detected_language": detected_lang,
-            "input_type": "quick_action"
-        })
-        
-        st.session_state.messages.append({
-            "role": "assistant",
-            "content": response,
-            "language": detected_lang,
-            "has_audio": True
-        })
-        
-        # Update analytics
-        st.session_state.analytics["total_queries"] += 1
-        st.session_state.analytics["clinic_queries"] += 1
+# One history message, with playback for assistant replies
+def render_message(i, msg):
+    if msg.role == "user":
+        lang = msg.language or 'Unknown'
+        input_type = msg.input_type or 'text'
+        icon = "🎤" if input_type == "voice" else "💬" if input_type == "text" else "⚡"
         
-        del st.session_state.quick_action
-        st.rerun()
+        with st.chat_message("user"):
+            st.markdown(f"**{icon} ({lang}):** {msg.content}")
+    else:
+        with st.chat_message("assistant"):
+            st.markdown(msg.content)
+            
+            # Enhanced voice playback for assistant messages
+            if st.session_state.voice_enabled and msg.audio_path and os.path.exists(msg.audio_path):
+                # Prerendered quick response audio plays without a TTS round trip
+                st.audio(msg.audio_path, format="audio/mp3")
+                st.caption(f"Language: {msg.language or 'Unknown'}")
+            elif st.session_state.voice_enabled and msg.language and msg.has_audio:
+                col1, col2 = st.columns([1, 4])
+                
+                with col1:
+                    if st.button(f"🔊 Play", key=f"play_{i}", help="Generate and play audio response"):
+                        play_speech(msg.content, msg.language)
+                
+                with col2:
+                    st.caption(f"Language: {msg.language or 'Unknown'}")
 
-# Enhanced chat history display with auto-scroll
-if st.session_state.messages:
+# Chat history, windowed to the last HISTORY_WINDOW messages with older ones loaded on demand
+def render_history():
+    messages = st.session_state.messages
+    if not messages:
+        return
+    
     st.markdown("### 💬 Conversation History")
+    start = max(0, len(messages) - st.session_state.history_shown)
+    if start > 0:
+        if st.button(f"⬆️ Show earlier messages ({start} more)", key="show_earlier"):
+            st.session_state.history_shown += HISTORY_WINDOW
+            rerun_chat()
     
-    # Create a container for chat messages
-    chat_container = st.container()
+    for i in range(start, len(messages)):
+        render_message(i, messages[i])
     
-    with chat_container:
-        for i, msg in enumerate(st.session_state.messages):
-            if msg["role"] == "user":
-                lang = msg.get('detected_language', 'Unknown')
-                input_type = msg.get('input_type', 'text')
-                icon = "🎤" if input_type == "voice" else "💬" if input_type == "text" else "⚡"
-                
-                with st.chat_message("user"):
-                    st.markdown(f"**{icon} ({lang}):** {msg['content']}")
-            else:
-                with st.chat_message("assistant"):
-                    st.markdown(msg['content'])
-                    
-                    # Enhanced voice playback for assistant messages
-                    if st.session_state.voice_enabled and msg.get('language') and msg.get('has_audio'):
-                        col1, col2 = st.columns([1, 4])
-                        
-                        with col1:
-                            if st.button(f"🔊 Play", key=f"play_{i}", help="Generate and play audio response"):
-                                with st.spinner("🎵 Generating high-quality audio..."):
-                                    speech_bytes = generate_speech(msg['content'], msg['language'])
-                                    if speech_bytes:
-                                        st.markdown(create_audio_player(speech_bytes), unsafe_allow_html=True)
-                                    else:
-                                        st.error("❌ Failed to generate audio")
-                        
-                        with col2:
-                            st.caption(f"Language: {msg.get('language', 'Unknown')}")
-
-# Auto-scroll to bottom when new messages are added
-if st.session_state.messages:
     # Add a spacer to push content to bottom
     st.markdown("<div style='height: 100px;'></div>", unsafe_allow_html=True)
-    
-    # Add auto-scroll JavaScript
-    st.markdown("""
-    <script>
-        // Function to scroll to bottom
-        function scrollToBottom() {
-            window.scrollTo({
-                top: document.body.scrollHeight,
-                behavior: 'smooth'
-            });
-        }
-        
-        // Scroll to bottom when page loads
-        window.addEventListener('load', scrollToBottom);
-        
-        // Scroll to bottom when new content is added
-        const observer = new MutationObserver(function(mutations) {
-            mutations.forEach(function(mutation) {
-                if (mutation.type === 'childList') {
-                    setTimeout(scrollToBottom, 100);
-                }
-            });
-        });
-        
-        observer.observe(document.body, {
-            childList: true,
-            subtree: true
-        });
-        
-        // Also scroll when Streamlit reruns
-        if (window.parent !== window) {
-            window.parent.postMessage({
-                type: 'streamlit:setComponentValue',
-                value: 'scroll'
-            }, '*');
-        }
-    </script>
-    """, unsafe_allow_html=True)
-
-# Input section at the bottom
-st.markdown("---")
-st.markdown("### 💬 Ask Your Question")
-
-# Voice input section (moved to bottom)
-if st.session_state.voice_enabled:
-    st.markdown("#### 🎙️ Voice Input")
-    col1, col2 = st.columns([3, 1])
-    
-    with col1:
-        audio_bytes = audio_recorder(
-            text="🎤 Click to record your question",
-            recording_color="#e74c3c",
-            neutral_color="#3498db",
-            key="voice_input"
-        )
-    
-    with col2:
-        if audio_bytes:
-            st.success("✅ Audio recorded")
-    
-    # Process audio with better handling
-    if audio_bytes:
-        audio_hash = hashlib.md5(audio_bytes).hexdigest()
-        
-        if audio_hash != st.session_state.last_audio_hash:
-            st.session_state.last_audio_hash = audio_hash
-            
-            with st.spinner("🎧 Transcribing your voice..."):
-                transcription = transcribe_audio(audio_bytes)
-            
-            if transcription:
-                st.success(f"🎤 **Transcribed:** {transcription}")
-                
-                # Process voice input
-                detected_language = selected_language if selected_language != "Auto-detect" else detect_language(transcription)
-                
-                # Add user message
-                st.session_state.messages.append({
-                    "role": "user",
-                    "content": transcription,
-                    "detected_language": detected_language,
-                    "input_type": "voice"
-                })
-                
-                # Update analytics
-                st.session_state.analytics["total_queries"] += 1
-                st.session_state.analytics["voice_queries"] += 1
-                st.session_state.analytics["languages_used"][detected_language] += 1
-                
-                # Generate response
-                start_time = time.time()
-                with st.spinner("🤖 Generating detailed response..."):
-                    reply = generate_response(
-                        transcription, 
-                        detected_language, 
-                        st.session_state.clinic_content,
-                        st.session_state.search_index,
-                        st.session_state.messages
-                    )
-                
-                response_time = time.time() - start_time
-                st.session_state.analytics["response_times"].append(response_time)
-                
-                # Classify query for analytics
-                query_type = classify_query(transcription, st.session_state.clinic_content)
-                if query_type == "clinic_related":
-                    st.session_state.analytics["clinic_queries"] += 1
-                else:
-                    st.session_state.analytics["general_queries"] += 1
-                
-                # Add assistant message
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": reply,
-                    "language": detected_language,
-                    "has_audio": True
-                })
-                
-                st.rerun()
 
-# Text input section (at the very bottom)
-st.markdown("#### 💬 Text Input")
-if prompt := st.chat_input("💭 Ask about rhinoplasty procedures, recovery, costs, or consultations..."):
-    detected_language = selected_language if selected_language != "Auto-detect" else detect_language(prompt)
-    
-    # Add user message
-    st.session_state.messages.append({
-        "role": "user",
-        "content": prompt,
-        "detected_language": detected_language,
-        "input_type": "text"
-    })
+# Stream the assistant reply to a user turn and record it
+def answer(message, detected_language, input_type, stage_timings=None):
+    add_message(ChatMessage("user", message, language=detected_language, input_type=input_type))
     
     # Update analytics
-    st.session_state.analytics["total_queries"] += 1
-    st.session_state.analytics["text_queries"] += 1
-    st.session_state.analytics["languages_used"][detected_language] += 1
+    analytics = st.session_state.analytics
+    analytics.total_queries += 1
+    if input_type == "voice":
+        analytics.voice_queries += 1
+    else:
+        analytics.text_queries += 1
+    analytics.record_language(detected_language)
     
-    # Generate response
+    # Stream response
     start_time = time.time()
-    with st.spinner("🤖 Generating comprehensive response..."):
-        reply = generate_response(
-            prompt, 
-            detected_language, 
-            st.session_state.clinic_content,
-            st.session_state.search_index,
-            st.session_state.messages
-        )
+    chat_reply = get_engine().chat(message, detected_language, st.session_state.messages)
+    with st.chat_message("assistant"):
+        reply = st.write_stream(track_first_token(chat_reply, analytics))
     
     response_time = time.time() - start_time
-    st.session_state.analytics["response_times"].append(response_time)
+    analytics.response_times.add(response_time)
+    analytics.record_stage_times({**(stage_timings or {}), **chat_reply.timings})
     
     # Classify query for analytics
-    query_type = classify_query(prompt, st.session_state.clinic_content)
-    if query_type == "clinic_related":
-        st.session_state.analytics["clinic_queries"] += 1
+    if chat_reply.query_type == "clinic_related":
+        analytics.clinic_queries += 1
     else:
-        st.session_state.analytics["general_queries"] += 1
+        analytics.general_queries += 1
     
     # Add assistant message
-    st.session_state.messages.append({
-        "role": "assistant",
-        "content": reply,
-        "language": detected_language,
-        "has_audio": True
-    })
+    add_message(ChatMessage("assistant", reply, language=detected_language, has_audio=True))
+
+# Chat area: history and input rerun together, without the sidebar
+@st.fragment
+def render_chat():
+    render_history()
+    
+    # Input section at the bottom
+    st.markdown("---")
+    st.markdown("### 💬 Ask Your Question")
+    
+    selected_language = language_override()
+    
+    # Voice input section (moved to bottom)
+    if st.session_state.voice_enabled:
+        st.markdown("#### 🎙️ Voice Input")
+        col1, col2 = st.columns([3, 1])
+        
+        with col1:
+            audio_bytes = audio_recorder(
+                text="🎤 Click to record your question",
+                recording_color="#e74c3c",
+                neutral_color="#3498db",
+                key="voice_input"
+            )
+        
+        with col2:
+            if audio_bytes:
+                st.success("✅ Audio recorded")
+        
+        # Process audio with better handling
+        if audio_bytes:
+            audio_hash = hashlib.md5(audio_bytes).hexdigest()
+            
+            if audio_hash != st.session_state.last_audio_hash:
+                st.session_state.last_audio_hash = audio_hash
+                
+                with st.spinner("🎧 Transcribing your voice..."):
+                    transcription, transcription_timings = transcribe_audio(
+                        audio_bytes, selected_language if selected_language != "Auto-detect" else None
+                    )
+                
+                if transcription:
+                    st.success(f"🎤 **Transcribed:** {transcription}")
+                    
+                    # Process voice input
+                    detected_language = selected_language if selected_language != "Auto-detect" else detect_language(transcription)
+                    answer(transcription, detected_language, "voice", transcription_timings)
+                    rerun_chat()
     
-    st.rerun()
+    # Text input section (at the very bottom)
+    st.markdown("#### 💬 Text Input")
+    if prompt := st.chat_input("💭 Ask about rhinoplasty procedures, recovery, costs, or consultations..."):
+        detected_language = selected_language if selected_language != "Auto-detect" else detect_language(prompt)
+        
+        with st.chat_message("user"):
+            st.markdown(f"**💬 ({detected_language}):** {prompt}")
+        
+        answer(prompt, detected_language, "text")
+        rerun_chat()
+
+# Handle quick actions before drawing, so the sidebar and chat both include them
+if st.session_state.get("quick_action"):
+    action = st.session_state.quick_action
+    selected_language = language_override()
+    detected_lang = selected_language if selected_language != "Auto-detect" else "English"
+    
+    if action in QUICK_RESPONSES and detected_lang in QUICK_RESPONSES[action]:
+        response = QUICK_RESPONSES[action][detected_lang]
+        
+        # Add to conversation
+        add_message(ChatMessage(
+            "user", f"Quick action: {action}", language=detected_lang, input_type="quick_action"
+        ))
+        
+        add_message(ChatMessage(
+            "assistant", response, language=detected_lang, has_audio=True,
+            audio_path=get_prerendered_audio().get((action, detected_lang))
+        ))
+        
+        # Update analytics
+        st.session_state.analytics.total_queries += 1
+        st.session_state.analytics.clinic_queries += 1
+    
+    del st.session_state.quick_action
+
+with st.sidebar:
+    render_sidebar()
+
+# Main interface with enhanced styling
+st.title("💬 Meko Clinic Rhinoplasty Assistant")
+st.markdown("*Ask me anything about rhinoplasty procedures, recovery, consultations, and our services*")
+
+render_chat()
 
 # Footer with additional information
 st.markdown("---")
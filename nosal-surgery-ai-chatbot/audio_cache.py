@@ -0,0 +1,82 @@
+"""
+Content-addressed cache for synthesized speech.
+
+Each clip is stored on local disk under the SHA-256 of the text, voice, speed
+and TTS model that produced it, so identical Play requests never reach the
+TTS API twice. The directory is capped in size; when it grows past the cap
+the least recently used clips (by modification time, refreshed on every hit)
+are deleted.
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+DEFAULT_AUDIO_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "audio_cache")
+AUDIO_EXTENSION = ".mp3"
+
+
+def speech_cache_key(text, voice, speed, model):
+    """Hash identifying a synthesized clip"""
+    payload = "\x00".join([model, voice, f"{speed:.2f}", text])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """Size-capped on-disk audio cache with LRU eviction"""
+
+    def __init__(self, cache_dir=DEFAULT_AUDIO_CACHE_DIR, max_bytes=200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key + AUDIO_EXTENSION)
+
+    def get(self, key):
+        """Return the cached clip's path, or None if it has not been synthesized"""
+        path = self.path_for(key)
+        try:
+            now = time.time()
+            os.utime(path, (now, now))  # Mark as recently used
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key, audio_bytes):
+        """Store a clip and return its path, evicting old clips beyond the size cap"""
+        path = self.path_for(key)
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp_path, "wb") as f:
+            f.write(audio_bytes)
+        os.replace(tmp_path, path)
+        self._evict(keep=path)
+        return path
+
+    def _evict(self, keep=None):
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if not entry.name.endswith(AUDIO_EXTENSION):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
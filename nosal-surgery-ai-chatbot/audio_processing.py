@@ -0,0 +1,207 @@
+"""
+Audio preprocessing for the Meko Clinic chatbot's transcription uploads.
+
+The browser recorder produces uncompressed WAV at its own sample rate, often
+with a second or two of silence before and after the question. Whisper works
+at 16 kHz mono, so everything above that is upload time on the clinic's
+uplink and nothing else. ``prepare_for_transcription`` trims the leading and
+trailing silence, downmixes to mono, resamples to 16 kHz and re-encodes the
+recording in memory, as FLAC when ``soundfile`` is installed and as 16-bit
+WAV otherwise. Recordings it cannot parse (MP3, M4A, Ogg and the like from
+other channels) are uploaded unchanged, named after the format sniffed from
+their header or given by the upload's Content-Type, since Whisper rejects a
+file whose extension does not match its contents.
+
+Long recordings are also split into segments of at most
+``TRANSCRIPTION_SEGMENT_SECONDS``, each cut at the quietest pause in the
+second half of its window, so the engine can transcribe them concurrently
+and no upload comes near the API's 25 MB limit.
+"""
+
+import io
+import math
+import os
+import wave
+
+import numpy as np
+
+TARGET_SAMPLE_RATE = 16000
+TRANSCRIPTION_AUDIO_FORMAT = os.getenv("TRANSCRIPTION_AUDIO_FORMAT", "flac")
+
+# Frames quieter than this (relative to full scale, and to the loudest frame) count as silence
+SILENCE_FRAME_SECONDS = 0.02
+SILENCE_FLOOR = 10 ** (-50 / 20)
+SILENCE_RELATIVE = 10 ** (-35 / 20)
+SILENCE_PADDING_SECONDS = 0.25
+
+# Whisper rejects recordings shorter than 0.1 s
+MIN_SPEECH_SECONDS = 0.1
+
+# Longest segment sent in one transcription request, and the pause length looked for when splitting
+TRANSCRIPTION_SEGMENT_SECONDS = float(os.getenv("TRANSCRIPTION_SEGMENT_SECONDS", 20))
+PAUSE_SECONDS = 0.2
+
+# File extensions Whisper accepts, by the upload's Content-Type
+CONTENT_TYPE_EXTENSIONS = {
+    "audio/wav": "wav", "audio/x-wav": "wav", "audio/wave": "wav", "audio/vnd.wave": "wav",
+    "audio/mpeg": "mp3", "audio/mp3": "mp3", "audio/mpga": "mpga",
+    "audio/mp4": "m4a", "audio/m4a": "m4a", "audio/x-m4a": "m4a", "video/mp4": "mp4",
+    "audio/ogg": "ogg", "application/ogg": "ogg", "audio/flac": "flac", "audio/x-flac": "flac",
+    "audio/webm": "webm", "video/webm": "webm"
+}
+
+
+def read_wav(audio_bytes):
+    """(samples as float32 frames x channels in [-1, 1], sample rate) of a PCM WAV recording"""
+    with wave.open(io.BytesIO(audio_bytes), "rb") as wav:
+        channels = wav.getnchannels()
+        sample_width = wav.getsampwidth()
+        sample_rate = wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+
+    if sample_width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768
+    elif sample_width == 3:
+        # Sign-extend each little-endian 24-bit sample into an int32
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = ((raw[:, 0] | raw[:, 1] << 8 | raw[:, 2] << 16) << 8 >> 8).astype(np.float32) / 8388608
+    elif sample_width == 4:
+        samples = np.frombuffer(frames, dtype="<i4").astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {sample_width} bytes")
+    return samples[:len(samples) - len(samples) % channels].reshape(-1, channels), sample_rate
+
+
+def audio_extension(audio_bytes, content_type=None):
+    """File extension of a recording, sniffed from its header, else from its Content-Type, else "wav\""""
+    header = audio_bytes[:12]
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return "wav"
+    # ID3 tag, or an MPEG audio frame sync with a layer set (ADTS AAC has none)
+    if header[:3] == b"ID3" or (len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0
+                                and header[1] & 0x06):
+        return "mp3"
+    if header[:4] == b"OggS":
+        return "ogg"
+    if header[:4] == b"fLaC":
+        return "flac"
+    if header[4:8] == b"ftyp":
+        return "m4a" if header[8:11] == b"M4A" else "mp4"
+    if header[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return CONTENT_TYPE_EXTENSIONS.get(media_type, "wav")
+
+
+def _frame_rms(samples, frame_length):
+    num_frames = len(samples) // frame_length
+    return np.sqrt(np.mean(samples[:num_frames * frame_length].reshape(num_frames, frame_length) ** 2, axis=1))
+
+
+def trim_silence(samples, sample_rate):
+    """Mono samples without leading and trailing silence, keeping a little padding around the speech"""
+    frame_length = max(1, int(sample_rate * SILENCE_FRAME_SECONDS))
+    frame_rms = _frame_rms(samples, frame_length)
+    if not len(frame_rms):
+        return samples
+
+    voiced = np.flatnonzero(frame_rms > max(SILENCE_FLOOR, frame_rms.max() * SILENCE_RELATIVE))
+    if not len(voiced):
+        return samples[:0]
+
+    padding = int(sample_rate * SILENCE_PADDING_SECONDS)
+    start = max(0, voiced[0] * frame_length - padding)
+    end = min(len(samples), (voiced[-1] + 1) * frame_length + padding)
+    return samples[start:end]
+
+
+def split_at_pauses(samples, sample_rate, max_seconds=TRANSCRIPTION_SEGMENT_SECONDS):
+    """Consecutive pieces of mono samples of at most max_seconds, each ending in the quietest pause available
+
+    The recording is divided into as few pieces of similar length as
+    max_seconds allows, and each cut goes where the loudness, averaged over
+    ``PAUSE_SECONDS``, is lowest within a quarter of a piece of its even
+    position, so words are not cut in half.
+    """
+    max_length = int(sample_rate * max_seconds)
+    if len(samples) <= max_length:
+        return [samples]
+
+    frame_length = max(1, int(sample_rate * SILENCE_FRAME_SECONDS))
+    window = max(1, int(PAUSE_SECONDS / SILENCE_FRAME_SECONDS))
+    loudness = np.convolve(_frame_rms(samples, frame_length), np.ones(window) / window, mode="same")
+
+    pieces = []
+    start = 0
+    while len(samples) - start > max_length:
+        piece_length = (len(samples) - start) / math.ceil((len(samples) - start) / max_length)
+        first_frame = int(start + piece_length * 0.75) // frame_length
+        last_frame = int(start + min(piece_length * 1.25, max_length)) // frame_length
+        cut = (first_frame + int(np.argmin(loudness[first_frame:last_frame]))) * frame_length + frame_length // 2
+        pieces.append(samples[start:cut])
+        start = cut
+    pieces.append(samples[start:])
+    return pieces
+
+
+def resample(samples, sample_rate, target_rate=TARGET_SAMPLE_RATE):
+    """Mono samples at target_rate, with polyphase anti-alias filtering"""
+    if sample_rate == target_rate or not len(samples):
+        return samples
+    from scipy.signal import resample_poly
+
+    divisor = math.gcd(sample_rate, target_rate)
+    return resample_poly(samples, target_rate // divisor, sample_rate // divisor).astype(np.float32)
+
+
+def encode_wav(samples, sample_rate):
+    """16-bit mono PCM WAV bytes"""
+    pcm = (np.clip(samples, -1, 1) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def encode(samples, sample_rate, audio_format=TRANSCRIPTION_AUDIO_FORMAT):
+    """(filename, bytes) of mono samples in audio_format, falling back to WAV without soundfile"""
+    if audio_format in ("flac", "ogg"):
+        try:
+            import soundfile
+        except ImportError:
+            soundfile = None
+        if soundfile is not None:
+            buffer = io.BytesIO()
+            soundfile.write(buffer, samples, sample_rate, format=audio_format.upper(),
+                            subtype="PCM_16" if audio_format == "flac" else "VORBIS")
+            return f"audio.{audio_format}", buffer.getvalue()
+    return "audio.wav", encode_wav(samples, sample_rate)
+
+
+def prepare_for_transcription(audio_bytes, audio_format=TRANSCRIPTION_AUDIO_FORMAT,
+                              segment_seconds=TRANSCRIPTION_SEGMENT_SECONDS, content_type=None):
+    """(filename, bytes) segments to upload for a recording, in order: trimmed, mono, 16 kHz and re-encoded
+
+    ``content_type`` names the format of an upload whose header is not
+    recognized; a recording that is not PCM WAV is uploaded unchanged.
+
+    Raises ``ValueError`` mentioning ``audio_too_short`` when no speech is left
+    after trimming, the same condition Whisper itself reports that way.
+    """
+    try:
+        samples, sample_rate = read_wav(audio_bytes)
+    except (wave.Error, EOFError, ValueError):
+        # Not a PCM WAV (another channel's upload): sent as is, under its own format's extension
+        return [(f"audio.{audio_extension(audio_bytes, content_type)}", audio_bytes)]
+
+    speech = trim_silence(samples.mean(axis=1), sample_rate)
+    if len(speech) < sample_rate * MIN_SPEECH_SECONDS:
+        raise ValueError("No speech detected in the recording (audio_too_short)")
+    speech = resample(speech, sample_rate)
+    return [encode(piece, TARGET_SAMPLE_RATE, audio_format)
+            for piece in split_at_pauses(speech, TARGET_SAMPLE_RATE, segment_seconds)]
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Answer cache check for the Meko Clinic chatbot
+
+Drives ``LocalEngineClient.chat`` in the app's call order (the user's turn
+is appended to the session's messages before the reply is requested) against
+a simulated chat completions endpoint, with a fresh answer cache and clinic
+artifacts in a temporary directory. Each question opens a new conversation,
+or follows up in one with the same earlier turns, and must hit or miss the
+cache as expected: repeats differing only in case and punctuation hit,
+rewordings hit as near-duplicates, and changed numbers, negations and
+earlier turns miss. Finally the cache database is closed under the engine,
+and the next reply must still come from the model rather than an error.
+Counts the completions requested and exits with status 1 on any unexpected
+hit, miss or error.
+
+Usage:
+    python benchmarks/answer_cache.py
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, APP_DIR)
+
+from answer_cache import AnswerCache  # noqa: E402
+from audio_cache import AudioCache  # noqa: E402
+from clinic_content import corpus_sources, load_corpus  # noqa: E402
+from engine import ChatEngine  # noqa: E402
+from engine_client import LocalEngineClient  # noqa: E402
+
+FIRST_QUESTION = "How long does the swelling last after open rhinoplasty surgery?"
+
+# (earlier turns, question, expected outcome)
+CASES = [
+    ([], FIRST_QUESTION, "miss"),
+    ([], "how long does the swelling last after open rhinoplasty surgery", "hit"),
+    ([], "How long does swelling last after open rhinoplasty surgery?", "near hit"),
+    ([], "How long does the swelling not last after open rhinoplasty surgery?", "miss"),
+    ([], "How long does the swelling last 2 weeks after open rhinoplasty surgery?", "miss"),
+    ([FIRST_QUESTION], "When can I go back to work after the operation?", "miss"),
+    ([FIRST_QUESTION], "When can I go back to work after the operation?", "hit"),
+    (["Do you offer payment plans or promotions?"], "When can I go back to work after the operation?", "miss"),
+]
+
+
+class SimulatedCompletions:
+    """Stands in for ``async_client.chat.completions``, streaming a numbered answer"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, model, messages, stream, **kwargs):
+        self.calls += 1
+        text = f"Simulated answer {self.calls}."
+
+        async def chunks():
+            for word in text.split(" "):
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))])
+
+        return chunks()
+
+
+def ask(client, messages, question):
+    """Reply text, appending the turn to messages first as app.answer does"""
+    messages.append({"role": "user", "content": question, "language": "English"})
+    reply = "".join(client.chat(question, "English", messages)).strip()
+    messages.append({"role": "assistant", "content": reply, "language": "English"})
+    return reply
+
+
+def outcome(before, after):
+    if after["near_hits"] > before["near_hits"]:
+        return "near hit"
+    return "hit" if after["hits"] > before["hits"] else "miss"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer cache hits and misses in the app's call order")
+    parser.parse_args(argv)
+
+    completions = SimulatedCompletions()
+    failures = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        knowledge_base = load_corpus(corpus_sources(), os.path.join(temp_dir, "ingested"))
+        answer_cache = AnswerCache(os.path.join(temp_dir, "answer_cache.sqlite3"))
+        engine = ChatEngine(api_key="sk-benchmark", knowledge_base=knowledge_base, answer_cache=answer_cache,
+                            audio_cache=AudioCache(os.path.join(temp_dir, "audio_cache")))
+        engine._async_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        client = LocalEngineClient(engine)
+
+        # Earlier turns are asked in their own conversation first, so their answers are the same in every replay
+        answers = {}
+        print(f"{'expected':>8}  {'outcome':>8}  question")
+        for earlier, question, expected in CASES:
+            messages = []
+            for earlier_question in earlier:
+                messages.append({"role": "user", "content": earlier_question, "language": "English"})
+                answers.setdefault(earlier_question, ask(client, [], earlier_question))
+                messages.append({"role": "assistant", "content": answers[earlier_question], "language": "English"})
+            before = answer_cache.stats()
+            ask(client, messages, question)
+            result = outcome(before, answer_cache.stats())
+            print(f"{expected:>8}  {result:>8}  {' / '.join(earlier + [question])}")
+            if result != expected:
+                failures.append(question)
+
+        # A broken cache database must not turn into an error reply
+        answer_cache._conn.close()
+        calls = completions.calls
+        reply = ask(client, [], "What are the risks of revision rhinoplasty?")
+        print(f"Closed cache database: {reply.splitlines()[0]!r}, {answer_cache.stats()['errors']} cache errors")
+        if completions.calls != calls + 1 or not reply.startswith("Simulated answer"):
+            failures.append("closed cache database")
+
+    print(f"{completions.calls} completions requested")
+    if failures:
+        print(f"❌ Unexpected answer cache outcome for: {'; '.join(failures)}")
+        return 1
+    print("✅ Repeats and rewordings served from the cache, changed questions and histories answered afresh")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
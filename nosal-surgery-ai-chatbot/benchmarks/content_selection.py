@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Keyword content selection benchmark for the Meko Clinic chatbot
+
+Generates a synthetic clinic corpus of about 1 MB (paragraphs of clinic
+sentences and keywords, some of them long enough to need truncation) and
+times ``engine.select_relevant_content`` on it without a search index, next
+to the previous implementation: keyword scoring in Python over every section
+and word-by-word truncation that re-counts the growing partial section.
+Reports milliseconds per query for both and exits with status 1 if their
+selections differ.
+
+Usage:
+    python benchmarks/content_selection.py [--size-mb 1] [--repeat 20]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from functools import lru_cache
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, APP_DIR)
+
+from clinic_content import get_fallback_content  # noqa: E402
+from engine import CONTENT_KEYWORD_WEIGHTS, MEDICAL_TERM_WEIGHTS, select_relevant_content  # noqa: E402
+from keyword_matcher import KEYWORD_LABELS, KEYWORD_MATCHER, TermFrequencyTable, match_keywords  # noqa: E402
+from tokens import count_tokens  # noqa: E402
+
+QUERIES = [
+    "How much does open rhinoplasty cost?",
+    "What is the recovery timeline after surgery?",
+    "Is there swelling after a cartilage graft?",
+    "How do I book a consultation with the doctor?",
+    "What are the risks of revision rhinoplasty?",
+    "Can you fix breathing problems and a deviated septum?",
+    "What should I avoid after nose surgery?",
+    "Do you offer payment plans or promotions?"
+]
+
+
+def split_chunks(content):
+    """Paragraphs of the synthetic corpus long enough to index, as chunks for the term-frequency table"""
+    chunks = re.split(r'\n\n+', content)
+    return [chunk.strip() for chunk in chunks if len(chunk.strip()) > 50]
+
+
+def synthetic_corpus(size_bytes, seed=0):
+    """Paragraphs of clinic sentences and keywords adding up to about size_bytes"""
+    rng = random.Random(seed)
+    sentences = [line.strip() for line in get_fallback_content().splitlines() if len(line.strip()) > 10]
+    keywords = sorted(KEYWORD_LABELS)
+
+    paragraphs = []
+    size = 0
+    while size < size_bytes:
+        # Mostly short paragraphs, with the occasional long page section
+        length = rng.choice([3, 5, 8, 12, 60])
+        words = []
+        for _ in range(length):
+            words.extend(rng.choice(sentences).split())
+            if rng.random() < 0.5:
+                words.extend(rng.choice(keywords).split())
+        paragraph = " ".join(words)
+        paragraphs.append(paragraph)
+        size += len(paragraph.encode("utf-8")) + 2
+    return "\n\n".join(paragraphs)
+
+
+@lru_cache(maxsize=8)
+def previous_section_keyword_counts(content):
+    return [
+        (section, KEYWORD_MATCHER.counts(section))
+        for section in content.split('\n\n')
+        if len(section.strip()) > 50
+    ]
+
+
+def previous_select_relevant_content(user_message, clinic_content, max_tokens):
+    """Keyword branch of select_relevant_content before the term-frequency table"""
+    query_keywords = match_keywords(user_message)
+    scored_sections = []
+    for section, keyword_counts in previous_section_keyword_counts(clinic_content):
+        score = 0
+        for keyword, count in keyword_counts.items():
+            weight = CONTENT_KEYWORD_WEIGHTS[keyword]
+            if keyword in query_keywords:
+                weight *= 3
+            score += count * (weight + MEDICAL_TERM_WEIGHTS[keyword])
+        scored_sections.append((score, section))
+    scored_sections.sort(key=lambda x: x[0], reverse=True)
+
+    selected_content = ""
+    current_tokens = 0
+    for score, section in scored_sections:
+        section_tokens = count_tokens(section)
+        if current_tokens + section_tokens <= max_tokens:
+            selected_content += section + "\n\n"
+            current_tokens += section_tokens
+        else:
+            if current_tokens < max_tokens * 0.8:
+                words = section.split()
+                partial_section = ""
+                for word in words:
+                    test_section = partial_section + " " + word if partial_section else word
+                    if count_tokens(test_section) <= max_tokens - current_tokens:
+                        partial_section = test_section
+                    else:
+                        break
+                if partial_section:
+                    selected_content += partial_section + "\n\n"
+            break
+    return selected_content.strip()
+
+
+def time_per_query(select, repeat):
+    """Milliseconds per query, after one warm-up pass"""
+    for query in QUERIES:
+        select(query)
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for query in QUERIES:
+            select(query)
+    return (time.perf_counter() - start_time) / (repeat * len(QUERIES)) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time keyword content selection on a synthetic corpus")
+    parser.add_argument("--size-mb", type=float, default=1.0, help="Synthetic corpus size")
+    parser.add_argument("--max-tokens", type=int, default=1000, help="Retrieval token budget")
+    parser.add_argument("--repeat", type=int, default=20, help="Timing passes over the queries")
+    args = parser.parse_args(argv)
+
+    content = synthetic_corpus(int(args.size_mb * 1024 * 1024))
+    start_time = time.perf_counter()
+    term_table = TermFrequencyTable.from_documents([{"chunks": split_chunks(content)}])
+    print(f"📚 {len(content) / 1e6:.2f} MB in {len(term_table.chunks)} chunks, "
+          f"term-frequency table built in {time.perf_counter() - start_time:.2f}s")
+
+    def current(query):
+        return select_relevant_content(query, content, term_table, None, args.max_tokens)
+
+    def previous(query):
+        return previous_select_relevant_content(query, content, args.max_tokens)
+
+    mismatches = [query for query in QUERIES if current(query) != previous(query)]
+    previous_ms = time_per_query(previous, max(1, args.repeat // 10))
+    current_ms = time_per_query(current, args.repeat)
+    print(f"   previous  {previous_ms:9.2f} ms/query")
+    print(f"   current   {current_ms:9.2f} ms/query  ({previous_ms / current_ms:.0f}x faster)")
+
+    if mismatches:
+        for query in mismatches:
+            print(f"❌ Selections differ for: {query}")
+        return 1
+    print("✅ Same selections as the previous implementation")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Startup import-time benchmark for the Meko Clinic chatbot
+
+Runs app.py once in Streamlit bare mode under ``python -X importtime`` and
+reports the slowest top-level imports of the first page render. Exits with
+status 1 if a module that should be deferred (pandas, scikit-learn, ...) is
+imported at startup, or if total import time exceeds the budget.
+
+Usage:
+    python benchmarks/import_time.py [--budget-ms 1500] [--top 15]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only load on the code paths that need them
+DEFERRED_MODULES = ["numpy", "pandas", "sklearn", "scipy", "bs4", "html2text", "langdetect", "openai", "requests"]
+
+
+def measure_imports():
+    """Return {module: (self_us, cumulative_us)} for every import of a bare-mode app run"""
+    sys.path.insert(0, APP_DIR)
+    from clinic_content import corpus_sources, load_corpus
+
+    # Precompute the content, as it would exist in a deployment, and keep every file the run writes out of the repo
+    with tempfile.TemporaryDirectory() as work_dir:
+        artifact_dir = os.path.join(work_dir, "ingested")
+        load_corpus(corpus_sources(), artifact_dir)
+
+        env = dict(os.environ, OPENAI_HEALTH_CHECK="0", PYTHONPATH=APP_DIR, CLINIC_ARTIFACT_DIR=artifact_dir,
+                   ANSWER_CACHE_PATH=os.path.join(work_dir, "answer_cache.sqlite3"),
+                   AUDIO_CACHE_DIR=os.path.join(work_dir, "audio_cache"))
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c",
+             "import runpy; runpy.run_path('app.py', run_name='__main__')"],
+            cwd=APP_DIR, env=env, capture_output=True, text=True
+        )
+
+    imports = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports[name.rstrip()] = (int(self_us), int(cumulative_us))
+    return imports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure app startup import time")
+    parser.add_argument("--budget-ms", type=float, default=1500, help="Maximum total import time")
+    parser.add_argument("--top", type=int, default=15, help="Number of top-level imports to list")
+    args = parser.parse_args(argv)
+
+    imports = measure_imports()
+    top_level = {name.strip(): times for name, times in imports.items() if not name.startswith("  ")}
+    total_ms = sum(self_us for self_us, _ in imports.values()) / 1000
+
+    print("⏱️  Slowest top-level imports at startup")
+    for name, (_, cumulative_us) in sorted(top_level.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f"   {cumulative_us / 1000:8.1f} ms  {name}")
+    print(f"   {total_ms:8.1f} ms  total ({len(imports)} modules)")
+
+    loaded = {name.strip().split(".")[0] for name in imports}
+    eager = [module for module in DEFERRED_MODULES if module in loaded]
+
+    failed = False
+    if eager:
+        print(f"❌ Imported at startup but should be deferred: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"❌ Total import time {total_ms:.0f} ms exceeds budget of {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print(f"✅ Within budget of {args.budget_ms:.0f} ms, no deferred modules loaded")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
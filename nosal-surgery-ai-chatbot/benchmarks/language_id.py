@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Language identification micro-benchmark for the Meko Clinic chatbot
+
+Runs ``language_id.identify_language`` over the labelled clinic questions in
+``language_corpus.jsonl`` (every language in ``LANGUAGES``) and reports
+accuracy, misclassifications and microseconds per call, next to plain
+langdetect as a baseline. The same comparison runs on
+``language_heldout.jsonl``, questions written separately from the word lists
+in ``language_id`` so that tuning them against the corpus shows up as a drop
+there. Exits with status 1 if accuracy on either set falls below its minimum,
+or if a call takes longer than the ceiling on average on either set.
+
+Usage:
+    python benchmarks/language_id.py [--min-accuracy 0.95] [--min-heldout-accuracy 0.9]
+                                     [--max-us-per-call 4000] [--repeat 200]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "language_corpus.jsonl")
+HELDOUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "language_heldout.jsonl")
+
+sys.path.insert(0, APP_DIR)
+
+from clinic_data import LANG_DETECT_MAP, LANGUAGES  # noqa: E402
+from language_id import FALLBACK_DETECTOR, identify_language  # noqa: E402
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def langdetect_baseline(text):
+    from langdetect import detect
+    try:
+        return LANG_DETECT_MAP.get(detect(text), "English")
+    except Exception:
+        return "English"
+
+
+def evaluate(detect, corpus, repeat):
+    """Return (accuracy, misses, µs per call) of a detector over the corpus"""
+    misses = [(sample, detect(sample["text"])) for sample in corpus]
+    misses = [(sample, predicted) for sample, predicted in misses if predicted != sample["language"]]
+
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for sample in corpus:
+            detect(sample["text"])
+    per_call_us = (time.perf_counter() - start_time) / (repeat * len(corpus)) * 1e6
+
+    return 1 - len(misses) / len(corpus), misses, per_call_us
+
+
+def compare(corpus, repeat):
+    """Print both detectors' results over a corpus and return identify_language's (accuracy, µs per call)"""
+    results = {}
+    for name, detect, passes in [("language_id", identify_language, repeat),
+                                 ("langdetect", langdetect_baseline, max(1, repeat // 20))]:
+        accuracy, misses, per_call_us = evaluate(detect, corpus, passes)
+        results[name] = accuracy, per_call_us
+        print(f"   {name:<12} {accuracy:7.1%} accurate  {per_call_us:9.1f} µs/call")
+        per_language = Counter(sample["language"] for sample, _ in misses)
+        for sample, predicted in misses:
+            print(f"      ✗ {sample['language']} → {predicted}: {sample['text']}")
+        if per_language:
+            print(f"      misses by language: {dict(per_language)}")
+    return results["language_id"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure language identification accuracy and speed")
+    parser.add_argument("--min-accuracy", type=float, default=0.95, help="Minimum accuracy of identify_language")
+    parser.add_argument("--min-heldout-accuracy", type=float, default=0.9,
+                        help="Minimum accuracy of identify_language on the held-out questions")
+    parser.add_argument("--max-us-per-call", type=float, default=4000,
+                        help="Maximum mean microseconds per identify_language call on either set")
+    parser.add_argument("--repeat", type=int, default=200, help="Timing passes over the corpus")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus()
+    missing = set(LANGUAGES) - {sample["language"] for sample in corpus}
+    if missing:
+        print(f"❌ Corpus has no samples for: {', '.join(sorted(missing))}")
+        return 1
+    heldout = load_corpus(HELDOUT_PATH)
+
+    # Load langdetect profiles up front so neither detector pays for them while timed
+    FALLBACK_DETECTOR.wait()
+
+    print(f"🌐 {len(corpus)} samples in {len(LANGUAGES)} languages")
+    accuracy, per_call_us = compare(corpus, args.repeat)
+    print(f"🌐 {len(heldout)} held-out samples")
+    heldout_accuracy, heldout_per_call_us = compare(heldout, args.repeat)
+
+    if accuracy < args.min_accuracy:
+        print(f"❌ Accuracy {accuracy:.1%} below minimum of {args.min_accuracy:.0%}")
+        return 1
+    if heldout_accuracy < args.min_heldout_accuracy:
+        print(f"❌ Held-out accuracy {heldout_accuracy:.1%} below minimum of {args.min_heldout_accuracy:.0%}")
+        return 1
+    slowest_us = max(per_call_us, heldout_per_call_us)
+    if slowest_us > args.max_us_per_call:
+        print(f"❌ {slowest_us:.0f} µs per call, above the ceiling of {args.max_us_per_call:.0f} µs")
+        return 1
+    print(f"✅ Accuracy at or above {args.min_accuracy:.0%}, {args.min_heldout_accuracy:.0%} on held-out questions, "
+          f"at most {slowest_us:.0f} µs per call")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
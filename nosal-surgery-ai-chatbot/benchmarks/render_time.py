@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Chat rendering benchmark for the Meko Clinic chatbot
+
+Runs app.py under Streamlit's ``AppTest`` with conversations of growing
+length already in the session, with its artifacts and caches in a temporary
+directory, and reports the median script run time with
+the history windowed to ``HISTORY_WINDOW`` messages next to rendering every
+message, as the app did before. No OpenAI request is made. Exits with
+status 1 if the windowed run time grows with conversation length by more
+than the tolerance.
+
+Usage:
+    python benchmarks/render_time.py [--messages 10 100 400] [--repeat 5] [--tolerance 1.5]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def conversation(num_messages):
+    """Alternating user and assistant messages, assistant ones with a Play button"""
+    from session_records import ChatMessage
+
+    messages = []
+    for i in range(num_messages // 2):
+        messages.append(ChatMessage("user", f"Question {i} about rhinoplasty recovery?", language="English",
+                                    input_type="text"))
+        messages.append(ChatMessage("assistant", f"Answer {i}: swelling settles within two weeks. " * 5,
+                                    language="English", has_audio=True))
+    return messages
+
+
+def time_run(num_messages, history_window, repeat):
+    """Median seconds per script run with num_messages in the session"""
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["HISTORY_WINDOW"] = str(history_window)
+    app = AppTest.from_file(os.path.join(APP_DIR, "app.py"), default_timeout=60)
+    app.session_state["messages"] = conversation(num_messages)
+    app.run()
+
+    run_times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        app.run()
+        run_times.append(time.perf_counter() - start_time)
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+    return statistics.median(run_times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time app reruns against conversation length")
+    parser.add_argument("--messages", type=int, nargs="+", default=[10, 100, 400], help="Conversation lengths")
+    parser.add_argument("--window", type=int, default=6, help="HISTORY_WINDOW for the windowed runs")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per length")
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="Maximum ratio of the longest to the shortest conversation's windowed run time")
+    args = parser.parse_args(argv)
+
+    # Keep every seeded message, and stay offline
+    os.environ["MAX_SESSION_MESSAGES"] = str(max(args.messages) + 1)
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    os.environ["OPENAI_HEALTH_CHECK"] = "0"
+    os.environ["ANALYTICS_REFRESH_SECONDS"] = "0"
+    sys.path.insert(0, APP_DIR)
+    os.chdir(APP_DIR)
+
+    windowed_times = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Ingested pages and caches go to the temporary directory, not into the tree
+        os.environ["CLINIC_ARTIFACT_DIR"] = os.path.join(work_dir, "ingested")
+        os.environ["ANSWER_CACHE_PATH"] = os.path.join(work_dir, "answer_cache.sqlite3")
+        os.environ["AUDIO_CACHE_DIR"] = os.path.join(work_dir, "audio_cache")
+        print(f"{'messages':>9}  {'all':>10}  {'windowed':>10}")
+        for num_messages in args.messages:
+            all_time = time_run(num_messages, num_messages, args.repeat)
+            windowed_time = time_run(num_messages, args.window, args.repeat)
+            windowed_times.append(windowed_time)
+            print(f"{num_messages:>9}  {all_time * 1000:7.0f} ms  {windowed_time * 1000:7.0f} ms")
+
+    growth = windowed_times[-1] / windowed_times[0]
+    if growth > args.tolerance:
+        print(f"❌ Windowed run time grew {growth:.2f}x from {args.messages[0]} to {args.messages[-1]} messages")
+        return 1
+    print(f"✅ Windowed run time flat within {args.tolerance}x ({growth:.2f}x) up to {args.messages[-1]} messages")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
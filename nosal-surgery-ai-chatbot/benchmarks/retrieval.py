@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Retrieval latency benchmark for the Meko Clinic chatbot
+
+Builds search indexes over synthetic clinic corpora of growing size (chunks
+of clinic keywords and pseudo-words drawn from a Zipf distribution, so term
+frequencies are as skewed as in real text) and reports the median
+milliseconds per query of ``search_index.hybrid_search`` next to the previous
+retrieval: a sparse cosine product against every chunk followed by a full
+``argsort``.
+Exits with status 1 if hybrid search exceeds the latency budget at any size.
+
+Usage:
+    python benchmarks/retrieval.py [--chunks 1000 2000 5000] [--budget-ms 1]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, APP_DIR)
+
+from keyword_matcher import KEYWORD_LABELS  # noqa: E402
+from search_index import build_index, hybrid_search  # noqa: E402
+
+QUERIES = [
+    "How much does open rhinoplasty cost?",
+    "What is the recovery timeline after surgery?",
+    "Is there swelling after a cartilage graft?",
+    "How do I book a consultation with the doctor?",
+    "What are the risks of revision rhinoplasty?",
+    "Can you fix breathing problems and a deviated septum?",
+    "What should I avoid after nose surgery?",
+    "Do you offer payment plans or promotions?"
+]
+
+
+def synthetic_chunks(num_chunks, vocabulary_size=20000, seed=0):
+    """Chunks of 40-200 words: Zipf-distributed pseudo-words with clinic keywords mixed in"""
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocabulary = ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(vocabulary_size)]
+    zipf_weights = [1 / rank for rank in range(1, vocabulary_size + 1)]
+    keywords = sorted(KEYWORD_LABELS)
+
+    chunks = []
+    for _ in range(num_chunks):
+        words = rng.choices(vocabulary, zipf_weights, k=rng.randint(40, 200))
+        words += rng.sample(keywords, rng.randint(0, 6))
+        rng.shuffle(words)
+        chunks.append(" ".join(words))
+    return chunks
+
+
+def previous_search(search_index, query, top_k=3):
+    """Retrieval before hybrid search: cosine against every chunk, then a full argsort"""
+    query_vector = search_index['vectorizer'].transform([query])
+    similarities = (search_index['tfidf_matrix'] @ query_vector.T).toarray().ravel()
+    return [idx for idx in similarities.argsort()[-top_k:][::-1] if similarities[idx] > 0.1]
+
+
+def time_per_query(search, search_index, repeat):
+    """Median milliseconds per query over the timing passes, after one warm-up pass"""
+    pass_times = []
+    for _ in range(repeat + 1):
+        start_time = time.perf_counter()
+        for query in QUERIES:
+            search(search_index, query)
+        pass_times.append((time.perf_counter() - start_time) / len(QUERIES) * 1000)
+    return statistics.median(pass_times[1:])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time retrieval on synthetic corpora of growing size")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1000, 2000, 5000], help="Corpus sizes in chunks")
+    parser.add_argument("--budget-ms", type=float, default=1.0, help="Maximum hybrid search time per query")
+    parser.add_argument("--repeat", type=int, default=50, help="Timing passes over the queries")
+    args = parser.parse_args(argv)
+
+    over_budget = []
+    print(f"{'chunks':>8}  {'previous':>12}  {'hybrid':>12}")
+    for num_chunks in args.chunks:
+        documents = [{"key": "synthetic", "source_hash": str(num_chunks), "chunks": synthetic_chunks(num_chunks)}]
+        search_index = build_index(documents)
+        previous_ms = time_per_query(previous_search, search_index, args.repeat)
+        hybrid_ms = time_per_query(lambda index, query: hybrid_search(index, query, 5), search_index, args.repeat)
+        print(f"{num_chunks:>8}  {previous_ms:9.3f} ms  {hybrid_ms:9.3f} ms")
+        if hybrid_ms > args.budget_ms:
+            over_budget.append(num_chunks)
+
+    if over_budget:
+        print(f"❌ Hybrid search over {args.budget_ms} ms/query at {', '.join(map(str, over_budget))} chunks")
+        return 1
+    print(f"✅ Hybrid search within {args.budget_ms} ms/query at every size")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
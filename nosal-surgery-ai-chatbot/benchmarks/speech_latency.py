@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Speech latency benchmark for the Meko Clinic chatbot
+
+Speaks long English, Thai and Chinese replies through ``ChatEngine.speak_stream``
+against a simulated TTS endpoint whose latency grows with the input length
+(a fixed overhead plus a cost per character), and reports the time until the
+first segment is ready and until the whole clip is, next to the previous
+single call on the reply truncated to 2000 characters, where the first word
+is heard only once the whole clip is in. It also speaks a short reply just
+after the long English one has started, as another conversation would, and
+reports its time to the first segment next to the same reply spoken alone.
+No OpenAI request is made. Exits with status 1 if the time to the first
+segment is above the given fraction of the single call's, or if the short
+reply waits more than the given factor longer behind the long one.
+
+Usage:
+    python benchmarks/speech_latency.py [--overhead-ms 400] [--ms-per-char 6] [--max-ratio 0.25] [--max-slowdown 1.5]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, APP_DIR)
+
+from audio_cache import AudioCache  # noqa: E402
+from engine import ChatEngine  # noqa: E402
+from speech import prepare_speech_text, split_speech_segments  # noqa: E402
+
+REPLIES = {
+    "English": " ".join([
+        "Rhinoplasty recovery happens in stages.",
+        "During the first week you will wear a splint and should keep your head elevated, even while sleeping.",
+        "Bruising around the eyes usually fades within ten to fourteen days, and most patients return to office work "
+        "after about a week.",
+        "Avoid strenuous exercise, swimming and contact sports for at least six weeks.",
+        "Do not wear glasses resting on the bridge of your nose until your surgeon allows it.",
+    ] * 5),
+    "Thai": " ".join([
+        "การพักฟื้นหลังเสริมจมูกแบ่งเป็นหลายระยะ",
+        "ในสัปดาห์แรกคุณจะต้องใส่เฝือกและควรนอนหนุนศีรษะให้สูง",
+        "รอยช้ำรอบดวงตามักจะหายไปภายในสิบถึงสิบสี่วัน",
+        "ผู้ป่วยส่วนใหญ่กลับไปทำงานได้หลังจากประมาณหนึ่งสัปดาห์",
+        "ควรหลีกเลี่ยงการออกกำลังกายหนักและการว่ายน้ำอย่างน้อยหกสัปดาห์",
+    ] * 8),
+    "Chinese": "".join([
+        "隆鼻术后的恢复分为几个阶段。",
+        "第一周需要佩戴鼻夹板，睡觉时也应保持头部抬高。",
+        "眼周的淤青通常在十到十四天内消退，大多数患者大约一周后即可恢复办公室工作。",
+        "至少六周内避免剧烈运动、游泳和接触性运动。",
+    ] * 12),
+}
+
+SHORT_REPLY = "Most patients return to office work after about a week. Swelling keeps going down for months."
+
+
+class SimulatedSpeech:
+    """Stands in for ``client.audio.speech``, sleeping as long as the input would take to synthesize"""
+
+    def __init__(self, overhead_seconds, seconds_per_char):
+        self.overhead_seconds = overhead_seconds
+        self.seconds_per_char = seconds_per_char
+
+    def create(self, model, voice, input, speed):
+        time.sleep(self.overhead_seconds + self.seconds_per_char * len(input))
+        return SimpleNamespace(content=input.encode("utf-8"))
+
+
+async def time_stream(engine, text, language):
+    """Seconds until the first segment and until the last one"""
+    start_time = time.perf_counter()
+    first_time = None
+    async for _ in engine.speak_stream(text, language):
+        if first_time is None:
+            first_time = time.perf_counter() - start_time
+    return first_time, time.perf_counter() - start_time
+
+
+async def time_behind(engine, long_text, short_text, language):
+    """Seconds until short_text's first segment when long_text started being spoken just before"""
+    long_stream = asyncio.create_task(time_stream(engine, long_text, language))
+    await asyncio.sleep(0.05)
+    first_time, _ = await time_stream(engine, short_text, language)
+    await long_stream
+    return first_time
+
+
+def fresh_engine(client, cache_dir):
+    return ChatEngine(api_key="sk-benchmark", knowledge_base={"text": "", "documents": []},
+                      answer_cache=None, audio_cache=AudioCache(cache_dir), client=client)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time to first speech segment, pipelined against a single TTS call")
+    parser.add_argument("--overhead-ms", type=float, default=400, help="Simulated fixed latency per TTS call")
+    parser.add_argument("--ms-per-char", type=float, default=6, help="Simulated synthesis time per character")
+    parser.add_argument("--max-ratio", type=float, default=0.25,
+                        help="Maximum time to the first segment, as a fraction of the single call's time")
+    parser.add_argument("--max-slowdown", type=float, default=1.5,
+                        help="Maximum time to a short reply's first segment behind a long reply, relative to alone")
+    args = parser.parse_args(argv)
+
+    speech = SimulatedSpeech(args.overhead_ms / 1000, args.ms_per_char / 1000)
+    client = SimpleNamespace(audio=SimpleNamespace(speech=speech))
+    worst_ratio = 0
+
+    print(f"{'language':>9}  {'chars':>6}  {'segments':>8}  {'single call':>11}  {'first segment':>13}  {'whole clip':>10}")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        engine = fresh_engine(client, os.path.join(cache_dir, "replies"))
+        for language, text in REPLIES.items():
+            start_time = time.perf_counter()
+            speech.create("tts-1-hd", "alloy", prepare_speech_text(text), 0.9)
+            single_time = time.perf_counter() - start_time
+
+            first_time, total_time = asyncio.run(time_stream(engine, text, language))
+            worst_ratio = max(worst_ratio, first_time / single_time)
+            print(f"{language:>9}  {len(text):>6}  {len(split_speech_segments(text)):>8}  {single_time * 1000:8.0f} ms  "
+                  f"{first_time * 1000:10.0f} ms  {total_time * 1000:7.0f} ms")
+
+        # Fresh caches, so neither run finds the short reply's segments already synthesized
+        alone_time, _ = asyncio.run(time_stream(fresh_engine(client, os.path.join(cache_dir, "alone")),
+                                                SHORT_REPLY, "English"))
+        behind_time = asyncio.run(time_behind(fresh_engine(client, os.path.join(cache_dir, "behind")),
+                                              REPLIES["English"], SHORT_REPLY, "English"))
+    slowdown = behind_time / alone_time
+    print(f"Short reply's first segment: {alone_time * 1000:.0f} ms alone, {behind_time * 1000:.0f} ms "
+          f"behind a long reply")
+
+    if worst_ratio > args.max_ratio:
+        print(f"❌ First segment took {worst_ratio:.0%} of the single call's time (limit {args.max_ratio:.0%})")
+        return 1
+    if slowdown > args.max_slowdown:
+        print(f"❌ A short reply's first segment took {slowdown:.1f}x as long behind a long reply "
+              f"(limit {args.max_slowdown}x)")
+        return 1
+    print(f"✅ First segment within {worst_ratio:.0%} of the single call's time, without truncating long replies, "
+          f"and {slowdown:.1f}x as long behind another reply")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Transcription latency benchmark for the Meko Clinic chatbot
+
+Builds synthetic voice messages of growing length (bursts of noise at speech
+level separated by short pauses, as a 44.1 kHz recording from the browser)
+and transcribes them with ``prepare_for_transcription`` and
+``transcribe_segments`` against a simulated Whisper endpoint whose latency
+grows with the audio duration (a fixed overhead plus a cost per second).
+Reports the time for each length when long messages are split at pauses
+and transcribed concurrently, next to a single request for the whole
+message, as before. No OpenAI request is made. Exits with status 1 if the
+longest message takes more than the tolerance times the shortest.
+
+Usage:
+    python benchmarks/transcription_latency.py [--seconds 10 30 60] [--overhead-ms 500] [--ms-per-second 100]
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+import wave
+from types import SimpleNamespace
+
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, APP_DIR)
+
+from audio_processing import TRANSCRIPTION_SEGMENT_SECONDS, prepare_for_transcription, read_wav  # noqa: E402
+from engine import TRANSCRIPTION_WORKERS, transcribe_segments  # noqa: E402
+
+RECORDING_SAMPLE_RATE = 44100
+
+
+def voice_message(seconds, seed=0):
+    """16-bit mono WAV of speech-level bursts of 2-5 s with 0.4 s pauses and a second of silence around them"""
+    rng = np.random.default_rng(seed)
+    samples = np.zeros(int(RECORDING_SAMPLE_RATE * (seconds + 2)), dtype=np.float32)
+    position = RECORDING_SAMPLE_RATE
+    end = len(samples) - RECORDING_SAMPLE_RATE
+    while position < end:
+        burst = min(int(RECORDING_SAMPLE_RATE * rng.uniform(2, 5)), end - position)
+        samples[position:position + burst] = 0.2 * rng.standard_normal(burst)
+        position += burst + int(RECORDING_SAMPLE_RATE * 0.4)
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RECORDING_SAMPLE_RATE)
+        wav.writeframes((np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+class SimulatedTranscriptions:
+    """Stands in for ``client.audio.transcriptions``, waiting as long as the audio would take to transcribe"""
+
+    def __init__(self, overhead_seconds, seconds_per_audio_second):
+        self.overhead_seconds = overhead_seconds
+        self.seconds_per_audio_second = seconds_per_audio_second
+
+    async def create(self, model, file, response_format, language, temperature):
+        samples, sample_rate = read_wav(file[1])
+        await asyncio.sleep(self.overhead_seconds + self.seconds_per_audio_second * len(samples) / sample_rate)
+        return SimpleNamespace(text=f"{len(samples) / sample_rate:.1f} seconds of speech", language="english")
+
+
+async def time_transcription(client, audio_bytes, segment_seconds):
+    """(seconds to preprocess and transcribe, number of requests)"""
+    start_time = time.perf_counter()
+    segments = await asyncio.to_thread(prepare_for_transcription, audio_bytes, "wav", segment_seconds)
+    await transcribe_segments(client, segments, asyncio.Semaphore(TRANSCRIPTION_WORKERS))
+    return time.perf_counter() - start_time, len(segments)
+
+
+async def run(args, client):
+    # Load scipy for resampling before timing
+    await asyncio.to_thread(prepare_for_transcription, voice_message(1))
+
+    rows = []
+    for seconds in args.seconds:
+        audio_bytes = voice_message(seconds)
+        single_time, _ = await time_transcription(client, audio_bytes, 10 ** 6)
+        split_time, requests = await time_transcription(client, audio_bytes, args.segment_seconds)
+        rows.append((seconds, len(audio_bytes), requests, single_time, split_time))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcription time against voice message length")
+    parser.add_argument("--seconds", type=float, nargs="+", default=[10, 30, 60], help="Voice message lengths")
+    parser.add_argument("--segment-seconds", type=float, default=TRANSCRIPTION_SEGMENT_SECONDS, help="Longest segment per request")
+    parser.add_argument("--overhead-ms", type=float, default=500, help="Simulated fixed latency per request")
+    parser.add_argument("--ms-per-second", type=float, default=100,
+                        help="Simulated transcription time per second of audio")
+    parser.add_argument("--tolerance", type=float, default=2.0,
+                        help="Maximum ratio of the longest to the shortest message's transcription time")
+    args = parser.parse_args(argv)
+
+    transcriptions = SimulatedTranscriptions(args.overhead_ms / 1000, args.ms_per_second / 1000)
+    client = SimpleNamespace(audio=SimpleNamespace(transcriptions=transcriptions))
+    rows = asyncio.run(run(args, client))
+
+    print(f"{'seconds':>8}  {'recording':>9}  {'requests':>8}  {'single request':>14}  {'split':>8}")
+    for seconds, size, requests, single_time, split_time in rows:
+        print(f"{seconds:>8.0f}  {size / 1024:6.0f} KB  {requests:>8}  {single_time * 1000:11.0f} ms  "
+              f"{split_time * 1000:5.0f} ms")
+
+    growth = rows[-1][4] / rows[0][4]
+    if growth > args.tolerance:
+        print(f"❌ Transcription time grew {growth:.2f}x from {args.seconds[0]:.0f} s to {args.seconds[-1]:.0f} s messages")
+        return 1
+    print(f"✅ Transcription time within {args.tolerance}x ({growth:.2f}x) from {args.seconds[0]:.0f} s "
+          f"to {args.seconds[-1]:.0f} s messages")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
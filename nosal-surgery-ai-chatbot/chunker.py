@@ -0,0 +1,207 @@
+"""
+Structure-aware chunking of clinic pages for the Meko Clinic chatbot.
+
+Pages are split along their own structure before html2text flattens them:
+every ``<h1>``-``<h6>`` opens a section, and the paragraphs, list items and
+table rows under it are its blocks. Blocks are packed into chunks of at most
+``CHUNK_TOKENS`` tokens that never span two sections, the next chunk of a
+section repeats the last ``CHUNK_OVERLAP_TOKENS`` tokens of blocks before it,
+and a block too long for one chunk is cut at word boundaries with the same
+overlap. Each chunk starts with its heading path ("Recovery > First week"),
+so retrieval sees what a passage is about and the prompt gets only the
+passages that matter.
+
+Every chunk has a stable ID (a hash of its page and text, unchanged when
+other sections are edited) and the anchor of its section: the heading's
+``id`` (or that of its ``<section>``), else a slug of the heading text.
+"""
+
+import hashlib
+import re
+
+from tokens import count_tokens, truncate_to_tokens, truncate_to_words
+
+CHUNK_TOKENS = 200
+CHUNK_OVERLAP_TOKENS = 40
+
+# Bump when the chunking logic changes, so artifacts and indexes built with the old chunks are rebuilt
+CHUNKER_VERSION = f"1-{CHUNK_TOKENS}-{CHUNK_OVERLAP_TOKENS}"
+
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+BLOCK_TAGS = {"p", "li", "tr", "blockquote", "pre", "dt", "dd", "figcaption", "caption", "address"}
+INLINE_TAGS = {
+    "a", "abbr", "b", "bdi", "bdo", "br", "cite", "code", "data", "dfn", "em", "font", "i", "img", "kbd",
+    "label", "mark", "q", "s", "samp", "small", "span", "strong", "sub", "sup", "time", "u", "var", "wbr"
+}
+
+
+def _clean(text):
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _slug(text):
+    return re.sub(r"\s+", "-", re.sub(r"[^\w\s-]", "", text.lower()).strip())[:80] or "section"
+
+
+def _heading_anchor(heading, title, used_anchors):
+    """id of the heading, of an anchor inside it or of its section, else a unique slug of its title"""
+    target = heading if heading.get("id") else heading.find(attrs={"id": True}) or heading.find("a", attrs={"name": True})
+    if target is None:
+        section = heading.find_parent(["section", "article"], attrs={"id": True})
+        # Only when the heading is the section's own title
+        if section is not None and section.find(list(HEADING_TAGS)) is heading:
+            target = section
+    if target is not None:
+        return target.get("id") or target.get("name")
+
+    anchor = _slug(title)
+    used_anchors[anchor] = used_anchors.get(anchor, 0) + 1
+    return anchor if used_anchors[anchor] == 1 else f"{anchor}-{used_anchors[anchor]}"
+
+
+def _block_text(block):
+    if block.name == "tr":
+        cells = [_clean(cell.get_text(" ")) for cell in block.find_all(["td", "th"])]
+        return " | ".join(cell for cell in cells if cell)
+    return _clean(block.get_text(" "))
+
+
+def page_sections(soup):
+    """Sections of a parsed page in document order: heading path, anchor and text blocks"""
+    from bs4.element import Comment, Declaration, Doctype, NavigableString, ProcessingInstruction
+
+    sections = [{"heading": [], "anchor": None, "blocks": []}]
+    headings = []
+    used_anchors = {}
+    inline = []
+
+    def flush():
+        text = _clean("".join(inline))
+        inline.clear()
+        if text:
+            sections[-1]["blocks"].append(text)
+
+    def walk(node):
+        for child in node.children:
+            if isinstance(child, (Comment, Declaration, Doctype, ProcessingInstruction)):
+                continue
+            if isinstance(child, NavigableString):
+                inline.append(str(child))
+            elif child.name in HEADING_TAGS:
+                flush()
+                title = _clean(child.get_text(" "))
+                if not title:
+                    continue
+                level = int(child.name[1])
+                while headings and headings[-1][0] >= level:
+                    headings.pop()
+                headings.append((level, title))
+                sections.append({
+                    "heading": [heading for _, heading in headings],
+                    "anchor": _heading_anchor(child, title, used_anchors),
+                    "blocks": []
+                })
+            elif child.name in BLOCK_TAGS:
+                flush()
+                text = _block_text(child)
+                if text:
+                    sections[-1]["blocks"].append(text)
+            elif child.name in INLINE_TAGS:
+                inline.append(" " if child.name == "br" else child.get_text())
+            else:
+                # Containers (div, section, ul, table, ...) end the running text before and after them
+                flush()
+                walk(child)
+                flush()
+
+    walk(soup)
+    flush()
+    return [section for section in sections if section["blocks"]]
+
+
+def text_sections(text):
+    """A single untitled section whose blocks are the paragraphs of plain text"""
+    blocks = [_clean(paragraph) for paragraph in re.split(r"\n\s*\n", text)]
+    return [{"heading": [], "anchor": None, "blocks": [block for block in blocks if block]}]
+
+
+def _tail(text, max_tokens):
+    """Longest suffix of whole words of text within max_tokens"""
+    words = text.split()
+    kept = 0
+    tokens = 0
+    for word in reversed(words):
+        tokens += count_tokens(word) + 1
+        if tokens > max_tokens:
+            break
+        kept += 1
+    return " ".join(words[len(words) - kept:]) if kept < len(words) else ""
+
+
+def split_block(text, max_tokens, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """Pieces of at most max_tokens covering text, each starting overlap_tokens before the previous one ends"""
+    pieces = []
+    rest = text
+    while count_tokens(rest) > max_tokens:
+        piece = truncate_to_words(rest, max_tokens)
+        overlap = _tail(piece, min(overlap_tokens, max_tokens // 2))
+        if not piece:
+            # No space within the budget (unsegmented Thai, long URLs): cut between characters, without overlap
+            piece = truncate_to_tokens(rest, max_tokens)
+            overlap = ""
+        pieces.append(piece)
+        rest = f"{overlap} {rest[len(piece):].lstrip()}" if overlap else rest[len(piece):].lstrip()
+    if rest:
+        pieces.append(rest)
+    return pieces
+
+
+def chunk_sections(key, sections, max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """Pack section blocks into bounded, overlapping chunks, returning (chunks, chunk metadata)
+
+    Metadata rows are ``{"id", "heading", "anchor"}``, aligned with the
+    chunks. Chunks repeated verbatim on a page (banners, calls to action)
+    are kept once.
+    """
+    chunks = []
+    chunk_meta = []
+    seen_ids = set()
+
+    def emit(section, prefix, units):
+        text = prefix + "\n".join(units)
+        chunk_id = hashlib.sha1(f"{key}\x00{text}".encode("utf-8")).hexdigest()[:16]
+        if chunk_id in seen_ids:
+            return
+        seen_ids.add(chunk_id)
+        chunks.append(text)
+        chunk_meta.append({"id": chunk_id, "heading": " > ".join(section["heading"]), "anchor": section["anchor"]})
+
+    for section in sections:
+        prefix = " > ".join(section["heading"]) + "\n" if section["heading"] else ""
+        budget = max(max_tokens - count_tokens(prefix), max_tokens // 2)
+        units = [piece for block in section["blocks"] for piece in split_block(block, budget, overlap_tokens)]
+
+        current = []
+        current_tokens = 0
+        for unit in units:
+            unit_tokens = count_tokens(unit) + 1
+            if current and current_tokens + unit_tokens > budget:
+                emit(section, prefix, current)
+                # The next chunk opens with the trailing blocks of this one, as far as the overlap allows
+                carried = []
+                carried_tokens = 0
+                for previous in reversed(current):
+                    previous_tokens = count_tokens(previous) + 1
+                    if carried_tokens + previous_tokens > overlap_tokens:
+                        break
+                    carried.insert(0, previous)
+                    carried_tokens += previous_tokens
+                while carried and carried_tokens + unit_tokens > budget:
+                    carried_tokens -= count_tokens(carried.pop(0)) + 1
+                current, current_tokens = carried, carried_tokens
+            current.append(unit)
+            current_tokens += unit_tokens
+        if current:
+            emit(section, prefix, current)
+
+    return chunks, chunk_meta
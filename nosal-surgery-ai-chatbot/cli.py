@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Offline build commands for the Meko Clinic Rhinoplasty AI Chatbot
+
+Usage:
+    python cli.py ingest [--corpus DIR] [--artifact-dir DIR] [--workers N]
+    python cli.py build-index [--corpus DIR] [--artifact-dir DIR] [--workers N] [--index-dir DIR]
+    python cli.py build-embeddings [--corpus DIR] [--artifact-dir DIR] [--workers N] [--embeddings-dir DIR]
+                                   [--model MODEL] [--dimensions N]
+    python cli.py search --input QUESTIONS.jsonl [--output RESULTS.jsonl] [--field question] [--top-k N] [--content]
+                         [--batch-size N] [--corpus DIR] [--artifact-dir DIR] [--workers N] [--index-dir DIR]
+    python cli.py prerender-audio [--output-dir DIR]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from clinic_content import DEFAULT_ARTIFACT_DIR, DEFAULT_CORPUS_DIR, corpus_sources, load_corpus
+from embedding_index import build_embeddings, embedding_settings, embeddings_path
+from search_index import (DEFAULT_INDEX_DIR, build_index, corpus_version, hybrid_search_batch, index_path,
+                          load_or_build_index, prune_index_dir, save_index)
+from speech import DEFAULT_PRERENDERED_DIR, prerender_quick_responses
+
+
+def _load_corpus(args, file=None):
+    sources = corpus_sources(args.corpus)
+    if not sources:
+        print("⚠️  No clinic HTML found, using fallback content", file=file)
+    corpus = load_corpus(sources, args.artifact_dir, args.workers)
+    print(f"📄 {len(corpus['documents'])} pages, {len(corpus['changed'])} re-ingested", file=file)
+    for key in corpus['changed']:
+        print(f"   ↻ {key}", file=file)
+    return corpus
+
+
+def ingest_command(args):
+    """Process changed corpus pages into content artifacts"""
+    print("📥 Ingesting clinic content...")
+    start_time = time.time()
+    corpus = _load_corpus(args)
+
+    chunk_count = sum(len(document['chunks']) for document in corpus['documents'])
+    print(f"✅ {len(corpus['text']):,} characters, {chunk_count} chunks in {time.time() - start_time:.2f}s")
+    print(f"📦 Artifacts in {args.artifact_dir}")
+    return 0
+
+
+def build_index_command(args):
+    """Build the semantic search index, re-vectorizing only changed pages"""
+    print("🔍 Building semantic search index...")
+    start_time = time.time()
+    corpus = _load_corpus(args)
+    documents = corpus['documents']
+
+    search_index = build_index(documents, args.index_dir)
+    path = index_path(documents, args.index_dir)
+    manifest = save_index(search_index, path)
+    prune_index_dir(documents, args.index_dir)
+
+    print(f"✅ Indexed {manifest['num_chunks']} chunks from {manifest['num_pages']} pages "
+          f"({len(search_index['revectorized'])} re-vectorized) in {time.time() - start_time:.2f}s")
+    print(f"📦 Written to {path}")
+    return 0
+
+
+def build_embeddings_command(args):
+    """Embed every chunk for cross-lingual search"""
+    from dotenv import load_dotenv
+    from openai_client import create_client
+
+    load_dotenv()
+    if not os.getenv("OPENAI_API_KEY"):
+        print("❌ OPENAI_API_KEY is not set")
+        return 1
+
+    # Unset options come from the settings the engine reads, so it finds the file written here
+    model, dimensions, embeddings_dir = embedding_settings()
+    model = args.model or model
+    dimensions = args.dimensions or dimensions
+    embeddings_dir = args.embeddings_dir or embeddings_dir
+    if (model, dimensions) != embedding_settings()[:2]:
+        print(f"⚠️ The engine only loads {model}-{dimensions} embeddings with EMBEDDING_MODEL={model} "
+              f"and EMBEDDING_DIMENSIONS={dimensions} set")
+
+    print("🧭 Building embedding index...")
+    start_time = time.time()
+    documents = _load_corpus(args)['documents']
+
+    # Rows follow the search index chunk order of the same corpus version
+    chunks = [chunk for document in documents for chunk in document['chunks']]
+    path = embeddings_path(corpus_version(documents), embeddings_dir, model, dimensions)
+    client = create_client(os.getenv("OPENAI_API_KEY"))
+    num_chunks, dimensions = build_embeddings(client, chunks, path, model, dimensions)
+
+    print(f"✅ Embedded {num_chunks} chunks ({dimensions} dimensions) in {time.time() - start_time:.2f}s")
+    print(f"📦 Written to {path}")
+    return 0
+
+
+def search_command(args):
+    """Retrieve the best chunks for every question of a JSONL log"""
+    with open(args.input, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    questions = [record[args.field] if isinstance(record, dict) else str(record) for record in records]
+
+    print(f"🔍 Searching {len(questions):,} questions...", file=sys.stderr)
+    # Progress goes to stderr so results can be piped from stdout
+    documents = _load_corpus(args, file=sys.stderr)['documents']
+    search_index = load_or_build_index(documents, args.index_dir)
+
+    start_time = time.time()
+    results = hybrid_search_batch(search_index, questions, args.top_k, args.batch_size)
+    elapsed = time.time() - start_time
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for record, question, question_results in zip(records, questions, results):
+            record = dict(record) if isinstance(record, dict) else {args.field: question}
+            record["results"] = [
+                {"chunk": result["chunk"], "id": result["id"], "source": result["source"],
+                 "anchor": result["anchor"], "score": round(result["score"], 4),
+                 **({"content": result["content"]} if args.content else {})}
+                for result in question_results
+            ]
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    rate = len(questions) / elapsed if elapsed > 0 else float("inf")
+    print(f"✅ Searched {len(questions):,} questions in {elapsed:.2f}s ({rate:,.0f} questions/s)", file=sys.stderr)
+    return 0
+
+
+def prerender_audio_command(args):
+    """Synthesize every quick response template ahead of time"""
+    from dotenv import load_dotenv
+    from openai_client import create_client
+
+    load_dotenv()
+    if not os.getenv("OPENAI_API_KEY"):
+        print("❌ OPENAI_API_KEY is not set")
+        return 1
+
+    print("🎵 Pre-rendering quick response audio...")
+    start_time = time.time()
+    client = create_client(os.getenv("OPENAI_API_KEY"))
+    count = 0
+    for action, language, filename in prerender_quick_responses(client, args.output_dir):
+        print(f"   {action} ({language}) → {filename}")
+        count += 1
+
+    print(f"✅ Rendered {count} clips in {time.time() - start_time:.2f}s")
+    print(f"📦 Written to {args.output_dir}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Meko Clinic chatbot build commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_corpus_arguments(subparser):
+        subparser.add_argument("--corpus", default=DEFAULT_CORPUS_DIR,
+                               help="Directory of clinic pages (default: corpus/, else meko_clinic_rhinoplasty.html)")
+        subparser.add_argument("--artifact-dir", default=DEFAULT_ARTIFACT_DIR, help="Content artifact directory")
+        subparser.add_argument("--workers", type=int, help="Ingest worker processes (default: CPU count)")
+
+    ingest_parser = subparsers.add_parser("ingest", help="Precompute content artifacts for changed pages")
+    add_corpus_arguments(ingest_parser)
+    ingest_parser.set_defaults(func=ingest_command)
+
+    build_parser = subparsers.add_parser("build-index", help="Build the semantic search index")
+    add_corpus_arguments(build_parser)
+    build_parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR, help="Index output directory")
+    build_parser.set_defaults(func=build_index_command)
+
+    embeddings_parser = subparsers.add_parser("build-embeddings", help="Build the optional embedding index")
+    add_corpus_arguments(embeddings_parser)
+    embeddings_parser.add_argument("--embeddings-dir", help="Embedding output directory (default: EMBEDDINGS_DIR)")
+    embeddings_parser.add_argument("--model", help="OpenAI embedding model (default: EMBEDDING_MODEL)")
+    embeddings_parser.add_argument("--dimensions", type=int, help="Embedding size (default: EMBEDDING_DIMENSIONS)")
+    embeddings_parser.set_defaults(func=build_embeddings_command)
+
+    search_parser = subparsers.add_parser("search", help="Search the clinic content for a JSONL log of questions")
+    add_corpus_arguments(search_parser)
+    search_parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR, help="Prebuilt index directory")
+    search_parser.add_argument("--input", required=True, help="JSONL file, one question object (or string) per line")
+    search_parser.add_argument("--output", help="JSONL output path (default: stdout)")
+    search_parser.add_argument("--field", default="question", help="Question field of each input object")
+    search_parser.add_argument("--top-k", type=int, default=3, help="Results per question")
+    search_parser.add_argument("--content", action="store_true", help="Include chunk text in the results")
+    search_parser.add_argument("--batch-size", type=int, default=1024, help="Questions scored per matrix product")
+    search_parser.set_defaults(func=search_command)
+
+    audio_parser = subparsers.add_parser("prerender-audio", help="Pre-render quick response audio")
+    audio_parser.add_argument("--output-dir", default=DEFAULT_PRERENDERED_DIR, help="Audio output directory")
+    audio_parser.set_defaults(func=prerender_audio_command)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,372 @@
+"""
+Clinic content processing for the Meko Clinic chatbot.
+
+Turns clinic HTML pages into cleaned text plus structured data. Kept free
+of Streamlit so the same processing can run from the offline build commands.
+
+The knowledge base is every ``*.html`` page under ``corpus/`` (procedure
+pages, FAQs, price sheets), or just ``meko_clinic_rhinoplasty.html`` when
+there is no corpus directory. ``python cli.py ingest`` processes each page
+once and writes a compact JSON artifact per page (cleaned text, chunks from
+``chunker`` with their IDs and section anchors, structured data, links,
+per-chunk keyword counts and the source file hash) to ``ingested/``. Only
+pages whose hash changed are re-processed, in parallel across a process
+pool, and the app re-ingests stale pages automatically.
+"""
+
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from chunker import CHUNKER_VERSION, chunk_sections, page_sections, text_sections
+from keyword_matcher import KEYWORD_VERSION, chunk_keyword_counts
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+HTML_FILENAME = "meko_clinic_rhinoplasty.html"
+DEFAULT_HTML_PATH = os.path.join(APP_DIR, HTML_FILENAME)
+DEFAULT_CORPUS_DIR = os.path.join(APP_DIR, "corpus")
+DEFAULT_ARTIFACT_DIR = os.path.join(APP_DIR, "ingested")
+
+ARTIFACT_FORMAT_VERSION = 4
+
+
+def find_html_file():
+    """Locate the single clinic HTML page, or None"""
+    # Try multiple possible paths for the HTML file
+    possible_paths = [
+        HTML_FILENAME,
+        "./" + HTML_FILENAME,
+        os.path.join(os.getcwd(), HTML_FILENAME),
+        DEFAULT_HTML_PATH
+    ]
+
+    for path in possible_paths:
+        if os.path.exists(path):
+            return path
+
+    return None
+
+
+def corpus_sources(corpus_dir=DEFAULT_CORPUS_DIR):
+    """List the knowledge base pages as (key, path) pairs, keyed by path relative to the corpus"""
+    if os.path.isdir(corpus_dir):
+        sources = []
+        for root, _, files in os.walk(corpus_dir):
+            for filename in files:
+                if filename.endswith(".html"):
+                    path = os.path.join(root, filename)
+                    sources.append((os.path.relpath(path, corpus_dir).replace(os.sep, "/"), path))
+        if sources:
+            return sorted(sources)
+
+    path = find_html_file()
+    return [(os.path.basename(path), path)] if path else []
+
+
+# Extract links and videos from HTML content
+def extract_links_from_html(html_content):
+    """Extract video and website links from HTML content"""
+    from bs4 import BeautifulSoup
+
+    return extract_links_from_soup(BeautifulSoup(html_content, 'html.parser'))
+
+
+def extract_links_from_soup(soup):
+    """Extract video and website links from an already parsed page"""
+    links = {
+        "videos": [],
+        "websites": []
+    }
+
+    # Extract video links
+    video_elements = soup.find_all(['video', 'iframe'])
+    for video in video_elements:
+        src = video.get('src', '')
+        if src:
+            links["videos"].append({
+                "title": video.get('title', 'Video'),
+                "url": src,
+                "description": "Video content from clinic website"
+            })
+
+    # Extract website links
+    website_links = soup.find_all('a', href=True)
+    for link in website_links:
+        href = link.get('href')
+        if href and not href.startswith('#'):
+            # Filter for relevant links
+            if any(keyword in href.lower() for keyword in ['rhinoplasty', 'nose', 'surgery', 'clinic', 'meko']):
+                links["websites"].append({
+                    "title": link.get_text(strip=True) or "Related Link",
+                    "url": href,
+                    "description": "Related information from clinic website"
+                })
+
+    return links
+
+
+def process_html_content(html_content):
+    """Convert clinic HTML into cleaned text, structured data and heading sections"""
+    # HTML parsing libraries are only needed here, so keep them off the startup path
+    from bs4 import BeautifulSoup
+    import html2text
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    # Collect links before stripping navigation, so the page is parsed only once
+    extracted_links = extract_links_from_soup(soup)
+
+    # Remove unwanted elements
+    for script in soup(["script", "style", "nav", "footer", "header"]):
+        script.decompose()
+
+    # Extract structured data
+    structured_data = {
+        "procedures": [],
+        "pricing": [],
+        "contact": [],
+        "reviews": [],
+        "gallery": [],
+        "videos": [],
+        "doctors": [],
+        "locations": []
+    }
+
+    # Split along the page's headings while its structure is still there
+    sections = page_sections(soup)
+
+    # Extract text content
+    h = html2text.HTML2Text()
+    h.ignore_links = True
+    h.ignore_images = True
+    h.body_width = 0
+    text_content = h.handle(str(soup))
+
+    # Clean up the text, keeping paragraph breaks
+    text_content = re.sub(r'[^\S\n]+', ' ', text_content)
+    text_content = re.sub(r'\n\s*\n', '\n\n', text_content).strip()
+
+    # Extract specific information patterns
+    # Pricing
+    price_patterns = [
+        r'(\d{2,3}(?:,\d{3})*)\s*บาท',
+        r'เริ่มเพียง\s*(\d{2,3}(?:,\d{3})*)\s*บาท',
+        r'ราคา\s*(\d{2,3}(?:,\d{3})*)\s*บาท'
+    ]
+    for pattern in price_patterns:
+        matches = re.findall(pattern, text_content)
+        structured_data["pricing"].extend(matches)
+
+    # Contact information
+    contact_patterns = [
+        r'\+66\s*2\s*272\s*0022',
+        r'@MEKOCLINIC',
+        r'mekoclinic\.com'
+    ]
+    for pattern in contact_patterns:
+        matches = re.findall(pattern, text_content)
+        structured_data["contact"].extend(matches)
+
+    # Procedures
+    procedure_keywords = [
+        "เสริมจมูกแบบเปิด", "Open Rhinoplasty", "เสริมจมูก", "nose surgery",
+        "ตะไบจมูก", "ปรับโครงสร้าง", "แก้จมูก", "revision rhinoplasty"
+    ]
+    for keyword in procedure_keywords:
+        if keyword in text_content:
+            structured_data["procedures"].append(keyword)
+
+    # Attach links extracted from HTML
+    structured_data["videos"] = extracted_links["videos"]
+    structured_data["websites"] = extracted_links["websites"]
+
+    return text_content, structured_data, sections
+
+
+def file_hash(path):
+    """SHA-256 of a source file's bytes"""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def artifact_path_for(key, artifact_dir=DEFAULT_ARTIFACT_DIR):
+    """Artifact file for a corpus page, readable and unique per key"""
+    stem = re.sub(r'[^A-Za-z0-9_.-]+', '_', os.path.splitext(key)[0])[:60]
+    return os.path.join(artifact_dir, f"{stem}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]}.json")
+
+
+def process_file(key, html_path):
+    """Process one page into its artifact dict without writing it"""
+    with open(html_path, "rb") as f:
+        raw = f.read()
+    text_content, structured_data, sections = process_html_content(raw.decode("utf-8"))
+    chunks, chunk_meta = chunk_sections(key, sections)
+
+    return {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "key": key,
+        "source_hash": hashlib.sha256(raw).hexdigest(),
+        "chunker_version": CHUNKER_VERSION,
+        "text": text_content,
+        "chunks": chunks,
+        "chunk_meta": chunk_meta,
+        "keyword_version": KEYWORD_VERSION,
+        "keyword_counts": chunk_keyword_counts(chunks),
+        "structured_data": structured_data,
+        "links": {
+            "videos": structured_data["videos"],
+            "websites": structured_data["websites"]
+        }
+    }
+
+
+def ingest(key, html_path, artifact_path):
+    """Process one page and write its artifact, returning it"""
+    artifact = process_file(key, html_path)
+    tmp_path = f"{artifact_path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, artifact_path)
+    return artifact
+
+
+def load_artifact(html_path, artifact_path):
+    """Return a page's artifact if it was built from the current file, else None"""
+    try:
+        with open(artifact_path, encoding="utf-8") as f:
+            artifact = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if artifact.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        return None
+    # Chunks and keyword counts go stale when the chunker or the keyword tables change
+    if artifact.get("chunker_version") != CHUNKER_VERSION or artifact.get("keyword_version") != KEYWORD_VERSION:
+        return None
+    if artifact.get("source_hash") != file_hash(html_path):
+        return None
+    return artifact
+
+
+def ingest_corpus(sources, artifact_dir=DEFAULT_ARTIFACT_DIR, workers=None):
+    """Re-ingest only the pages whose hash changed, returning (documents, changed_keys)"""
+    documents = {}
+    stale = []
+    for key, path in sources:
+        artifact = load_artifact(path, artifact_path_for(key, artifact_dir))
+        if artifact is not None:
+            documents[key] = artifact
+        else:
+            stale.append((key, path))
+
+    try:
+        os.makedirs(artifact_dir, exist_ok=True)
+        keys = [key for key, _ in stale]
+        paths = [path for _, path in stale]
+        artifact_paths = [artifact_path_for(key, artifact_dir) for key in keys]
+        if len(stale) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                artifacts = list(pool.map(ingest, keys, paths, artifact_paths))
+        else:
+            artifacts = [ingest(*args) for args in zip(keys, paths, artifact_paths)]
+        documents.update(zip(keys, artifacts))
+
+        # Drop artifacts of pages removed from the corpus
+        current = {os.path.basename(artifact_path_for(key, artifact_dir)) for key, _ in sources}
+        for filename in os.listdir(artifact_dir):
+            if filename.endswith(".json") and filename not in current:
+                os.remove(os.path.join(artifact_dir, filename))
+    except OSError:
+        # Read-only deployments still work, they just re-parse on every cold start
+        for key, path in stale:
+            documents[key] = process_file(key, path)
+
+    return [documents[key] for key, _ in sources], [key for key, _ in stale]
+
+
+def merge_structured_data(documents):
+    """Concatenate the structured data of every page"""
+    merged = {}
+    for document in documents:
+        for field, values in document["structured_data"].items():
+            merged.setdefault(field, []).extend(values)
+    return merged
+
+
+def load_corpus(sources, artifact_dir=DEFAULT_ARTIFACT_DIR, workers=None):
+    """Load the whole knowledge base, ingesting changed pages first"""
+    if not sources:
+        text = get_fallback_content()
+        chunks, chunk_meta = chunk_sections("fallback", text_sections(text))
+        documents = [{
+            "key": "fallback",
+            "source_hash": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            "chunker_version": CHUNKER_VERSION,
+            "text": text,
+            "chunks": chunks,
+            "chunk_meta": chunk_meta,
+            "keyword_counts": chunk_keyword_counts(chunks),
+            "structured_data": {}
+        }]
+        changed = []
+    else:
+        documents, changed = ingest_corpus(sources, artifact_dir, workers)
+
+    return {
+        "text": "\n\n".join(document["text"] for document in documents),
+        "structured_data": merge_structured_data(documents),
+        "documents": documents,
+        "changed": changed
+    }
+
+
+# Fallback content when HTML file is not available
+def get_fallback_content():
+    return """
+    MEKO CLINIC - RHINOPLASTY SPECIALISTS
+
+    About Us:
+    Meko Clinic is a leading medical facility specializing in rhinoplasty (nose surgery) procedures.
+    We provide comprehensive cosmetic and reconstructive nose surgery services.
+
+    Our Services:
+    - Primary Rhinoplasty
+    - Revision Rhinoplasty
+    - Ethnic Rhinoplasty
+    - Functional Rhinoplasty
+    - Non-surgical Nose Jobs
+    - Consultation Services
+
+    Why Choose Meko Clinic:
+    - Expert surgeons with years of experience
+    - State-of-the-art facilities
+    - Personalized treatment plans
+    - Comprehensive aftercare support
+    - Natural-looking results
+
+    Procedure Information:
+    Rhinoplasty can address various concerns including:
+    - Nose size and shape
+    - Nostril size and shape
+    - Nasal tip refinement
+    - Bridge adjustments
+    - Breathing improvements
+
+    Recovery Process:
+    - Initial healing: 1-2 weeks
+    - Return to normal activities: 2-3 weeks
+    - Full results visible: 6-12 months
+
+    Consultation Process:
+    - Initial assessment
+    - Digital imaging
+    - Surgical planning
+    - Pre-operative instructions
+    - Follow-up care
+
+    Contact Information:
+    For consultations and appointments, please contact Meko Clinic directly.
+    We offer both in-person and virtual consultations.
+    """
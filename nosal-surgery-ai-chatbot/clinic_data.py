@@ -0,0 +1,169 @@
+"""
+Static clinic data for the Meko Clinic chatbot: supported languages and
+voices, quick response templates, related resources and the keyword
+tables used to route queries.
+"""
+
+# Language mapping with voice support
+LANGUAGES = {
+    "English": {"code": "en", "native": "English", "voice": "alloy"},
+    "Spanish": {"code": "es", "native": "Español", "voice": "nova"},
+    "French": {"code": "fr", "native": "Français", "voice": "alloy"},
+    "German": {"code": "de", "native": "Deutsch", "voice": "echo"},
+    "Italian": {"code": "it", "native": "Italiano", "voice": "alloy"},
+    "Portuguese": {"code": "pt", "native": "Português", "voice": "nova"},
+    "Russian": {"code": "ru", "native": "Русский", "voice": "fable"},
+    "Chinese": {"code": "zh", "native": "中文", "voice": "shimmer"},
+    "Japanese": {"code": "ja", "native": "日本語", "voice": "shimmer"},
+    "Korean": {"code": "ko", "native": "한국어", "voice": "onyx"},
+    "Arabic": {"code": "ar", "native": "العربية", "voice": "onyx"},
+    "Hindi": {"code": "hi", "native": "हिंदी", "voice": "nova"},
+    "Urdu": {"code": "ur", "native": "اردو", "voice": "nova"},
+    "Turkish": {"code": "tr", "native": "Türkçe", "voice": "echo"},
+    "Thai": {"code": "th", "native": "ไทย", "voice": "alloy"}
+}
+
+# Language detection mapping
+LANG_DETECT_MAP = {
+    "en": "English", "es": "Spanish", "fr": "French", "de": "German",
+    "it": "Italian", "pt": "Portuguese", "ru": "Russian", "zh": "Chinese",
+    "zh-cn": "Chinese", "zh-tw": "Chinese", "ja": "Japanese", "ko": "Korean",
+    "ar": "Arabic", "hi": "Hindi", "ur": "Urdu", "tr": "Turkish", "th": "Thai"
+}
+
+# Quick response templates for common questions
+QUICK_RESPONSES = {
+    "pricing": {
+        "Thai": "💰 ราคาเสริมจมูกแบบ Open เริ่มต้นที่ 99,000 บาท\n\nรายละเอียดเพิ่มเติม:\n- ราคาขึ้นอยู่กับความซับซ้อนของเคส\n- รวมค่าแพทย์ ค่าห้องผ่าตัด และการดูแลหลังผ่าตัด\n- มีโปรโมชั่นและผ่อนชำระได้\n\nติดต่อสอบถามราคา: +66 2 272 0022",
+        "English": "💰 Open Rhinoplasty pricing starts at 99,000 THB\n\nDetails:\n- Price varies based on case complexity\n- Includes surgeon, operating room, and post-op care\n- Promotions and payment plans available\n\nContact for pricing: +66 2 272 0022"
+    },
+    "consultation": {
+        "Thai": "📋 การปรึกษาแพทย์\n\n✅ ปรึกษาฟรีผ่านออนไลน์\n✅ ประเมินใบหน้าดิจิทัล\n✅ วางแผนการผ่าตัด\n✅ คำแนะนำก่อนผ่าตัด\n\nนัดหมาย: +66 2 272 0022\nหรือ Facebook Messenger: @MEKOCLINIC",
+        "English": "📋 Consultation Process\n\n✅ Free online consultation\n✅ Digital facial assessment\n✅ Surgical planning\n✅ Pre-operative instructions\n\nBook appointment: +66 2 272 0022\nOr Facebook Messenger: @MEKOCLINIC"
+    },
+    "recovery": {
+        "Thai": "🩹 ระยะเวลาพักฟื้น\n\n• 1-2 สัปดาห์: แผลเริ่มหาย\n• 2-3 สัปดาห์: กลับไปทำงานได้\n• 6-12 เดือน: ผลลัพธ์เต็มที่\n\nการดูแลหลังผ่าตัด:\n- หลีกเลี่ยงการกระทบกระเทือน\n- ทำความสะอาดตามคำแนะนำ\n- มาพบแพทย์ตามนัด",
+        "English": "🩹 Recovery Timeline\n\n• 1-2 weeks: Initial healing\n• 2-3 weeks: Return to work\n• 6-12 months: Full results\n\nPost-op care:\n- Avoid trauma to nose\n- Follow cleaning instructions\n- Attend follow-up appointments"
+    },
+    "contact": {
+        "Thai": "📞 ติดต่อเมโกะคลินิก\n\n📱 เบอร์โทร: +66 2 272 0022\n💬 Facebook Messenger: @MEKOCLINIC\n📧 WhatsApp: +66 2 272 0022\n🌐 เว็บไซต์: mekoclinic.com\n\n📍 สาขา: กรุงเทพฯ, ประเทศไทย",
+        "English": "📞 Contact Meko Clinic\n\n📱 Phone: +66 2 272 0022\n💬 Facebook Messenger: @MEKOCLINIC\n📧 WhatsApp: +66 2 272 0022\n🌐 Website: mekoclinic.com\n\n📍 Location: Bangkok, Thailand"
+    }
+}
+
+# Related links and resources database
+RELATED_RESOURCES = {
+    "rhinoplasty": {
+        "videos": [
+            {
+                "title": "เสริมจมูก ครั้งแรกในชีวิตถึงกับร้องโอโหห ต้องที่ เมโกะคลินิก",
+                "url": "https://www.youtube.com/watch?v=example1",
+                "description": "รีวิวจากผู้ป่วยจริงที่ทำเสริมจมูกครั้งแรก"
+            },
+            {
+                "title": "คุณพลอย พลอยพรรณ เผยจมูกใหม่สวยเป๊ะ ที่เมโกะ คลินิก",
+                "url": "https://www.youtube.com/watch?v=example2",
+                "description": "ผลลัพธ์หลังเสริมจมูก Open technique"
+            },
+            {
+                "title": "เสริมจมูก Open ปรับเปลี่ยนโครงสร้างจมูกให้สโลปสวย",
+                "url": "https://www.youtube.com/watch?v=example3",
+                "description": "เทคนิคการเสริมจมูกแบบเปิด"
+            }
+        ],
+        "websites": [
+            {
+                "title": "Meko Clinic Official Website",
+                "url": "https://mekoclinic.com",
+                "description": "เว็บไซต์หลักของเมโกะคลินิก"
+            },
+            {
+                "title": "Rhinoplasty Information - Mayo Clinic",
+                "url": "https://www.mayoclinic.org/tests-procedures/rhinoplasty/about/pac-20384532",
+                "description": "ข้อมูลทางการแพทย์เกี่ยวกับการเสริมจมูก"
+            },
+            {
+                "title": "American Society of Plastic Surgeons - Rhinoplasty",
+                "url": "https://www.plasticsurgery.org/cosmetic-procedures/rhinoplasty",
+                "description": "ข้อมูลจากสมาคมศัลยกรรมพลาสติกอเมริกัน"
+            }
+        ]
+    },
+    "recovery": {
+        "videos": [
+            {
+                "title": "การดูแลหลังเสริมจมูก - 7 วันแรก",
+                "url": "https://www.youtube.com/watch?v=recovery1",
+                "description": "คำแนะนำการดูแลหลังผ่าตัด"
+            }
+        ],
+        "websites": [
+            {
+                "title": "Post-Operative Care Guide",
+                "url": "https://mekoclinic.com/recovery-guide",
+                "description": "คู่มือการดูแลหลังผ่าตัด"
+            }
+        ]
+    },
+    "consultation": {
+        "videos": [
+            {
+                "title": "ขั้นตอนการปรึกษาแพทย์ที่เมโกะคลินิก",
+                "url": "https://www.youtube.com/watch?v=consult1",
+                "description": "ขั้นตอนการนัดปรึกษาและประเมิน"
+            }
+        ],
+        "websites": [
+            {
+                "title": "Book Consultation - Meko Clinic",
+                "url": "https://mekoclinic.com/book-consultation",
+                "description": "จองนัดปรึกษาแพทย์ออนไลน์"
+            }
+        ]
+    }
+}
+
+# Keyword tables routed through one shared matcher, as {table: {category: keywords}}
+KEYWORD_TABLES = {
+    # Any hit marks a query as clinic-related
+    "clinic": {
+        "clinic": [
+            "rhinoplasty", "nose surgery", "nose job", "เสริมจมูก", "จมูก", "surgery",
+            "clinic", "doctor", "procedure", "recovery", "consultation", "price",
+            "cost", "appointment", "meko", "เมโกะ", "ผ่าตัด", "ศัลยกรรม"
+        ]
+    },
+    # Quick response template to answer with
+    "quick_response": {
+        "pricing": ["pricing", "ราคา", "price", "cost"],
+        "consultation": ["consultation", "ปรึกษา", "consult"],
+        "recovery": ["recovery", "พักฟื้น"],
+        "contact": ["contact", "ติดต่อ"]
+    },
+    # Related resources category named in the query, plus general rhinoplasty topics
+    "related": {
+        **{category: [category] for category in RELATED_RESOURCES},
+        "topic": ["rhinoplasty", "nose", "surgery", "เสริมจมูก", "จมูก", "ผ่าตัด"]
+    },
+    # Resource search categories
+    "resources": {
+        "rhinoplasty": ["rhinoplasty", "nose surgery", "เสริมจมูก", "จมูก"],
+        "recovery": ["recovery", "healing", "post-op", "พักฟื้น", "หาย"],
+        "consultation": ["consultation", "appointment", "ปรึกษา", "นัด"],
+        "pricing": ["price", "cost", "ราคา", "ค่าใช้จ่าย"],
+        "contact": ["contact", "phone", "email", "ติดต่อ", "โทร"]
+    },
+    # Keyword-based content selection when semantic search has no result
+    "content": {
+        "procedure": ["procedure", "surgery", "operation", "rhinoplasty", "nose job", "plastic surgery", "เสริมจมูก", "ผ่าตัด"],
+        "recovery": ["recovery", "healing", "aftercare", "post-op", "swelling", "bruising", "rest", "พักฟื้น", "หาย"],
+        "cost": ["cost", "price", "fee", "payment", "insurance", "financing", "expensive", "ราคา", "ค่าใช้จ่าย"],
+        "consultation": ["consultation", "appointment", "visit", "meet", "doctor", "surgeon", "ปรึกษา", "นัดหมาย"],
+        "types": ["types", "kinds", "different", "options", "primary", "revision", "ethnic", "แบบ", "ประเภท"],
+        "results": ["results", "outcome", "before", "after", "expect", "appearance", "look", "ผลลัพธ์", "ผลงาน"]
+    },
+    # General medical terms that boost a content section
+    "medical": {
+        "medical": ["rhinoplasty", "nose", "surgery", "procedure", "clinic", "doctor", "patient", "จมูก", "เมโกะ"]
+    }
+}
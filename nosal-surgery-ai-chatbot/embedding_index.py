@@ -0,0 +1,169 @@
+"""
+Optional embedding index for the Meko Clinic chatbot.
+
+Character n-grams cannot match "how long until swelling goes down" to a Thai
+paragraph about พักฟื้น; multilingual embeddings can. Chunk embeddings are
+computed offline with the OpenAI embeddings API (``python cli.py
+build-embeddings``) and stored next to the search index:
+
+    search_index/embeddings/<model>-<dimensions>/<corpus hash>.npy
+
+as float16 (chunks x dimensions), row-aligned with the search index chunks
+of the same corpus version. The file is memory-mapped and upcast to float32
+once per process, so scoring every chunk against a query is a single BLAS
+matrix-vector product. Query embeddings are cached, so repeated questions
+cost no API call. Without the file, search stays lexical.
+
+The model, size and directory come from ``EMBEDDING_MODEL``,
+``EMBEDDING_DIMENSIONS`` and ``EMBEDDINGS_DIR`` (``embedding_settings``),
+read by both the build command and the engine, and a file whose width does
+not match the configured size is not loaded. Query embeddings are requested
+with a short timeout and no retries; after a failure, queries skip
+embeddings for ``EMBEDDING_RETRY_SECONDS`` and search stays lexical.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from search_index import DEFAULT_INDEX_DIR
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 512
+EMBEDDING_BATCH_SIZE = 256
+DEFAULT_EMBEDDINGS_DIR = os.path.join(DEFAULT_INDEX_DIR, "embeddings")
+
+# Query embeddings sit on the retrieval path of every uncached turn: fail fast and leave the endpoint alone a while
+EMBEDDING_QUERY_TIMEOUT = 2.0
+EMBEDDING_RETRY_SECONDS = 60.0
+
+
+def embedding_settings():
+    """(model, dimensions, directory) of the embedding index, from the environment or the defaults"""
+    return (os.getenv("EMBEDDING_MODEL", EMBEDDING_MODEL),
+            int(os.getenv("EMBEDDING_DIMENSIONS", EMBEDDING_DIMENSIONS)),
+            os.getenv("EMBEDDINGS_DIR", DEFAULT_EMBEDDINGS_DIR))
+
+
+def embeddings_path(corpus_version, embeddings_dir=DEFAULT_EMBEDDINGS_DIR, model=EMBEDDING_MODEL,
+                    dimensions=EMBEDDING_DIMENSIONS):
+    """Embedding file for a corpus version, model and size"""
+    return os.path.join(embeddings_dir, f"{model}-{dimensions}", f"{corpus_version}.npy")
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def embed_texts(client, texts, model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS,
+                batch_size=EMBEDDING_BATCH_SIZE):
+    """L2-normalized float32 embeddings of texts, requested in batches"""
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        response = client.embeddings.create(model=model, input=texts[start:start + batch_size],
+                                            dimensions=dimensions)
+        vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+    return _normalize(np.asarray(vectors, dtype=np.float32))
+
+
+def build_embeddings(client, chunks, path, model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS):
+    """Embed every chunk and write them as float16, replacing any previous file atomically"""
+    vectors = embed_texts(client, chunks, model, dimensions)
+    if vectors.shape[1] != dimensions:
+        raise ValueError(f"{model} returned {vectors.shape[1]}-dimensional embeddings, expected {dimensions}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}.npy"
+    np.save(tmp_path, vectors.astype(np.float16))
+    os.replace(tmp_path, path)
+
+    # Only the current corpus version is kept per model
+    for filename in os.listdir(os.path.dirname(path)):
+        if filename.endswith(".npy") and filename != os.path.basename(path):
+            os.remove(os.path.join(os.path.dirname(path), filename))
+    return vectors.shape
+
+
+class QueryEmbedder:
+    """Embeds queries with the model the chunks were embedded with, caching recent ones
+
+    A failed request (timeout included) makes queries raise without calling
+    the API for ``retry_seconds``, so callers fall back to lexical scores.
+    """
+
+    def __init__(self, client, model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS, cache_size=1024,
+                 retry_seconds=EMBEDDING_RETRY_SECONDS):
+        self.client = client
+        self.model = model
+        self.dimensions = dimensions
+        self.cache_size = cache_size
+        self.retry_seconds = retry_seconds
+        self._unavailable_until = 0.0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, query):
+        return self.embed_many([query])[0]
+
+    def embed_many(self, queries):
+        """Embeddings of queries as rows, requesting only the ones not cached in one batch"""
+        keys = [query.strip().lower() for query in queries]
+        with self._lock:
+            vectors = {key: self._cache[key] for key in keys if key in self._cache}
+            for key in vectors:
+                self._cache.move_to_end(key)
+
+        # Each uncached query is embedded once, as first written
+        missing = {}
+        for key, query in zip(keys, queries):
+            if key not in vectors:
+                missing.setdefault(key, query)
+        if missing:
+            if time.monotonic() < self._unavailable_until:
+                raise RuntimeError("Query embeddings unavailable after a recent failure")
+            try:
+                embedded = embed_texts(self.client, list(missing.values()), self.model, self.dimensions)
+            except Exception:
+                self._unavailable_until = time.monotonic() + self.retry_seconds
+                raise
+            vectors.update(zip(missing, embedded))
+            with self._lock:
+                for key in missing:
+                    self._cache[key] = vectors[key]
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return np.stack([vectors[key] for key in keys])
+
+
+class EmbeddingIndex:
+    """Chunk embeddings of one corpus version, scored against queries by cosine similarity"""
+
+    def __init__(self, vectors, embed_query):
+        self.vectors = vectors
+        self.embed_query = embed_query
+
+    @classmethod
+    def load(cls, path, embed_query):
+        """Load an embedding file, or return None if it has not been built
+
+        Raises ``ValueError`` if its vectors are not as wide as the query embedder's.
+        """
+        if not os.path.exists(path):
+            return None
+        vectors = np.load(path, mmap_mode="r")
+        if vectors.ndim != 2 or vectors.shape[1] != embed_query.dimensions:
+            raise ValueError(f"{path} holds {vectors.shape[-1]}-dimensional embeddings, "
+                             f"expected {embed_query.dimensions}")
+        # Upcast once: float16 halves the file, float32 keeps queries on the BLAS fast path
+        return cls(np.asarray(vectors, dtype=np.float32), embed_query)
+
+    def scores(self, query):
+        """Cosine similarity of every chunk to the query"""
+        return self.vectors @ self.embed_query(query)
+
+    def scores_batch(self, queries):
+        """Cosine similarity of every chunk to each query, one row per query"""
+        return self.embed_query.embed_many(queries) @ self.vectors.T
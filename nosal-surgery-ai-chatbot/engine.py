@@ -0,0 +1,684 @@
+"""
+Chat engine for the Meko Clinic chatbot.
+
+Everything that answers a question, without any Streamlit dependency:
+language detection, retrieval, related resources, the streamed completion,
+transcription and speech. One ``ChatEngine`` per process holds the knowledge
+base, the search index, the OpenAI clients and the caches, and serves every
+conversation concurrently, whether it comes from a Streamlit session
+(``engine_client.LocalEngineClient``) or from the HTTP service in
+``service.py``.
+"""
+
+import asyncio
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from answer_cache import DEFAULT_CACHE_PATH, AnswerCache, normalize_query
+from audio_cache import DEFAULT_AUDIO_CACHE_DIR, AudioCache
+from clinic_content import DEFAULT_ARTIFACT_DIR, DEFAULT_CORPUS_DIR, corpus_sources, load_corpus
+from clinic_data import LANGUAGES, QUICK_RESPONSES, RELATED_RESOURCES
+from keyword_matcher import KEYWORD_MATCHER, TermFrequencyTable, categories, keyword_weights, match_keywords, weight_vector
+from language_id import identify_language
+from memory_usage import object_bytes, process_memory_bytes
+from openai_client import create_async_client, create_client
+from pipeline import StageTimings
+from speech import TTS_MODEL, TTS_SPEED, split_speech_segments, synthesize_bytes, voice_for_language
+from tokens import count_message_tokens, count_tokens, truncate_to_tokens, truncate_to_words
+
+ERROR_MESSAGES = {
+    "Thai": "❌ เกิดข้อผิดพลาดในการประมวลผล: {error}",
+    "Urdu": "❌ جواب بناتے وقت خرابی: {error}",
+    "Arabic": "❌ خطأ في معالجة الطلب: {error}",
+    "Hindi": "❌ उत्तर बनाने में त्रुटि: {error}",
+    "Spanish": "❌ Error al procesar la solicitud: {error}",
+    "French": "❌ Erreur lors du traitement: {error}",
+    "German": "❌ Fehler bei der Verarbeitung: {error}",
+    "Chinese": "❌ 处理请求时出错: {error}",
+    "Japanese": "❌ 処理エラー: {error}"
+}
+
+
+# Web search functionality using OpenAI's web search
+def search_web_for_resources(query, language="English"):
+    """Get related resources from predefined database instead of web search"""
+    try:
+        # Return predefined resources based on query keywords
+        matched_categories = categories(match_keywords(query), "resources")
+
+        # Find matching resources
+        matching_resources = []
+        for category in matched_categories:
+            if category in RELATED_RESOURCES:
+                resources = RELATED_RESOURCES[category]
+                if "videos" in resources:
+                    matching_resources.extend(resources["videos"][:2])
+                if "websites" in resources:
+                    matching_resources.extend(resources["websites"][:2])
+
+        # If no specific matches, return general rhinoplasty resources
+        if not matching_resources and "rhinoplasty" in RELATED_RESOURCES:
+            resources = RELATED_RESOURCES["rhinoplasty"]
+            if "videos" in resources:
+                matching_resources.extend(resources["videos"][:2])
+            if "websites" in resources:
+                matching_resources.extend(resources["websites"][:2])
+
+        return matching_resources
+
+    except Exception:
+        return []
+
+
+# Get related resources based on query
+def get_related_resources(user_query, language="English"):
+    """Get related video and website links based on user query"""
+    matched_categories = categories(match_keywords(user_query), "related")
+
+    # Check predefined resources first
+    related_links = []
+
+    for category, resources in RELATED_RESOURCES.items():
+        if category in matched_categories or "topic" in matched_categories:
+            if "videos" in resources:
+                related_links.extend(resources["videos"][:2])  # Limit to 2 videos
+            if "websites" in resources:
+                related_links.extend(resources["websites"][:2])  # Limit to 2 websites
+
+    # If no predefined resources found, try the updated search function
+    if not related_links:
+        try:
+            search_results = search_web_for_resources(user_query, language)
+            if search_results:
+                related_links = search_results[:4]  # Limit to 4 results
+        except Exception as e:
+            # Silently handle any errors to prevent chatbot crashes
+            pass
+
+    return related_links
+
+
+# Format related resources for display
+def format_related_resources(links, language="English"):
+    """Format related resources for display in the response"""
+    if not links:
+        return ""
+
+    if language == "Thai":
+        header = "\n\n📺 **วิดีโอและลิงก์ที่เกี่ยวข้อง:**\n"
+    else:
+        header = "\n\n📺 **Related Videos & Links:**\n"
+
+    formatted_links = header
+
+    for i, link in enumerate(links[:4], 1):  # Limit to 4 links
+        title = link.get("title", "Related Resource")
+        url = link.get("url", "#")
+        description = link.get("description", "")
+
+        formatted_links += f"{i}. **{title}**\n"
+        formatted_links += f"   🔗 [{url}]({url})\n"
+        if description:
+            formatted_links += f"   📝 {description}\n"
+        formatted_links += "\n"
+
+    return formatted_links
+
+
+# Smart query classification
+def classify_query(user_message, content_keywords):
+    """Classify if the query is clinic-related or general
+
+    ``content_keywords`` are the keywords of the clinic content, matched once
+    when the knowledge base is loaded (``ChatEngine.content_keywords``).
+    """
+    clinic_score = len(categories(match_keywords(user_message), "clinic"))
+
+    # Check if the clinic content itself has clinic-specific keywords
+    content_matches = len(categories(content_keywords, "clinic"))
+
+    # If query has clinic keywords or matches clinic content, it's clinic-related
+    if clinic_score > 0 or content_matches > 0:
+        return "clinic_related"
+    else:
+        return "general"
+
+
+def semantic_search(query, search_index, top_k=3):
+    """Hybrid BM25 + TF-IDF search over the clinic chunks, best first"""
+    if not search_index:
+        return []
+
+    try:
+        from search_index import hybrid_search
+
+        return hybrid_search(search_index, query, top_k)
+    except Exception:
+        # A broken index falls back to keyword selection rather than failing the request
+        return []
+
+
+def semantic_search_batch(queries, search_index, top_k=3):
+    """semantic_search for many queries at once, one result list per query"""
+    if not search_index:
+        return [[] for _ in queries]
+
+    from search_index import hybrid_search_batch
+
+    return hybrid_search_batch(search_index, list(queries), top_k)
+
+
+# Fit the best retrieved chunks into the token budget
+def assemble_context(results, max_tokens):
+    """Join retrieved chunks in rank order, skipping any that no longer fit"""
+    selected = []
+    remaining = max_tokens
+    for result in results:
+        # Chunks are joined with a blank line, which costs a token
+        chunk_tokens = count_tokens(result['content']) + 1
+        if chunk_tokens <= remaining:
+            selected.append(result['content'])
+            remaining -= chunk_tokens
+
+    # A best chunk larger than the whole budget is cut rather than dropped
+    if not selected and results:
+        return truncate_to_words(results[0]['content'], max_tokens)
+    return "\n\n".join(selected)
+
+
+# Prompt budgets, in tokens of the model's encoding
+CONTEXT_TOKENS = 7000
+MAX_RESPONSE_TOKENS = 800
+MIN_RESPONSE_TOKENS = 100
+RETRIEVAL_TOKENS = 1000
+RETRIEVAL_TOP_K = 5
+HISTORY_TOKENS = 150
+MAX_RESPONSE_WITH_RESOURCES_TOKENS = 1500
+
+
+# Keyword weights for content selection, from the shared keyword tables
+CONTENT_KEYWORD_WEIGHTS = keyword_weights("content")
+MEDICAL_TERM_WEIGHTS = keyword_weights("medical")
+
+
+@lru_cache(maxsize=1)
+def section_weights():
+    """Keyword weights of every chunk's score, as a vector built on first use so numpy stays off startup"""
+    return weight_vector(CONTENT_KEYWORD_WEIGHTS + MEDICAL_TERM_WEIGHTS)
+
+
+# Smart content selection based on user query with better token management
+def select_relevant_content(user_message, clinic_content, term_table, search_index=None, max_tokens=1500):
+    """Select the most relevant content based on user query with strict token limits"""
+    import numpy as np
+
+    # First try the search index if available, packing its best chunks into the budget
+    if search_index:
+        selected_content = assemble_context(semantic_search(user_message, search_index, RETRIEVAL_TOP_K), max_tokens)
+        if selected_content:
+            return selected_content
+
+    # Fallback to keyword scoring over the chunk term frequencies computed at ingest time,
+    # tripling the weight of keywords the query mentions
+    query_boosts = {keyword: 2 * CONTENT_KEYWORD_WEIGHTS[keyword] for keyword in match_keywords(user_message)}
+    scores = term_table.score(section_weights(), query_boosts)
+
+    # Select the top sections by relevance with strict token limit
+    selected_content = ""
+    current_tokens = 0
+
+    for row in np.argsort(-scores, kind="stable"):
+        section = term_table.chunks[row]
+        section_tokens = count_tokens(section)
+        if current_tokens + section_tokens <= max_tokens:
+            selected_content += section + "\n\n"
+            current_tokens += section_tokens
+        else:
+            # If we can't fit the full section, fit as many of its words as possible
+            if current_tokens < max_tokens * 0.8:  # Leave some buffer
+                partial_section = truncate_to_words(section, max_tokens - current_tokens)
+                if partial_section:
+                    selected_content += partial_section + "\n\n"
+            break
+
+    return selected_content.strip() if selected_content else truncate_to_tokens(clinic_content, max_tokens)
+
+
+def prior_turns(conversation_history, user_message):
+    """Conversation history without the current question, when the caller has already appended it"""
+    history = list(conversation_history or [])
+    if history and history[-1]["role"] == "user" and history[-1]["content"] == user_message:
+        return history[:-1]
+    return history
+
+
+# Pack the most recent messages into the history budget
+def build_conversation_context(conversation_history, max_tokens=HISTORY_TOKENS):
+    """Most recent messages as "role: content" lines, newest kept first, within max_tokens"""
+    lines = []
+    remaining = max_tokens
+    for msg in reversed(conversation_history or []):
+        # A single long message may take at most half the budget
+        line = truncate_to_tokens(f"{msg['role']}: {msg['content']}", min(remaining, max_tokens // 2))
+        if not line:
+            break
+        lines.append(line)
+        # Lines are joined with newlines, which cost a token each
+        remaining -= count_tokens(line) + 1
+    return "\n".join(reversed(lines))
+
+
+# Enhanced response generation with smart context management and related resources
+async def generate_response(user_message, detected_language, clinic_content, content_keywords, term_table,
+                            load_search_index, conversation_history, client, answer_cache, timings):
+    """Stream the assistant reply as text deltas, running independent stages concurrently"""
+    try:
+        # Classify query
+        query_type = classify_query(user_message, content_keywords)
+
+        # Check for quick response templates
+        for key in categories(match_keywords(user_message), "quick_response"):
+            responses = QUICK_RESPONSES.get(key, {})
+            if detected_language in responses:
+                base_response = responses[detected_language]
+                # Add related resources to quick responses
+                related_links = get_related_resources(user_message, detected_language)
+                if related_links:
+                    base_response += format_related_resources(related_links, detected_language)
+                yield base_response
+                return
+
+        lang_info = LANGUAGES.get(detected_language, LANGUAGES["English"])
+        native_name = lang_info["native"]
+
+        # Quick responses never need the index, so it is only loaded past this point
+        search_index = await timings.run_in_thread("search_index", load_search_index)
+
+        # Select relevant content with reduced token limit, while related resources are looked up. Retrieval
+        # sees the query as the answer cache does, so repeats differing in case or a trailing "?" get the same
+        # chunks and share cached answers
+        relevant_content, related_links = await asyncio.gather(
+            timings.run_in_thread("retrieval", select_relevant_content, normalize_query(user_message),
+                                  clinic_content, term_table, search_index, RETRIEVAL_TOKENS),
+            timings.run_in_thread("resources", get_related_resources, user_message, detected_language)
+        )
+
+        # Build conversation context within its token budget
+        context = build_conversation_context(conversation_history)
+        # Cached answers are scoped to the turns before this question, which the app has already appended
+        cache_scope = build_conversation_context(prior_turns(conversation_history, user_message))
+
+        # Serve repeated and near-duplicate questions from the answer cache, for the same conversation so far
+        cached_response = await timings.run_in_thread(
+            "answer_cache", answer_cache.lookup, user_message, detected_language, relevant_content, search_index,
+            cache_scope
+        )
+        if cached_response is not None:
+            yield cached_response
+            return
+
+        # Create system prompt based on query type with reduced content
+        if query_type == "clinic_related":
+            system_prompt = f"""You are a medical assistant for Meko Clinic specializing in rhinoplasty.
+
+LANGUAGE: Respond in {detected_language} ({native_name} script)
+
+ROLE: Provide expert information about rhinoplasty procedures, recovery, consultations, and clinic services.
+
+CLINIC INFO:
+{relevant_content}
+
+CONVERSATION CONTEXT:
+{context}
+
+GUIDELINES:
+- Be professional, empathetic, and detailed
+- Use the provided clinic information as primary source
+- Recommend consulting doctors for medical advice
+- Include specific details about procedures, timelines, and care
+- Maintain medical confidentiality and ethics
+- If information is not in clinic data, clearly state it's general information"""
+        else:
+            system_prompt = f"""You are a helpful AI assistant.
+
+LANGUAGE: Respond in {detected_language} ({native_name} script)
+
+ROLE: Provide helpful information on general topics.
+
+GUIDELINES:
+- Be informative and helpful
+- Provide accurate information
+- Be conversational and friendly
+- If medical advice is requested, recommend consulting healthcare professionals"""
+
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ]
+
+        # Give the response whatever the exact prompt size leaves of the context
+        prompt_tokens = count_message_tokens(messages)
+        max_response_tokens = min(MAX_RESPONSE_TOKENS, CONTEXT_TOKENS - prompt_tokens)
+
+        # Ensure we don't exceed token limits
+        if max_response_tokens < MIN_RESPONSE_TOKENS:
+            max_response_tokens = MIN_RESPONSE_TOKENS
+
+        request_start = time.perf_counter()
+        stream = await client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=messages,
+            temperature=0.7,
+            max_tokens=max_response_tokens,
+            top_p=0.9,
+            frequency_penalty=0.1,
+            presence_penalty=0.1,
+            stream=True
+        )
+
+        # Yield deltas as they arrive so the UI can render the first words immediately
+        base_response = ""
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if not base_response:
+                    timings.record("llm_first_token", request_start)
+                base_response += delta
+                yield delta
+        timings.record("llm_total", request_start)
+
+        # Add related resources to the response if not already included (with token check)
+        if related_links and "📺" not in base_response and "Related" not in base_response:
+            resources_text = format_related_resources(related_links, detected_language)
+            if count_tokens(base_response) + count_tokens(resources_text) < MAX_RESPONSE_WITH_RESOURCES_TOKENS:
+                base_response += resources_text
+                yield resources_text
+
+        if base_response:
+            await timings.run_in_thread(
+                "cache_store", answer_cache.store, user_message, detected_language, relevant_content, base_response,
+                search_index, cache_scope
+            )
+
+    except Exception as e:
+        yield ERROR_MESSAGES.get(detected_language, "❌ Error generating response: {error}").format(error=str(e))
+
+
+# Whisper reports the language it detected by name ("thai"), and takes ISO 639-1 codes
+WHISPER_LANGUAGE_CODES = {name.lower(): info["code"] for name, info in LANGUAGES.items()}
+
+
+# Transcribe recorded audio in memory, returning (text, language Whisper heard)
+async def transcribe_audio(client, audio_bytes, filename="audio.wav", language=None):
+    transcription = await client.audio.transcriptions.create(
+        model="whisper-1",
+        file=(filename, audio_bytes),
+        response_format="verbose_json",
+        language=language,
+        temperature=0.2
+    )
+    return transcription.text.strip(), transcription.language
+
+
+async def transcribe_segments(client, segments, slots, language=None):
+    """Transcribe (filename, bytes) segments concurrently, at most ``slots`` at a time, and join them in order
+
+    ``language`` (an ISO 639-1 code) is passed to every request. Without
+    it Whisper detects the language of each segment on its own, and
+    segments heard in another language than most of the recording are
+    transcribed again in that language, so a short or mumbled segment does
+    not come back in the wrong language or script.
+    """
+    async def transcribe_segment(filename, audio_bytes, segment_language):
+        async with slots:
+            return await transcribe_audio(client, audio_bytes, filename, segment_language)
+
+    results = await asyncio.gather(*(transcribe_segment(filename, audio_bytes, language)
+                                     for filename, audio_bytes in segments))
+
+    if language is None and len(segments) > 1:
+        audio_per_language = {}
+        for (_, audio_bytes), (_, heard) in zip(segments, results):
+            audio_per_language[heard] = audio_per_language.get(heard, 0) + len(audio_bytes)
+        majority = max(audio_per_language, key=audio_per_language.get)
+        code = WHISPER_LANGUAGE_CODES.get(str(majority).lower())
+        outliers = [i for i, (_, heard) in enumerate(results) if heard != majority]
+        if code and outliers:
+            retried = await asyncio.gather(*(transcribe_segment(*segments[i], code) for i in outliers))
+            for i, result in zip(outliers, retried):
+                results[i] = result
+
+    return " ".join(text for text, _ in results if text)
+
+
+def load_knowledge_base():
+    """Every page of the clinic corpus, re-ingesting only changed pages"""
+    sources = corpus_sources(os.getenv("CLINIC_CORPUS_DIR", DEFAULT_CORPUS_DIR))
+    return load_corpus(sources, os.getenv("CLINIC_ARTIFACT_DIR", DEFAULT_ARTIFACT_DIR))
+
+
+# Concurrent TTS and transcription calls per engine process, shared by every conversation's segments
+SPEECH_WORKERS = int(os.getenv("SPEECH_WORKERS", 4))
+# Segments one reply may have queued or synthesizing at once, so a long reply cannot fill the speech pool
+# and hold back the first segment of another conversation's reply
+SPEECH_LOOKAHEAD = int(os.getenv("SPEECH_LOOKAHEAD", 2))
+TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", 4))
+
+
+class ChatEngine:
+    """Knowledge base, search index, OpenAI clients and caches shared by all conversations"""
+
+    def __init__(self, api_key, knowledge_base, answer_cache, audio_cache, client=None):
+        self.api_key = api_key
+        self.knowledge_base = knowledge_base
+        self.clinic_content = knowledge_base["text"]
+        self._term_table = None
+        # Keywords of the whole corpus, matched once here rather than on every message (and kept out of the
+        # match_keywords cache, which is sized for queries)
+        self.content_keywords = frozenset(KEYWORD_MATCHER.find(self.clinic_content))
+        self.answer_cache = answer_cache
+        self.audio_cache = audio_cache
+        self._client = client
+        self._async_client = None
+        self._search_index = None
+        self._index_loaded = False
+        self._shared_bytes = None
+        self._shared_bytes_state = None
+        self._client_lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._term_table_lock = threading.Lock()
+        self._speech_executor = ThreadPoolExecutor(max_workers=SPEECH_WORKERS, thread_name_prefix="speech")
+        self._transcription_slots = asyncio.Semaphore(TRANSCRIPTION_WORKERS)
+
+    @classmethod
+    def from_env(cls, api_key=None, client=None, knowledge_base=None):
+        """Build an engine configured from the environment, as the app and service do"""
+        return cls(
+            api_key=api_key or os.getenv("OPENAI_API_KEY"),
+            knowledge_base=knowledge_base or load_knowledge_base(),
+            answer_cache=AnswerCache(
+                path=os.getenv("ANSWER_CACHE_PATH", DEFAULT_CACHE_PATH),
+                ttl_seconds=int(os.getenv("ANSWER_CACHE_TTL", 7 * 24 * 3600)),
+                max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 5000))
+            ),
+            audio_cache=AudioCache(
+                cache_dir=os.getenv("AUDIO_CACHE_DIR", DEFAULT_AUDIO_CACHE_DIR),
+                max_bytes=int(os.getenv("AUDIO_CACHE_MAX_MB", 200)) * 1024 * 1024
+            ),
+            client=client
+        )
+
+    @property
+    def client(self):
+        """Sync OpenAI client, used for speech"""
+        with self._client_lock:
+            if self._client is None:
+                self._client = create_client(self.api_key)
+            return self._client
+
+    @property
+    def async_client(self):
+        """AsyncOpenAI client, bound to the event loop the engine is served from"""
+        with self._client_lock:
+            if self._async_client is None:
+                self._async_client = create_async_client(self.api_key)
+            return self._async_client
+
+    @property
+    def term_table(self):
+        """Keyword counts of every chunk, built on the first query so numpy loads then rather than at startup"""
+        with self._term_table_lock:
+            if self._term_table is None:
+                self._term_table = TermFrequencyTable.from_documents(self.knowledge_base["documents"])
+            return self._term_table
+
+    @property
+    def search_index(self):
+        """Prebuilt search index (python cli.py build-index), built in-process if missing
+
+        Chunk embeddings from ``python cli.py build-embeddings`` are attached
+        when they exist for the current corpus version.
+        """
+        with self._index_lock:
+            if not self._index_loaded:
+                try:
+                    # Deferred so numpy, scipy and scikit-learn load on the first query, not at startup
+                    from search_index import load_or_build_index
+                    self._search_index = load_or_build_index(self.knowledge_base["documents"])
+                except Exception:
+                    # Without an index, content selection falls back to keyword scoring
+                    self._search_index = None
+                if self._search_index is not None:
+                    self._attach_embeddings(self._search_index)
+                self._index_loaded = True
+            return self._search_index
+
+    def _attach_embeddings(self, search_index):
+        from embedding_index import (EMBEDDING_QUERY_TIMEOUT, EmbeddingIndex, QueryEmbedder, embedding_settings,
+                                     embeddings_path)
+
+        model, dimensions, embeddings_dir = embedding_settings()
+        path = embeddings_path(search_index['version'], embeddings_dir, model, dimensions)
+        try:
+            # Its own short timeout and no retries, so a slow endpoint costs a turn seconds, not minutes
+            query_client = self.client.with_options(timeout=EMBEDDING_QUERY_TIMEOUT, max_retries=0)
+            embedding_index = EmbeddingIndex.load(path, QueryEmbedder(query_client, model, dimensions))
+        except Exception:
+            # A corrupt or mismatched embedding file leaves search lexical
+            return
+        if embedding_index is not None and len(embedding_index.vectors) == len(search_index['chunks']):
+            search_index['embeddings'] = embedding_index
+
+    def memory_report(self):
+        """Bytes held once per process by the knowledge base and search index, and by the whole process"""
+        with self._index_lock:
+            # Everything measured here is read-only once loaded: measure again only when the table or index loads
+            state = (self._index_loaded, self._term_table is not None)
+            if self._shared_bytes is None or self._shared_bytes_state != state:
+                seen = set()
+                search_index = self._search_index if self._index_loaded else None
+                embedding_index = (search_index or {}).get('embeddings')
+                self._shared_bytes = {
+                    "clinic_content": object_bytes(self.knowledge_base, seen),
+                    "term_table": object_bytes(self._term_table, seen) if self._term_table else None,
+                    "search_index": object_bytes(
+                        {key: value for key, value in search_index.items() if key != 'embeddings'}, seen
+                    ) if search_index else None,
+                    "embeddings": object_bytes(embedding_index.vectors, seen) if embedding_index else None
+                }
+                self._shared_bytes_state = state
+        return {**self._shared_bytes, "process": process_memory_bytes()}
+
+    def info(self):
+        """Content, cache and memory figures for status displays"""
+        documents = self.knowledge_base["documents"]
+        return {
+            "content_chars": len(self.clinic_content),
+            "pages": [document["key"] for document in documents],
+            "fallback": documents[0]["key"] == "fallback",
+            "answer_cache": self.answer_cache.stats(),
+            "memory": self.memory_report()
+        }
+
+    def detect_language(self, text, previous=None):
+        return identify_language(text, previous=previous)
+
+    def classify(self, message):
+        return classify_query(message, self.content_keywords)
+
+    async def chat(self, message, language, history=None, timings=None):
+        """Stream the reply to one message as text deltas"""
+        timings = timings if timings is not None else StageTimings()
+        async for delta in generate_response(message, language, self.clinic_content, self.content_keywords,
+                                             self.term_table, lambda: self.search_index, history,
+                                             self.async_client, self.answer_cache, timings):
+            yield delta
+
+    async def transcribe(self, audio_bytes, timings=None, language=None, content_type=None):
+        """Transcribe a trimmed 16 kHz mono copy of a recording, loading the search index while it uploads
+
+        Long recordings are split at pauses and their segments transcribed
+        concurrently. ``language`` is the patient's chosen language, if any,
+        and ``content_type`` the upload's format, used when the audio header
+        does not tell it.
+        """
+        timings = timings if timings is not None else StageTimings()
+        code = LANGUAGES.get(language, {}).get("code")
+
+        async def preprocess_and_transcribe():
+            # Deferred so numpy and scipy load with the first recording, not at startup
+            from audio_processing import prepare_for_transcription
+
+            segments = await timings.run_in_thread(
+                "audio_preprocessing", lambda: prepare_for_transcription(audio_bytes, content_type=content_type))
+            return await timings.run("transcription", transcribe_segments(self.async_client, segments,
+                                                                          self._transcription_slots, code))
+
+        transcription, _ = await asyncio.gather(
+            preprocess_and_transcribe(),
+            asyncio.to_thread(lambda: self.search_index)
+        )
+        return transcription
+
+    async def _speech_segments(self, text, voice, speed, model):
+        """MP3 bytes of each segment of text in order, at most SPEECH_LOOKAHEAD at a time on the speech pool"""
+        loop = asyncio.get_running_loop()
+        segments = iter(split_speech_segments(text))
+
+        def submit(segment):
+            return loop.run_in_executor(self._speech_executor, synthesize_bytes, self.client, segment, voice,
+                                        self.audio_cache, speed, model)
+
+        # Submitted in order, the next one as each finishes, so other replies' segments queue between them
+        futures = deque(submit(segment) for segment in itertools.islice(segments, SPEECH_LOOKAHEAD))
+        try:
+            while futures:
+                audio = await futures.popleft()
+                segment = next(segments, None)
+                if segment is not None:
+                    futures.append(submit(segment))
+                yield audio
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def speak_stream(self, text, language, speed=TTS_SPEED, model=TTS_MODEL):
+        """Yield the reply's speech as MP3 segments in order, as soon as each is synthesized
+
+        Only the segments are cached, so a replay reads each one from disk
+        and the cache holds every reply once.
+        """
+        voice = voice_for_language(language)
+        async for segment in self._speech_segments(text, voice, speed, model):
+            yield segment
+
+    async def speak(self, text, language, speed=TTS_SPEED, model=TTS_MODEL):
+        """Return the whole clip as MP3 bytes, calling TTS only for uncached segments"""
+        return b"".join([segment async for segment in self.speak_stream(text, language, speed, model)])
@@ -0,0 +1,149 @@
+"""
+Synchronous access to the chat engine for the Streamlit UI.
+
+``LocalEngineClient`` drives an in-process ``ChatEngine`` on a background
+event loop shared by all sessions. ``RemoteEngineClient`` talks to engine
+workers running ``service.py`` (set ``ENGINE_URL``), so many lightweight UI
+replicas can share a few engine processes. Both expose the same methods and
+the UI does not know which one it has.
+"""
+
+import base64
+import json
+import os
+
+from pipeline import EventLoopThread, StageTimings
+
+
+class ChatReply:
+    """Iterable of reply text deltas; ``query_type`` and ``timings`` are complete once it is exhausted"""
+
+    def __init__(self, query_type=None):
+        self.query_type = query_type
+        self.timings = {}
+        self._deltas = iter(())
+
+    def __iter__(self):
+        return self._deltas
+
+
+class LocalEngineClient:
+    """Runs an in-process ChatEngine on a shared background event loop"""
+
+    def __init__(self, engine, loop=None):
+        self.engine = engine
+        self.loop = loop or EventLoopThread().start()
+
+    def chat(self, message, language, history=None):
+        timings = StageTimings()
+        reply = ChatReply(query_type=self.engine.classify(message))
+        reply.timings = timings.durations
+        reply._deltas = self.loop.iterate(self.engine.chat(message, language, history, timings))
+        return reply
+
+    def transcribe(self, audio_bytes, language=None):
+        """Return (text, stage timings); ``language`` is the patient's chosen language, if any"""
+        timings = StageTimings()
+        text = self.loop.run(self.engine.transcribe(audio_bytes, timings, language))
+        return text, timings.durations
+
+    def speak(self, text, language):
+        """MP3 bytes of the synthesized clip"""
+        return self.loop.run(self.engine.speak(text, language))
+
+    def speak_stream(self, text, language):
+        """MP3 segments of the clip in playback order, each as soon as it is synthesized"""
+        return self.loop.iterate(self.engine.speak_stream(text, language))
+
+    def detect_language(self, text, previous=None):
+        return self.engine.detect_language(text, previous)
+
+    def info(self):
+        return self.engine.info()
+
+
+class RemoteEngineClient:
+    """Calls the chat engine HTTP service at ``base_url``, with the ``ENGINE_TOKEN`` bearer token if set"""
+
+    def __init__(self, base_url, token=None):
+        from openai_client import create_http_client
+
+        self.base_url = base_url.rstrip("/")
+        self.http = create_http_client()
+        token = token or os.getenv("ENGINE_TOKEN")
+        if token:
+            self.http.headers["Authorization"] = f"Bearer {token}"
+
+    def _url(self, path):
+        return f"{self.base_url}{path}"
+
+    def _post_json(self, path, payload):
+        response = self.http.post(self._url(path), json=payload)
+        if response.status_code >= 400:
+            raise RuntimeError(response.json().get("error", response.text))
+        return response.json()
+
+    def chat(self, message, language, history=None):
+        reply = ChatReply()
+        payload = {
+            "message": message,
+            "language": language,
+            "history": [
+                {"role": msg["role"], "content": msg["content"],
+                 "language": msg.get("language") or msg.get("detected_language")}
+                for msg in history or []
+            ]
+        }
+        reply._deltas = self._stream_chat(reply, payload)
+        return reply
+
+    def _stream_chat(self, reply, payload):
+        with self.http.stream("POST", self._url("/chat"), json=payload) as response:
+            if response.status_code >= 400:
+                response.read()
+                raise RuntimeError(response.json().get("error", response.text))
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["type"] == "delta":
+                    yield event["text"]
+                elif event["type"] == "done":
+                    reply.query_type = event["query_type"]
+                    reply.timings.update(event["timings"])
+
+    def transcribe(self, audio_bytes, language=None):
+        """Return (text, stage timings); ``language`` is the patient's chosen language, if any"""
+        response = self.http.post(self._url("/transcribe"), content=audio_bytes,
+                                  params={"language": language} if language else None,
+                                  headers={"Content-Type": "audio/wav"})
+        if response.status_code >= 400:
+            raise RuntimeError(response.json().get("error", response.text))
+        result = response.json()
+        return result["text"], result["timings"]
+
+    def speak(self, text, language):
+        """MP3 bytes of the synthesized clip"""
+        response = self.http.post(self._url("/speak"), json={"text": text, "language": language})
+        if response.status_code >= 400:
+            raise RuntimeError(response.json().get("error", response.text))
+        return response.content
+
+    def speak_stream(self, text, language):
+        """MP3 segments of the clip in playback order, each as soon as the service has synthesized it"""
+        payload = {"text": text, "language": language, "stream": True}
+        with self.http.stream("POST", self._url("/speak"), json=payload) as response:
+            if response.status_code >= 400:
+                response.read()
+                raise RuntimeError(response.json().get("error", response.text))
+            for line in response.iter_lines():
+                if line:
+                    yield base64.b64decode(json.loads(line)["audio"])
+
+    def detect_language(self, text, previous=None):
+        return self._post_json("/detect", {"text": text, "previous": previous})["language"]
+
+    def info(self):
+        response = self.http.get(self._url("/info"))
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,156 @@
+"""
+Multi-pattern keyword matching for the Meko Clinic chatbot.
+
+Every keyword table in ``clinic_data.KEYWORD_TABLES`` is compiled once into a
+single Aho–Corasick automaton. One pass over a message finds every keyword it
+contains, overlapping ones included ("nose surgery" also hits "surgery"), so
+the cost per message grows with the length of the message, not with the
+number of keywords.
+
+Content chunks are scanned once at ingest time; their keyword counts form a
+(chunks × keywords) term-frequency table, so scoring every chunk against a
+query is a single matrix-vector product. numpy is imported when the first
+table is built, not with the matcher, which the app needs at startup.
+"""
+
+import hashlib
+from collections import Counter, deque
+from functools import lru_cache
+
+from clinic_data import KEYWORD_TABLES
+
+
+class KeywordMatcher:
+    """Aho–Corasick automaton over a fixed set of case-insensitive keywords"""
+
+    def __init__(self, keywords):
+        self.keywords = sorted({keyword.lower() for keyword in keywords})
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+
+        # Trie of all keywords
+        for keyword in self.keywords:
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                state = next_state
+            self._output[state] = (keyword,)
+
+        # Failure links in breadth-first order, so each state also reports
+        # the keywords that end at its longest proper suffix
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    def _scan(self, text):
+        goto, fail, output = self._goto, self._fail, self._output
+        found = []
+        state = 0
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.extend(output[state])
+        return found
+
+    def find(self, text):
+        """Set of keywords occurring in text"""
+        return set(self._scan(text))
+
+    def counts(self, text):
+        """Number of occurrences of each keyword in text"""
+        return Counter(self._scan(text))
+
+
+# (table, category) labels of every keyword
+KEYWORD_LABELS = {}
+for _table, _categories in KEYWORD_TABLES.items():
+    for _category, _keywords in _categories.items():
+        for _keyword in _keywords:
+            KEYWORD_LABELS.setdefault(_keyword.lower(), []).append((_table, _category))
+
+KEYWORD_MATCHER = KeywordMatcher(KEYWORD_LABELS)
+
+# Term-frequency table columns, and a fingerprint of them stored with precomputed counts
+KEYWORD_COLUMNS = {keyword: column for column, keyword in enumerate(sorted(KEYWORD_LABELS))}
+KEYWORD_VERSION = hashlib.sha1("\n".join(KEYWORD_COLUMNS).encode("utf-8")).hexdigest()[:16]
+
+
+@lru_cache(maxsize=256)
+def match_keywords(text):
+    """Keywords of every table occurring in text, found in a single pass"""
+    return frozenset(KEYWORD_MATCHER.find(text))
+
+
+def categories(keywords, table):
+    """Categories of one keyword table hit by matched keywords, in table order"""
+    hit = {category for keyword in keywords for label, category in KEYWORD_LABELS[keyword] if label == table}
+    return [category for category in KEYWORD_TABLES[table] if category in hit]
+
+
+def keyword_weights(table):
+    """How many times each keyword is listed across a table's categories"""
+    return Counter(keyword.lower() for keywords in KEYWORD_TABLES[table].values() for keyword in keywords)
+
+
+def weight_vector(weights):
+    """Keyword weights as a vector over the term-frequency table columns"""
+    import numpy as np
+
+    vector = np.zeros(len(KEYWORD_COLUMNS), dtype=np.float32)
+    for keyword, weight in weights.items():
+        vector[KEYWORD_COLUMNS[keyword]] = weight
+    return vector
+
+
+def chunk_keyword_counts(chunks):
+    """Keyword counts of each chunk, as stored in the ingested artifacts"""
+    return [dict(KEYWORD_MATCHER.counts(chunk)) for chunk in chunks]
+
+
+class TermFrequencyTable:
+    """Keyword counts of every content chunk as a (chunks × keywords) matrix"""
+
+    def __init__(self, chunks, chunk_counts):
+        import numpy as np
+
+        self.chunks = chunks
+        self.matrix = np.zeros((len(chunks), len(KEYWORD_COLUMNS)), dtype=np.float32)
+        for row, counts in enumerate(chunk_counts):
+            for keyword, count in counts.items():
+                self.matrix[row, KEYWORD_COLUMNS[keyword]] = count
+
+    @classmethod
+    def from_documents(cls, documents):
+        """Table over the chunks of every page, using the counts computed at ingest time"""
+        chunks = []
+        chunk_counts = []
+        for document in documents:
+            chunks.extend(document["chunks"])
+            chunk_counts.extend(document.get("keyword_counts") or chunk_keyword_counts(document["chunks"]))
+        return cls(chunks, chunk_counts)
+
+    def score(self, weights, boosts=None):
+        """Weighted keyword count of every chunk; ``boosts`` maps keywords to extra weight"""
+        import numpy as np
+
+        scores = self.matrix @ weights
+        if boosts:
+            columns = [KEYWORD_COLUMNS[keyword] for keyword in boosts]
+            scores += self.matrix[:, columns] @ np.array(list(boosts.values()), dtype=np.float32)
+        return scores
@@ -0,0 +1,281 @@
+"""
+Language identification for the Meko Clinic chatbot.
+
+Detection runs in three deterministic steps, cheapest first:
+
+1. A single pass over the text builds a Unicode script histogram from a
+   precompiled code point table. Thai, Devanagari, Han, Kana, Hangul,
+   Cyrillic and Arabic script decide the language directly (Urdu and Arabic
+   are told apart by Urdu-only letters and common words).
+2. Latin-script text is tokenized once and scored against precompiled word
+   sets: romanized Thai, Urdu and Hindi, then stop words and accented
+   letters of the European languages and Turkish. The stop-word guess is
+   final with a clear lead (``MIN_LATIN_SCORE`` and ``MIN_LATIN_MARGIN``
+   over the runner-up), a greeting ("hola", "merci") or at most
+   ``MAX_SHORT_TEXT_WORDS`` words, where langdetect is unreliable ("Hola"
+   comes back Turkish); otherwise many European function words are shared,
+   so a narrow lead is checked by langdetect.
+3. Only text neither step settles goes to langdetect, which is seeded so
+   results are stable between runs and whose language profiles are loaded
+   in a background thread on first use rather than on the first fallback.
+
+Text that no step recognizes (a single word, a number) keeps the language of
+the previous message when one is given, so a short "ok" does not flip a Thai
+conversation to English.
+"""
+
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+
+from clinic_data import LANG_DETECT_MAP
+
+DEFAULT_LANGUAGE = "English"
+
+# Unicode script of every Basic Multilingual Plane code point (0 = other)
+SCRIPTS = ["other", "latin", "arabic", "thai", "devanagari", "han", "kana", "hangul", "cyrillic"]
+SCRIPT_RANGES = {
+    "latin": [(0x0041, 0x005A), (0x0061, 0x007A), (0x00C0, 0x024F)],
+    "arabic": [(0x0600, 0x06FF), (0x0750, 0x077F), (0xFB50, 0xFDFF), (0xFE70, 0xFEFF)],
+    "thai": [(0x0E00, 0x0E7F)],
+    "devanagari": [(0x0900, 0x097F)],
+    "han": [(0x3400, 0x4DBF), (0x4E00, 0x9FFF), (0xF900, 0xFAFF)],
+    "kana": [(0x3040, 0x309F), (0x30A0, 0x30FF), (0x31F0, 0x31FF), (0xFF66, 0xFF9F)],
+    "hangul": [(0x1100, 0x11FF), (0x3130, 0x318F), (0xAC00, 0xD7AF)],
+    "cyrillic": [(0x0400, 0x04FF)]
+}
+
+# Languages decided by script alone (Arabic script is split further below)
+SCRIPT_LANGUAGES = {
+    "thai": "Thai",
+    "devanagari": "Hindi",
+    "han": "Chinese",
+    "kana": "Japanese",
+    "hangul": "Korean",
+    "cyrillic": "Russian"
+}
+
+# Arabic script: letters used in Urdu but not Arabic, and common function words
+URDU_LETTERS = frozenset("ٹڈڑںےۓھہیکگپچ")
+URDU_WORDS = frozenset(["یہ", "کیا", "ہے", "اور", "میں", "کے", "کی", "کا", "ہیں", "سے", "کو", "نہیں"])
+ARABIC_WORDS = frozenset(["هذا", "في", "من", "على", "هل", "ما", "التي", "الذي", "إلى", "عن", "هي", "كم"])
+
+# Romanized Thai, Urdu and Hindi
+ROMAN_THAI_WORDS = frozenset(["chai", "mai", "krub", "krab", "kha", "arai", "yang", "ngai", "sabai", "khob", "khun"])
+ROMAN_URDU_WORDS = frozenset(["kya", "hai", "yaar", "kar", "hona", "lagta", "hota", "mera", "tera", "mujhe", "kitna", "aap"])
+ROMAN_HINDI_WORDS = frozenset(["kya", "hai", "kar", "hona", "mera", "tera", "hamara", "mata", "kitna", "aap", "mujhe", "nahi"])
+
+# Stop words and distinctive letters of the Latin-script languages
+LATIN_STOPWORDS = {
+    "English": frozenset(["the", "is", "and", "what", "how", "does", "do", "i", "my", "you", "can", "of", "to",
+                          "a", "it", "after", "much", "long", "are", "for", "with", "this", "will", "be", "in", "on",
+                          "have", "was", "there", "should", "could", "would", "please", "me", "your", "when", "why",
+                          "where", "which", "any", "or", "not", "am", "an", "since"]),
+    "Spanish": frozenset(["el", "la", "los", "las", "es", "y", "que", "cuánto", "cuesta", "de", "mi", "por",
+                          "una", "un", "con", "para", "cómo", "qué", "puedo", "después", "nariz", "cuál", "cuáles",
+                          "son", "dónde", "está", "quiero", "gustaría", "hay", "en", "del", "al", "lo", "se", "no",
+                          "me", "te", "su", "muy", "pero", "sí", "hola", "gracias", "tengo", "usted", "cuántos",
+                          "cuántas", "días", "desde"]),
+    "French": frozenset(["le", "la", "les", "est", "et", "que", "combien", "coûte", "je", "mon", "vous", "une",
+                         "des", "du", "pour", "avec", "après", "quel", "quelle", "quels", "nez", "peux", "est-ce",
+                         "où", "se", "sont", "trouve", "voudrais", "veux", "plusieurs", "de", "l", "d", "j", "ai",
+                         "au", "aux", "ce", "il", "elle", "nous", "ne", "pas", "en", "sur", "dans", "mais", "ou",
+                         "qui", "très", "bonjour", "merci", "avez", "suis", "mes", "votre", "vos", "cette",
+                         "jours", "depuis"]),
+    "German": frozenset(["der", "die", "das", "ist", "und", "wie", "was", "kostet", "ich", "mein", "sie", "ein",
+                         "eine", "nach", "mit", "für", "lange", "dauert", "nase", "kann", "nicht", "einen", "es",
+                         "gibt", "zu", "den", "dem", "des", "im", "auf", "auch", "wir", "bei", "von", "mir", "mich",
+                         "wann", "warum", "welche", "noch", "habe", "haben", "sind", "wird", "kein", "keine",
+                         "meine", "guten", "tag", "danke", "vor", "seit", "wieder"]),
+    "Italian": frozenset(["il", "lo", "gli", "è", "e", "che", "quanto", "costa", "di", "mio", "per", "una",
+                          "un", "con", "dopo", "come", "posso", "naso", "quale", "quali", "della", "sono", "mi",
+                          "dove", "si", "trova", "vorrei", "pagare", "rate", "del", "dell", "al", "ho", "ha", "non",
+                          "ma", "anche", "ci", "questo", "questa", "nel", "buongiorno", "grazie", "quanti",
+                          "quante", "giorni", "da"]),
+    "Portuguese": frozenset(["o", "os", "a", "as", "é", "e", "que", "quanto", "custa", "do", "da", "meu", "para",
+                             "uma", "um", "com", "depois", "como", "posso", "nariz", "não", "qual", "você", "onde", "fica",
+                             "quero", "gostaria", "pagar", "são", "quais", "de", "em", "no", "na", "ao", "mas",
+                             "tenho", "tem", "olá", "obrigado", "obrigada", "vocês", "quantos", "quantas", "dias",
+                             "está", "estou", "minha", "desde"]),
+    "Turkish": frozenset(["bir", "ve", "bu", "ne", "kadar", "nasıl", "için", "mi", "mı", "ben", "sonra",
+                          "burun", "ameliyatı", "ameliyat", "fiyatı", "nedir", "var", "mü", "olur", "çok", "nerede",
+                          "zaman", "istiyorum", "miyim", "misiniz", "nelerdir", "sürer", "merhaba", "kaç", "gün",
+                          "beri", "gerekiyor", "lütfen", "teşekkür", "ile", "yapabilir"])
+}
+# Greetings and thanks, often a whole first message: a hit decides the language without langdetect
+LATIN_GREETINGS = {
+    "English": frozenset(["hello", "hi", "hey", "thanks", "thank", "goodbye"]),
+    "Spanish": frozenset(["hola", "gracias", "buenos", "buenas", "adiós"]),
+    "French": frozenset(["bonjour", "bonsoir", "salut", "merci", "bonne"]),
+    "German": frozenset(["hallo", "guten", "danke", "morgen", "servus", "tschüss"]),
+    "Italian": frozenset(["ciao", "buongiorno", "buonasera", "grazie", "salve"]),
+    "Portuguese": frozenset(["olá", "oi", "obrigado", "obrigada", "bom", "boa"]),
+    "Turkish": frozenset(["merhaba", "selam", "teşekkür", "teşekkürler", "günaydın"])
+}
+LATIN_VOCABULARY = {language: stopwords | LATIN_GREETINGS.get(language, frozenset())
+                    for language, stopwords in LATIN_STOPWORDS.items()}
+# Below this score, or this margin over the runner-up, stop words are not trusted without langdetect
+MIN_LATIN_SCORE = 2
+MIN_LATIN_MARGIN = 2
+# Up to this many words langdetect is no better than a guess, so a sole stop-word leader stands
+MAX_SHORT_TEXT_WORDS = 3
+LATIN_LETTERS = {
+    "Spanish": frozenset("ñ¿¡"),
+    "French": frozenset("œèêëîç"),
+    "German": frozenset("ßäöü"),
+    "Portuguese": frozenset("ãõç"),
+    "Turkish": frozenset("ğışİöüç")
+}
+
+WORD_RE = re.compile(r"[^\W\d_]+(?:-[^\W\d_]+)?")
+
+
+@lru_cache(maxsize=1)
+def script_table():
+    """Index into SCRIPTS of every Basic Multilingual Plane code point, built on first use
+
+    numpy loads with the first message rather than at app startup.
+    """
+    import numpy as np
+
+    table = np.zeros(0x10000, dtype=np.uint8)
+    for script, ranges in SCRIPT_RANGES.items():
+        for start, end in ranges:
+            table[start:end + 1] = SCRIPTS.index(script)
+    return table
+
+
+def script_indices(text):
+    """Index into SCRIPTS of each character of text"""
+    import numpy as np
+
+    code_points = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    return script_table()[np.minimum(code_points, 0xFFFF)]
+
+
+def script_histogram(text):
+    """Count the characters of each script in text, in one pass"""
+    import numpy as np
+
+    counts = np.bincount(script_indices(text), minlength=len(SCRIPTS))
+    return dict(zip(SCRIPTS, counts.tolist()))
+
+
+def _arabic_script_language(text):
+    words = set(text.split())
+    urdu_score = len(URDU_WORDS & words) + len(URDU_LETTERS & set(text))
+    arabic_score = len(ARABIC_WORDS & words)
+    return "Urdu" if urdu_score > arabic_score else "Arabic"
+
+
+def _latin_language(text):
+    """(best guess, whether it is clear enough to skip langdetect) for Latin-script text"""
+    words = WORD_RE.findall(text.lower())
+    if not words:
+        return None, False
+
+    # Romanized Thai, Urdu and Hindi
+    word_set = set(words)
+    if ROMAN_THAI_WORDS & word_set:
+        return "Thai", True
+    urdu_score = len(ROMAN_URDU_WORDS & word_set)
+    hindi_score = len(ROMAN_HINDI_WORDS & word_set)
+    if urdu_score > hindi_score:
+        return "Urdu", True
+    if hindi_score > 0:
+        return "Hindi", True
+
+    # Stop words, plus letters that only some languages use
+    word_counts = Counter(words)
+    letters = set(text.lower())
+    scores = {}
+    for language, vocabulary in LATIN_VOCABULARY.items():
+        score = sum(count for word, count in word_counts.items() if word in vocabulary)
+        score += 2 * len(LATIN_LETTERS.get(language, frozenset()) & letters)
+        if score:
+            scores[language] = score
+    if not scores:
+        return None, False
+
+    ranked = sorted(scores.items(), key=lambda item: -item[1])
+    best, best_score = ranked[0]
+    runner_up_score = ranked[1][1] if len(ranked) > 1 else 0
+    if best_score == runner_up_score:
+        return None, False
+    clear_lead = best_score >= MIN_LATIN_SCORE and best_score - runner_up_score >= MIN_LATIN_MARGIN
+    greeting = not word_set.isdisjoint(LATIN_GREETINGS.get(best, ()))
+    return best, clear_lead or greeting or len(words) <= MAX_SHORT_TEXT_WORDS
+
+
+class FallbackDetector:
+    """Seeded langdetect, with its language profiles loaded in a background thread"""
+
+    def __init__(self, seed=0):
+        self.seed = seed
+        self._ready = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def preload(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load, name="langdetect-preload", daemon=True)
+                self._thread.start()
+        return self
+
+    def _load(self):
+        try:
+            # Profiles load on first use; seeding makes results repeatable between runs
+            from langdetect import DetectorFactory
+            from langdetect.detector_factory import init_factory
+            DetectorFactory.seed = self.seed
+            init_factory()
+        finally:
+            self._ready.set()
+
+    def wait(self):
+        """Block until the language profiles are loaded"""
+        self.preload()
+        self._ready.wait()
+        return self
+
+    def detect(self, text):
+        """Language name for text, or None if langdetect cannot tell"""
+        self.wait()
+        try:
+            from langdetect import detect
+            return LANG_DETECT_MAP.get(detect(text))
+        except Exception:
+            return None
+
+
+FALLBACK_DETECTOR = FallbackDetector()
+
+
+def identify_language(text, previous=None, fallback=FALLBACK_DETECTOR):
+    """Identify the language of text, keeping ``previous`` when the text gives no signal"""
+    # Warm the statistical fallback without blocking this call
+    fallback.preload()
+
+    histogram = script_histogram(text)
+
+    # Japanese mixes Han with Kana, so any Kana decides it
+    if histogram["kana"]:
+        return "Japanese"
+    native = max(("arabic",) + tuple(SCRIPT_LANGUAGES), key=lambda script: histogram[script])
+    if histogram[native]:
+        if native == "arabic":
+            return _arabic_script_language(text)
+        return SCRIPT_LANGUAGES[native]
+
+    if histogram["latin"]:
+        guess, confident = _latin_language(text)
+        if confident:
+            return guess
+        # Few or shared stop words ("es" is Spanish and German): langdetect decides, the guess breaks its silence
+        language = fallback.detect(text) or guess
+        if language:
+            return language
+
+    return previous or DEFAULT_LANGUAGE
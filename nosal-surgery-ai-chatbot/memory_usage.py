@@ -0,0 +1,82 @@
+"""
+Memory accounting for the Meko Clinic chatbot's sidebar report.
+
+The clinic content, term-frequency table and search index are loaded once
+per process by the shared ``ChatEngine``; a session only holds its own
+conversation. ``object_bytes`` measures either side by walking containers
+and object attributes, counting numpy buffers (and so scipy sparse matrices
+and fitted vectorizers) by their ``nbytes`` without importing numpy.
+"""
+
+import sys
+from types import ModuleType
+
+
+def object_bytes(obj, seen=None):
+    """Approximate deep size of obj in bytes, counting each shared object once
+
+    Pass the same ``seen`` set to several calls to leave out what an earlier
+    call already counted.
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or current is None or isinstance(current, (type, ModuleType)):
+            continue
+        seen.add(id(current))
+
+        nbytes = getattr(current, "nbytes", None)
+        if isinstance(nbytes, int) and hasattr(current, "dtype"):
+            # Views share their base's buffer, which is counted when reached directly
+            total += sys.getsizeof(current) if getattr(current, "base", None) is not None else nbytes
+            continue
+
+        total += sys.getsizeof(current)
+        if isinstance(current, (str, bytes, bytearray, int, float, bool)):
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        else:
+            if hasattr(current, "__dict__"):
+                stack.append(vars(current))
+            # Slotted records keep their fields outside any __dict__
+            for cls in type(current).__mro__:
+                slots = getattr(cls, "__slots__", ())
+                for slot in (slots,) if isinstance(slots, str) else slots:
+                    stack.append(getattr(current, slot, None))
+    return total
+
+
+def process_memory_bytes():
+    """Resident set size of this process, or None where it cannot be read"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+
+        # Peak rather than current, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+def format_bytes(num_bytes):
+    """Human-readable size, e.g. 1.4 MB"""
+    if num_bytes is None:
+        return "n/a"
+    for unit in ("B", "KB", "MB", "GB"):
+        if num_bytes < 1024 or unit == "GB":
+            return f"{num_bytes:.0f} {unit}" if unit == "B" else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+
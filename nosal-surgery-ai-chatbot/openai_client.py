@@ -0,0 +1,114 @@
+"""
+OpenAI client construction for the Meko Clinic chatbot.
+
+The clients are built without any network probe and each shares one pooled
+HTTP transport (keep-alive connections, tuned timeouts and retries) across
+all sessions in the process: the sync client for speech, the async client
+for the request pipeline. Connectivity is verified separately by an optional
+background health check so a slow endpoint never blocks a page load.
+"""
+
+import threading
+import time
+
+CONNECT_TIMEOUT = 5.0
+REQUEST_TIMEOUT = 60.0
+MAX_RETRIES = 2
+MAX_CONNECTIONS = 50
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 120.0
+
+
+def create_http_client():
+    """Pooled HTTP transport with keep-alive, shared by every request of the process"""
+    import httpx
+
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+    )
+
+
+def create_client(api_key):
+    """Build an OpenAI client without contacting the API"""
+    # The openai package takes a noticeable share of cold start, so import it on first use
+    import httpx
+    from openai import OpenAI
+
+    return OpenAI(
+        api_key=api_key,
+        http_client=create_http_client(),
+        timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+        max_retries=MAX_RETRIES
+    )
+
+
+def create_async_http_client():
+    """Pooled async HTTP transport for the request pipeline's event loop"""
+    import httpx
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+    )
+
+
+def create_async_client(api_key):
+    """Build an AsyncOpenAI client without contacting the API
+
+    Use it only from one event loop, since its connection pool is bound to
+    the loop that first uses it.
+    """
+    import httpx
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(
+        api_key=api_key,
+        http_client=create_async_http_client(),
+        timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+        max_retries=MAX_RETRIES
+    )
+
+
+class HealthCheck:
+    """Background connectivity check that lists models off the request path"""
+
+    def __init__(self, client, interval=300.0):
+        self.client = client
+        self.interval = interval
+        self.status = "pending"
+        self.latency = None
+        self.error = None
+        self.checked_at = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="openai-health-check", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            self.check()
+            time.sleep(self.interval)
+
+    def check(self):
+        start_time = time.time()
+        try:
+            self.client.models.list()
+            self.status = "ok"
+            self.error = None
+        except Exception as e:
+            self.status = "error"
+            self.error = str(e)
+        self.latency = time.time() - start_time
+        self.checked_at = time.time()
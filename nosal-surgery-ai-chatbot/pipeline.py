@@ -0,0 +1,69 @@
+"""
+Asyncio request pipeline for the Meko Clinic chatbot.
+
+Every OpenAI request of the process runs on one background event loop with a
+shared AsyncOpenAI client, so a session waiting on the network holds no
+thread of its own and concurrent sessions share pooled connections. Blocking
+stages (retrieval, resource lookup, answer cache) run in the loop's thread
+pool so independent ones overlap. Script threads drive the pipeline through
+``EventLoopThread.iterate``, which turns an async generator into the plain
+generator ``st.write_stream`` expects.
+"""
+
+import asyncio
+import threading
+import time
+
+
+class StageTimings:
+    """Wall-clock duration of each pipeline stage of one request, in seconds"""
+
+    def __init__(self):
+        self.durations = {}
+
+    async def run(self, name, awaitable):
+        """Await a stage and record how long it took"""
+        start_time = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.record(name, start_time)
+
+    def run_in_thread(self, name, func, *args):
+        """Run a blocking stage in the event loop's thread pool"""
+        return self.run(name, asyncio.to_thread(func, *args))
+
+    def record(self, name, start_time):
+        self.durations[name] = time.perf_counter() - start_time
+
+
+class EventLoopThread:
+    """Event loop running forever in a daemon thread, shared by all sessions"""
+
+    def __init__(self, name="request-pipeline"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+
+    def start(self):
+        if not self._thread.is_alive():
+            self._thread.start()
+        return self
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop, returning a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the loop and wait for its result"""
+        return self.submit(coro).result(timeout)
+
+    def iterate(self, agen):
+        """Drive an async generator from synchronous code, one item at a time"""
+        try:
+            while True:
+                try:
+                    yield self.run(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            self.run(agen.aclose())
@@ -0,0 +1,420 @@
+"""
+Semantic search index for the Meko Clinic chatbot.
+
+The index is built offline (``python cli.py build-index``) and written to a
+versioned directory under ``search_index/``:
+
+    search_index/v4-<corpus hash>/
+        manifest.json       format version, corpus hash, vectorizer settings
+        idf.npy             inverse document frequencies (memory-mapped on load)
+        tfidf_matrix.npz    sparse chunk x term TF-IDF matrix
+        bm25_postings.npz   inverted index: term x chunk BM25 weights, column-compressed
+        minhash.npy         MinHash signature of each chunk's term set, for near-duplicate checks
+        chunks.json         chunk texts, IDs, source pages and section anchors, row-aligned with the matrix
+    search_index/rows/
+        <page>-<hash>.npz   cached raw term counts for one version of one page
+
+Terms are character n-grams within word boundaries, so Thai text (which has
+no spaces between words) matches without a Thai word segmenter or English
+stop-word list. They are hashed into a fixed number of columns, so a page's
+term counts do not depend on the rest of the corpus: re-indexing after one
+page changes only re-vectorizes that page and recomputes the IDF weights.
+
+``hybrid_search`` blends BM25, which rewards chunks containing many of the
+query's rarer terms, with TF-IDF cosine similarity, which rewards chunks
+whose overall wording is close to the query. BM25 weights are precomputed per
+(term, chunk), so a query only sums the postings of its own terms, rarest
+first and within a fixed budget, so query time stays flat as the corpus
+grows: the n-grams skipped in a large corpus are the ones found in most
+chunks, which barely change the ranking. When the engine attaches an
+``embedding_index.EmbeddingIndex`` as ``search_index['embeddings']``, its
+cosine scores are blended in too, which lets queries match chunks written in
+another language.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+from scipy import sparse
+
+INDEX_FORMAT_VERSION = 4
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_index")
+
+HASHING_PARAMS = {
+    "analyzer": "char_wb",
+    "ngram_range": (2, 4),
+    "n_features": 2 ** 18,
+    "alternate_sign": False,
+    "norm": None
+}
+TFIDF_PARAMS = {"sublinear_tf": True}
+BM25_PARAMS = {"k1": 1.2, "b": 0.75}
+
+# Share of the hybrid score taken by BM25 (normalized to the best chunk) rather than cosine similarity
+BM25_WEIGHT = 0.5
+# Raw TF-IDF cosine (or embedding similarity) a chunk needs to be returned at all, checked before BM25 is
+# normalized to the best chunk, which would otherwise give some chunk a high score for any query
+MIN_SCORE = 0.1
+MIN_EMBEDDING_SCORE = 0.3
+# Chunks whose term sets are this similar (Jaccard, estimated by MinHash) to a better result are dropped
+DUPLICATE_SIMILARITY = 0.7
+MINHASH_PERMUTATIONS = 32
+MINHASH_PRIME = (1 << 31) - 1
+# Share of the final score taken by embedding similarity, when an embedding index is attached
+EMBEDDING_WEIGHT = 0.5
+# Postings a query may scan; past it the query's most common terms are skipped
+POSTINGS_BUDGET = 10000
+
+
+def make_hashing_vectorizer():
+    from sklearn.feature_extraction.text import HashingVectorizer
+    return HashingVectorizer(**HASHING_PARAMS)
+
+
+def bm25_postings(counts, k1=BM25_PARAMS["k1"], b=BM25_PARAMS["b"]):
+    """BM25 weight of every (chunk, term) pair of a chunk x term count matrix, column-compressed"""
+    counts = sparse.csr_matrix(counts, dtype=np.float64)
+    num_chunks = counts.shape[0]
+    lengths = np.asarray(counts.sum(axis=1)).ravel()
+    length_norms = k1 * (1 - b + b * lengths / max(lengths.mean(), 1e-9))
+
+    document_frequencies = np.bincount(counts.indices, minlength=counts.shape[1])
+    idf = np.log1p((num_chunks - document_frequencies + 0.5) / (document_frequencies + 0.5))
+
+    weights = counts.copy()
+    row_norms = np.repeat(length_norms, np.diff(counts.indptr))
+    weights.data = idf[counts.indices] * counts.data * (k1 + 1) / (counts.data + row_norms)
+    return weights.tocsc()
+
+
+def minhash_signatures(matrix, num_permutations=MINHASH_PERMUTATIONS, seed=0):
+    """MinHash signature of the term set of every row of a CSR matrix"""
+    rng = np.random.default_rng(seed)
+    multipliers = rng.integers(1, MINHASH_PRIME, num_permutations, dtype=np.int64)
+    offsets = rng.integers(0, MINHASH_PRIME, num_permutations, dtype=np.int64)
+
+    terms = matrix.indices.astype(np.int64)
+    non_empty = np.diff(matrix.indptr) > 0
+    signatures = np.full((matrix.shape[0], num_permutations), MINHASH_PRIME, dtype=np.uint32)
+    for permutation in range(num_permutations):
+        hashes = (multipliers[permutation] * terms + offsets[permutation]) % MINHASH_PRIME
+        if len(hashes):
+            # reduceat reads past empty rows, so only non-empty rows take its minimum
+            minimums = np.minimum.reduceat(hashes, np.minimum(matrix.indptr[:-1], len(hashes) - 1))
+            signatures[non_empty, permutation] = minimums[non_empty]
+    return signatures
+
+
+def corpus_version(documents):
+    """Short hash identifying the page versions (and how they were chunked) an index was built from"""
+    digest = hashlib.sha256()
+    for document in documents:
+        digest.update(f"{document['key']}\x00{document['source_hash']}\x00".encode("utf-8"))
+        digest.update(f"{document.get('chunker_version', '')}\x00".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def index_path(documents, index_dir=DEFAULT_INDEX_DIR):
+    """Directory holding the index for these pages and this format version"""
+    return os.path.join(index_dir, f"v{INDEX_FORMAT_VERSION}-{corpus_version(documents)}")
+
+
+def _rows_path(document, index_dir):
+    key_hash = hashlib.sha1(f"{document['key']}\x00{document.get('chunker_version', '')}".encode("utf-8")).hexdigest()[:8]
+    return os.path.join(index_dir, "rows", f"{key_hash}-{document['source_hash'][:16]}.npz")
+
+
+def build_index(documents, index_dir=None):
+    """Vectorize every page's chunks and return the search index
+
+    With ``index_dir``, term counts are cached per page version under
+    ``rows/`` and only pages without cached counts are re-vectorized.
+    """
+    from sklearn.feature_extraction.text import TfidfTransformer
+    from sklearn.pipeline import make_pipeline
+
+    hashing_vectorizer = make_hashing_vectorizer()
+    rows = []
+    chunks = []
+    chunk_sources = []
+    chunk_ids = []
+    chunk_anchors = []
+    revectorized = []
+
+    for document in documents:
+        rows_path = _rows_path(document, index_dir) if index_dir else None
+        if rows_path and os.path.exists(rows_path):
+            counts = sparse.load_npz(rows_path)
+        else:
+            counts = hashing_vectorizer.transform(document['chunks']).tocsr()
+            revectorized.append(document['key'])
+            if rows_path:
+                os.makedirs(os.path.dirname(rows_path), exist_ok=True)
+                sparse.save_npz(rows_path, counts)
+        rows.append(counts)
+        chunks.extend(document['chunks'])
+        chunk_sources.extend([document['key']] * len(document['chunks']))
+        chunk_meta = document.get('chunk_meta') or [{}] * len(document['chunks'])
+        chunk_ids.extend(meta.get('id') for meta in chunk_meta)
+        chunk_anchors.extend(meta.get('anchor') for meta in chunk_meta)
+
+    counts = sparse.vstack(rows).tocsr()
+    transformer = TfidfTransformer(**TFIDF_PARAMS).fit(counts)
+    tfidf_matrix = transformer.transform(counts).tocsr()
+
+    return {
+        'vectorizer': make_pipeline(hashing_vectorizer, transformer),
+        'tfidf_matrix': tfidf_matrix,
+        'tfidf_postings': tfidf_matrix.tocsc(),
+        'bm25_postings': bm25_postings(counts),
+        'minhash': minhash_signatures(counts),
+        'chunks': chunks,
+        'chunk_sources': chunk_sources,
+        'chunk_ids': chunk_ids,
+        'chunk_anchors': chunk_anchors,
+        'version': corpus_version(documents),
+        'revectorized': revectorized
+    }
+
+
+def prune_index_dir(documents, index_dir=DEFAULT_INDEX_DIR):
+    """Delete old index versions and cached counts for page versions no longer in the corpus"""
+    if not os.path.isdir(index_dir):
+        return
+
+    current_path = index_path(documents, index_dir)
+    for entry in os.scandir(index_dir):
+        if entry.is_dir() and entry.name.startswith("v") and entry.path != current_path:
+            shutil.rmtree(entry.path)
+
+    rows_dir = os.path.join(index_dir, "rows")
+    if os.path.isdir(rows_dir):
+        current_rows = {os.path.basename(_rows_path(document, index_dir)) for document in documents}
+        for filename in os.listdir(rows_dir):
+            if filename not in current_rows:
+                os.remove(os.path.join(rows_dir, filename))
+
+
+def save_index(search_index, path):
+    """Write a search index to disk, replacing any previous copy atomically"""
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    os.makedirs(tmp_path, exist_ok=True)
+
+    transformer = search_index['vectorizer'][-1]
+    np.save(os.path.join(tmp_path, "idf.npy"), np.asarray(transformer.idf_, dtype=np.float64))
+    sparse.save_npz(os.path.join(tmp_path, "tfidf_matrix.npz"), search_index['tfidf_matrix'], compressed=False)
+    sparse.save_npz(os.path.join(tmp_path, "bm25_postings.npz"), search_index['bm25_postings'], compressed=False)
+    np.save(os.path.join(tmp_path, "minhash.npy"), search_index['minhash'])
+    with open(os.path.join(tmp_path, "chunks.json"), "w", encoding="utf-8") as f:
+        json.dump({"chunks": search_index['chunks'], "ids": search_index['chunk_ids'],
+                   "sources": search_index['chunk_sources'], "anchors": search_index['chunk_anchors']},
+                  f, ensure_ascii=False)
+
+    manifest = {
+        "format_version": INDEX_FORMAT_VERSION,
+        "corpus_version": search_index['version'],
+        "vectorizer": {**HASHING_PARAMS, "ngram_range": list(HASHING_PARAMS["ngram_range"]), **TFIDF_PARAMS},
+        "bm25": BM25_PARAMS,
+        "num_chunks": len(search_index['chunks']),
+        "num_pages": len(set(search_index['chunk_sources'])),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+    with open(os.path.join(tmp_path, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+    return manifest
+
+
+def load_index(path):
+    """Load a saved search index, memory-mapping the IDF weights"""
+    from sklearn.feature_extraction.text import TfidfTransformer
+    from sklearn.pipeline import make_pipeline
+
+    with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest["format_version"] != INDEX_FORMAT_VERSION:
+        raise ValueError(f"Unsupported index format {manifest['format_version']} in {path}")
+
+    with open(os.path.join(path, "chunks.json"), encoding="utf-8") as f:
+        chunk_data = json.load(f)
+
+    transformer = TfidfTransformer(**TFIDF_PARAMS)
+    transformer.idf_ = np.load(os.path.join(path, "idf.npy"), mmap_mode="r")
+
+    tfidf_matrix = sparse.load_npz(os.path.join(path, "tfidf_matrix.npz")).tocsr()
+
+    return {
+        'vectorizer': make_pipeline(make_hashing_vectorizer(), transformer),
+        'tfidf_matrix': tfidf_matrix,
+        'tfidf_postings': tfidf_matrix.tocsc(),
+        'bm25_postings': sparse.load_npz(os.path.join(path, "bm25_postings.npz")).tocsc(),
+        'minhash': np.load(os.path.join(path, "minhash.npy")),
+        'chunks': chunk_data["chunks"],
+        'chunk_sources': chunk_data["sources"],
+        'chunk_ids': chunk_data["ids"],
+        'chunk_anchors': chunk_data["anchors"],
+        'version': manifest["corpus_version"],
+        'revectorized': []
+    }
+
+
+def load_or_build_index(documents, index_dir=DEFAULT_INDEX_DIR):
+    """Load the prebuilt index for these pages, building it in-process if missing"""
+    path = index_path(documents, index_dir)
+    if os.path.isdir(path):
+        return load_index(path)
+    return build_index(documents)
+
+
+def _query_tfidf(search_index, query_counts):
+    """L2-normalized TF-IDF weights of a query's terms, as the vectorizer pipeline computes them"""
+    transformer = search_index['vectorizer'][-1]
+    weights = (1 + np.log(query_counts.data)) if TFIDF_PARAMS["sublinear_tf"] else query_counts.data.copy()
+    weights *= transformer.idf_[query_counts.indices]
+    return weights / np.linalg.norm(weights)
+
+
+def hybrid_scores(search_index, query_counts):
+    """(blended BM25 and cosine score, raw cosine) of every chunk, summing only the postings of the query's terms"""
+    bm25_postings = search_index['bm25_postings']
+    query_tfidf = _query_tfidf(search_index, query_counts)
+    terms = query_counts.indices
+    starts = bm25_postings.indptr[terms]
+    lengths = bm25_postings.indptr[terms + 1] - starts
+
+    # Scan the rarest terms first, up to the postings budget
+    by_rarity = np.argsort(lengths, kind="stable")
+    kept = by_rarity[:max(1, int(np.searchsorted(np.cumsum(lengths[by_rarity]), POSTINGS_BUDGET, side="right")))]
+    starts, lengths, query_tfidf = starts[kept], lengths[kept], query_tfidf[kept]
+
+    positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+    rows = bm25_postings.indices[positions]
+    num_chunks = bm25_postings.shape[0]
+
+    # Both postings come from the same term counts, so they share positions; rows and query are
+    # L2-normalized, so summing the products gives the cosine similarity
+    query_weights = np.repeat(query_tfidf, lengths)
+    cosine = np.bincount(rows, search_index['tfidf_postings'].data[positions] * query_weights, num_chunks)
+    scores = cosine * (1 - BM25_WEIGHT)
+    bm25 = np.bincount(rows, bm25_postings.data[positions], num_chunks)
+    if bm25.max() > 0:
+        scores += bm25 * (BM25_WEIGHT / bm25.max())
+    return scores, cosine
+
+
+def _rank(search_index, scores, candidates, top_k):
+    """Results for the best-scoring candidates of one query, without near-duplicates or irrelevant (zero) scores"""
+    candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+    candidates = candidates[scores[candidates] > 0]
+    if not len(candidates):
+        return []
+
+    # Share of equal MinHash values estimates the Jaccard similarity of two chunks' term sets
+    signatures = search_index['minhash'][candidates]
+    duplicates = (signatures[:, None, :] == signatures[None, :, :]).mean(axis=2) >= DUPLICATE_SIMILARITY
+
+    results = []
+    kept = []
+    for position, row in enumerate(candidates):
+        if len(results) == top_k:
+            break
+        if duplicates[position, kept].any():
+            continue
+        kept.append(position)
+        results.append({
+            'chunk': int(row),
+            'id': search_index['chunk_ids'][row],
+            'content': search_index['chunks'][row],
+            'source': search_index['chunk_sources'][row],
+            'anchor': search_index['chunk_anchors'][row],
+            'score': float(scores[row])
+        })
+    return results
+
+
+def _top_candidates(scores, top_k):
+    """Unordered indices of the best top_k * 3 scores along the last axis, spares for dropped duplicates"""
+    num_candidates = min(scores.shape[-1], top_k * 3)
+    if num_candidates == scores.shape[-1]:
+        return np.broadcast_to(np.arange(num_candidates), scores.shape)
+    return np.argpartition(-scores, num_candidates - 1, axis=-1)[..., :num_candidates]
+
+
+def hybrid_search(search_index, query, top_k=3):
+    """Best chunks for a query by blended BM25, TF-IDF and embedding scores, without near-duplicates"""
+    if not len(search_index['chunks']):
+        return []
+
+    # Hashed term counts of the query, as canonical CSR (sorted, summed indices)
+    query_counts = search_index['vectorizer'][0].transform([query])
+    if query_counts.nnz:
+        scores, cosine = hybrid_scores(search_index, query_counts)
+    else:
+        scores = cosine = np.zeros(len(search_index['chunks']))
+    relevant = cosine > MIN_SCORE
+
+    embedding_index = search_index.get('embeddings')
+    if embedding_index is not None:
+        try:
+            similarities = embedding_index.scores(query)
+            scores = scores * (1 - EMBEDDING_WEIGHT) + similarities * EMBEDDING_WEIGHT
+            relevant |= similarities > MIN_EMBEDDING_SCORE
+        except Exception:
+            # Keep the lexical ranking when the query cannot be embedded
+            pass
+
+    scores = np.where(relevant, scores, 0)
+    return _rank(search_index, scores, _top_candidates(scores, top_k), top_k)
+
+
+def hybrid_search_batch(search_index, queries, top_k=3, batch_size=1024):
+    """hybrid_search over many queries, scoring each batch with one sparse matrix product per signal
+
+    Repeated queries are scored once. Every posting of every query term is
+    scored, so results can differ slightly from ``hybrid_search`` on large
+    corpora, where single queries skip their most common terms.
+    """
+    if not len(search_index['chunks']):
+        return [[] for _ in queries]
+    unique_queries = list(dict.fromkeys(queries))
+
+    hashing_vectorizer, transformer = search_index['vectorizer'][0], search_index['vectorizer'][-1]
+    chunk_tfidf = search_index['tfidf_matrix'].T.tocsr()
+    chunk_bm25 = search_index['bm25_postings'].T.tocsr()
+    embedding_index = search_index.get('embeddings')
+
+    results = {}
+    for start in range(0, len(unique_queries), batch_size):
+        batch = unique_queries[start:start + batch_size]
+        query_counts = hashing_vectorizer.transform(batch)
+        cosine = (transformer.transform(query_counts) @ chunk_tfidf).toarray()
+        relevant = cosine > MIN_SCORE
+        scores = cosine * (1 - BM25_WEIGHT)
+
+        # BM25 counts each distinct query term once, normalized to each query's best chunk
+        query_terms = query_counts.copy()
+        query_terms.data[:] = 1
+        bm25 = (query_terms @ chunk_bm25).toarray()
+        best_bm25 = bm25.max(axis=1, keepdims=True)
+        scores += np.divide(bm25 * BM25_WEIGHT, best_bm25, out=np.zeros_like(bm25), where=best_bm25 > 0)
+
+        if embedding_index is not None:
+            try:
+                similarities = embedding_index.scores_batch(batch)
+                scores = scores * (1 - EMBEDDING_WEIGHT) + similarities * EMBEDDING_WEIGHT
+                relevant |= similarities > MIN_EMBEDDING_SCORE
+            except Exception:
+                pass
+
+        scores = np.where(relevant, scores, 0)
+        candidates = _top_candidates(scores, top_k)
+        for query, row_scores, row_candidates in zip(batch, scores, candidates):
+            results[query] = _rank(search_index, row_scores, row_candidates, top_k)
+    return [results[query] for query in queries]
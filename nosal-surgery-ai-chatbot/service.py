@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+HTTP service for the Meko Clinic chat engine
+
+Serves one shared ChatEngine per worker process to the Streamlit UI (set
+ENGINE_URL=http://host:8000 for the app) and to other channels such as LINE
+or Messenger integrations.
+
+    POST /chat        {"message", "language"?, "history"?}
+                      → NDJSON stream of {"type": "delta", "text"} events, then
+                        {"type": "done", "language", "query_type", "timings"}
+    POST /transcribe  raw audio body (WAV, MP3, M4A, Ogg, FLAC or WebM, named by
+                      its Content-Type if the header does not tell), ?language=
+                      to skip detection
+                      → {"text", "language", "timings"}
+    POST /speak       {"text", "language"} → audio/mpeg
+                      {"text", "language", "stream": true}
+                      → NDJSON stream of {"audio"} base64 MP3 segments in
+                        playback order, each sent once synthesized
+    POST /detect      {"text", "previous"?} → {"language"}
+    GET  /info        content and answer cache figures
+    GET  /health      liveness
+
+Every endpoint but /health spends the OpenAI key, so the service binds to
+127.0.0.1 by default. When ENGINE_TOKEN is set, requests must carry it as
+"Authorization: Bearer <token>" (RemoteEngineClient sends it from the same
+variable); set it before binding to another interface.
+
+Usage:
+    python service.py [--host 127.0.0.1] [--port 8000] [--workers 2]
+"""
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import hmac
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from engine import ChatEngine
+from pipeline import StageTimings
+
+
+def _error(message, status_code=400):
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+async def _json_body(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return None
+    return body if isinstance(body, dict) else None
+
+
+def _history(body):
+    """The request's earlier turns, or None unless they are a list of {"role", "content"} objects"""
+    history = body.get("history") or []
+    if not isinstance(history, list):
+        return None
+    for msg in history:
+        if not (isinstance(msg, dict) and isinstance(msg.get("role"), str) and isinstance(msg.get("content"), str)):
+            return None
+    return history
+
+
+def _authorized(handler):
+    """Reject requests without the ENGINE_TOKEN bearer token, when one is configured"""
+    async def check(request):
+        token = request.app.state.token
+        if token:
+            supplied = request.headers.get("Authorization", "")
+            if not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+                return _error("Missing or invalid engine token", status_code=401)
+        return await handler(request)
+    return check
+
+
+def _audio_event(segment):
+    return json.dumps({"audio": base64.b64encode(segment).decode("ascii")}) + "\n"
+
+
+async def chat(request):
+    body = await _json_body(request)
+    if not body or not str(body.get("message", "")).strip():
+        return _error("'message' is required")
+
+    engine = request.app.state.engine
+    message = body["message"]
+    history = _history(body)
+    if history is None:
+        return _error("'history' must be a list of {\"role\", \"content\"} objects")
+    previous = next((msg.get("language") for msg in reversed(history) if msg.get("language")), None)
+    language = body.get("language") or await asyncio.to_thread(engine.detect_language, message, previous)
+
+    async def events():
+        timings = StageTimings()
+        async for delta in engine.chat(message, language, history, timings):
+            yield json.dumps({"type": "delta", "text": delta}, ensure_ascii=False) + "\n"
+        query_type = await asyncio.to_thread(engine.classify, message)
+        yield json.dumps({
+            "type": "done",
+            "language": language,
+            "query_type": query_type,
+            "timings": timings.durations
+        }, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+async def transcribe(request):
+    audio_bytes = await request.body()
+    if not audio_bytes:
+        return _error("Request body must contain the recorded audio")
+
+    engine = request.app.state.engine
+    timings = StageTimings()
+    try:
+        text = await engine.transcribe(audio_bytes, timings, request.query_params.get("language"),
+                                       request.headers.get("Content-Type"))
+    except Exception as e:
+        return _error(str(e), status_code=502)
+    language = await asyncio.to_thread(engine.detect_language, text)
+    return JSONResponse({"text": text, "language": language, "timings": timings.durations})
+
+
+async def speak(request):
+    body = await _json_body(request)
+    if not body or not str(body.get("text", "")).strip():
+        return _error("'text' is required")
+
+    engine = request.app.state.engine
+    language = body.get("language", "English")
+    if not body.get("stream"):
+        try:
+            audio = await engine.speak(body["text"], language)
+        except Exception as e:
+            return _error(str(e), status_code=502)
+        return Response(audio, media_type="audio/mpeg")
+
+    # The first segment is awaited here, so a failing TTS call is still reported with an error status
+    segments = engine.speak_stream(body["text"], language)
+    try:
+        first_segment = await segments.__anext__()
+    except Exception as e:
+        await segments.aclose()
+        return _error(str(e) or "No speech to synthesize", status_code=502)
+
+    async def events():
+        yield _audio_event(first_segment)
+        async for segment in segments:
+            yield _audio_event(segment)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+async def detect(request):
+    body = await _json_body(request)
+    if not body or "text" not in body:
+        return _error("'text' is required")
+    engine = request.app.state.engine
+    language = await asyncio.to_thread(engine.detect_language, body["text"], body.get("previous"))
+    return JSONResponse({"language": language})
+
+
+async def info(request):
+    return JSONResponse(await asyncio.to_thread(request.app.state.engine.info))
+
+
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    load_dotenv()
+    if not os.getenv("OPENAI_API_KEY"):
+        raise RuntimeError("OPENAI_API_KEY is not set")
+    app.state.token = os.getenv("ENGINE_TOKEN")
+    # One engine per worker: knowledge base, index, client pool and caches are shared by all requests
+    app.state.engine = ChatEngine.from_env()
+    # Build the search index in the background so the first request does not pay for it
+    warm_index = asyncio.create_task(asyncio.to_thread(lambda: app.state.engine.search_index))
+    yield
+    await warm_index
+
+
+app = Starlette(
+    routes=[
+        Route("/chat", _authorized(chat), methods=["POST"]),
+        Route("/transcribe", _authorized(transcribe), methods=["POST"]),
+        Route("/speak", _authorized(speak), methods=["POST"]),
+        Route("/detect", _authorized(detect), methods=["POST"]),
+        Route("/info", _authorized(info)),
+        Route("/health", health)
+    ],
+    lifespan=lifespan
+)
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Meko Clinic chat engine service")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=1, help="Engine worker processes")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    if args.host not in ("127.0.0.1", "localhost", "::1") and not os.getenv("ENGINE_TOKEN"):
+        print(f"⚠️ Serving on {args.host} without ENGINE_TOKEN: anyone who can reach it can spend the OpenAI key",
+              file=sys.stderr)
+
+    uvicorn.run("service:app", host=args.host, port=args.port, workers=args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
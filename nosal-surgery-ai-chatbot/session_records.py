@@ -0,0 +1,129 @@
+"""
+Compact, bounded per-session state for the Meko Clinic chatbot.
+
+A kiosk session can stay open for days, so nothing kept per session grows
+with its age: conversation messages are slotted records (no per-message key
+dict) capped by ``MAX_SESSION_MESSAGES``, latencies live in fixed-size ring
+buffers of the last ``ANALYTICS_WINDOW`` samples that report p50/p95/p99,
+and query counts per language are a fixed array indexed by the supported
+languages.
+"""
+
+import os
+import sys
+from array import array
+
+from clinic_data import LANGUAGES
+
+MAX_SESSION_MESSAGES = int(os.getenv("MAX_SESSION_MESSAGES", 10))
+ANALYTICS_WINDOW = int(os.getenv("ANALYTICS_WINDOW", 256))
+
+# Fixed slot of each supported language in the per-language counts; anything else shares the last one
+LANGUAGE_SLOTS = {language: slot for slot, language in enumerate(LANGUAGES)}
+OTHER_LANGUAGE = "Other"
+
+MESSAGE_FIELDS = ("role", "content", "language", "input_type", "has_audio", "audio_path")
+
+
+class ChatMessage:
+    """One conversation message; reads like the message dicts the engine accepts"""
+
+    __slots__ = MESSAGE_FIELDS
+
+    def __init__(self, role, content, language=None, input_type=None, has_audio=False, audio_path=None):
+        self.role = sys.intern(role)
+        self.content = content
+        self.language = sys.intern(language) if language else None
+        self.input_type = sys.intern(input_type) if input_type else None
+        self.has_audio = has_audio
+        self.audio_path = audio_path
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if isinstance(key, str) else None
+        return default if value is None else value
+
+    def as_dict(self):
+        """Fields that are set, for exports"""
+        return {field: getattr(self, field) for field in MESSAGE_FIELDS if getattr(self, field) not in (None, False)}
+
+
+def cap_messages(messages, max_messages=MAX_SESSION_MESSAGES):
+    """Keep the first message (greeting) and the last max_messages-1 messages"""
+    if len(messages) > max_messages:
+        return [messages[0]] + messages[-(max_messages - 1):]
+    return messages
+
+
+class LatencyWindow:
+    """Ring buffer of the last ``capacity`` durations, in seconds"""
+
+    __slots__ = ("samples", "count")
+
+    def __init__(self, capacity=ANALYTICS_WINDOW):
+        self.samples = array("d", bytes(8 * capacity))
+        self.count = 0
+
+    def add(self, duration):
+        self.samples[self.count % len(self.samples)] = duration
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, len(self.samples))
+
+    def values(self):
+        return self.samples[:len(self)]
+
+    def mean(self):
+        return sum(self.values()) / len(self) if len(self) else None
+
+    def percentile(self, percent):
+        """Nearest-rank percentile of the window, or None when it is empty"""
+        if not len(self):
+            return None
+        ordered = sorted(self.values())
+        rank = max(1, -(-percent * len(ordered) // 100))
+        return ordered[int(rank) - 1]
+
+    def summary(self):
+        """p50, p95 and p99 of the window"""
+        return {f"p{percent}": self.percentile(percent) for percent in (50, 95, 99)}
+
+
+class SessionAnalytics:
+    """Query counters and latency windows of one session, constant in size however long it runs"""
+
+    __slots__ = ("total_queries", "clinic_queries", "general_queries", "voice_queries", "text_queries",
+                 "language_counts", "response_times", "first_token_times", "stage_times", "window")
+
+    def __init__(self, window=ANALYTICS_WINDOW):
+        self.total_queries = 0
+        self.clinic_queries = 0
+        self.general_queries = 0
+        self.voice_queries = 0
+        self.text_queries = 0
+        self.language_counts = array("L", bytes(array("L").itemsize * (len(LANGUAGE_SLOTS) + 1)))
+        self.response_times = LatencyWindow(window)
+        self.first_token_times = LatencyWindow(window)
+        # Keyed by the engine's fixed set of pipeline stage names
+        self.stage_times = {}
+        self.window = window
+
+    def record_language(self, language):
+        self.language_counts[LANGUAGE_SLOTS.get(language, len(LANGUAGE_SLOTS))] += 1
+
+    def languages_used(self):
+        """Query count of each language used so far"""
+        names = list(LANGUAGE_SLOTS) + [OTHER_LANGUAGE]
+        return {names[slot]: count for slot, count in enumerate(self.language_counts) if count}
+
+    def record_stage_times(self, durations):
+        for stage, duration in durations.items():
+            if stage not in self.stage_times:
+                self.stage_times[stage] = LatencyWindow(self.window)
+            self.stage_times[stage].add(duration)
@@ -0,0 +1,175 @@
+"""
+Text-to-speech helpers for the Meko Clinic chatbot.
+
+Shared by the app and the offline build commands so both produce identical
+clips (same text preparation, voice, speed and model) and therefore the same
+audio cache keys.
+
+Replies are spoken in segments: ``split_speech_segments`` breaks the text at
+sentence ends (Latin, Arabic, Urdu, Devanagari and CJK punctuation, line
+breaks, and the spaces Thai uses between sentences) and packs the sentences
+into a short first segment, so playback starts after one short TTS call, and
+longer ones after it. Segments are cached individually, so a sentence shared
+by several replies is synthesized once.
+"""
+
+import hashlib
+import json
+import os
+import re
+
+from audio_cache import speech_cache_key
+from clinic_data import LANGUAGES, QUICK_RESPONSES
+
+TTS_MODEL = "tts-1-hd"
+TTS_SPEED = 0.9
+MAX_SPEECH_LENGTH = 2000
+
+# The first segment is kept short to start playback early; later ones stay well under the 4096-character TTS limit
+FIRST_SEGMENT_CHARS = 60
+SEGMENT_CHARS = 400
+
+SENTENCE_BREAK = re.compile(
+    r"(?<=[.!?…])\s+"
+    r"|(?<=[。！？；])"
+    r"|(?<=[۔؟।॥])\s*"
+    r"|\s*\n\s*"
+    r"|(?<=[\u0E00-\u0E7F])\s+(?=[\u0E00-\u0E7F])"
+)
+CJK_CHAR = re.compile(r"[\u3000-\u30ff\u3400-\u9fff\uff00-\uffef]")
+
+DEFAULT_PRERENDERED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prerendered_audio")
+PRERENDERED_MANIFEST = "manifest.json"
+
+
+def voice_for_language(language):
+    return LANGUAGES.get(language, LANGUAGES["English"])["voice"]
+
+
+def prepare_speech_text(text, max_length=MAX_SPEECH_LENGTH):
+    """Truncate text if too long, but try to cut at sentence boundaries"""
+    if len(text) > max_length:
+        truncated = text[:max_length]
+        last_sentence = truncated.rfind('.')
+        if last_sentence > max_length * 0.8:
+            return truncated[:last_sentence + 1]
+        return truncated + "..."
+    return text
+
+
+def _split_long(sentence, max_chars):
+    """Pieces of at most max_chars, cut at the last space where there is one"""
+    pieces = []
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(" ", 0, max_chars + 1)
+        if cut <= max_chars // 2:
+            cut = max_chars
+        pieces.append(sentence[:cut].strip())
+        sentence = sentence[cut:].strip()
+    if sentence:
+        pieces.append(sentence)
+    return pieces
+
+
+def split_speech_segments(text, first_chars=FIRST_SEGMENT_CHARS, max_chars=SEGMENT_CHARS):
+    """Whole sentences of text packed into TTS segments: at least first_chars for the first, at most max_chars each"""
+    segments = []
+    current = ""
+    for sentence in SENTENCE_BREAK.split(text):
+        for piece in _split_long(sentence.strip(), max_chars):
+            if current and len(current) + 1 + len(piece) > max_chars:
+                segments.append(current)
+                current = ""
+            # Chinese and Japanese sentences follow each other without a space
+            separator = "" if not current or CJK_CHAR.match(current[-1]) and CJK_CHAR.match(piece[0]) else " "
+            current = f"{current}{separator}{piece}"
+            if not segments and len(current) >= first_chars:
+                segments.append(current)
+                current = ""
+    if current:
+        segments.append(current)
+    return segments
+
+
+def synthesize_bytes(client, text, voice, audio_cache, speed=TTS_SPEED, model=TTS_MODEL):
+    """MP3 bytes of text, calling TTS only on a cache miss"""
+    cache_key = speech_cache_key(text, voice, speed, model)
+    cached_path = audio_cache.get(cache_key)
+    if cached_path:
+        try:
+            with open(cached_path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            pass  # Evicted between the lookup and the read
+
+    response = client.audio.speech.create(
+        model=model,
+        voice=voice,
+        input=text,
+        speed=speed
+    )
+    audio_cache.put(cache_key, response.content)
+    return response.content
+
+
+def _text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def prerender_quick_responses(client, output_dir=DEFAULT_PRERENDERED_DIR, speed=TTS_SPEED, model=TTS_MODEL):
+    """Synthesize every quick response template in every voiced language and write a manifest"""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {"model": model, "speed": speed, "templates": {}}
+
+    for action, responses in QUICK_RESPONSES.items():
+        for language, text in responses.items():
+            if not LANGUAGES.get(language, {}).get("voice"):
+                continue
+            voice = LANGUAGES[language]["voice"]
+            filename = f"{action}_{LANGUAGES[language]['code']}.mp3"
+            speech_text = prepare_speech_text(text)
+
+            response = client.audio.speech.create(
+                model=model,
+                voice=voice,
+                input=speech_text,
+                speed=speed
+            )
+            with open(os.path.join(output_dir, filename), "wb") as f:
+                f.write(response.content)
+
+            manifest["templates"].setdefault(action, {})[language] = {
+                "file": filename,
+                "voice": voice,
+                "text_hash": _text_hash(text)
+            }
+            yield action, language, filename
+
+    with open(os.path.join(output_dir, PRERENDERED_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+
+def load_prerendered_audio(output_dir=DEFAULT_PRERENDERED_DIR, speed=TTS_SPEED, model=TTS_MODEL):
+    """Map (action, language) to the path of its prerendered clip, skipping stale entries"""
+    manifest_path = os.path.join(output_dir, PRERENDERED_MANIFEST)
+    if not os.path.exists(manifest_path):
+        return {}
+
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    # Clips rendered with another TTS model or speed would not match live playback: synthesize live instead
+    if manifest.get("model") != model or manifest.get("speed") != speed:
+        return {}
+
+    prerendered = {}
+    for action, languages in manifest.get("templates", {}).items():
+        for language, entry in languages.items():
+            text = QUICK_RESPONSES.get(action, {}).get(language)
+            path = os.path.join(output_dir, entry["file"])
+            # Templates edited since the last build are synthesized live instead
+            if (text is None or entry["text_hash"] != _text_hash(text)
+                    or entry["voice"] != voice_for_language(language) or not os.path.exists(path)):
+                continue
+            prerendered[(action, language)] = path
+    return prerendered
@@ -0,0 +1,129 @@
+"""
+Token counting for the Meko Clinic chatbot's prompt budgets.
+
+Counts come from the model's tiktoken encoding when it is available and fall
+back to a per-script estimate otherwise: Thai, CJK and Devanagari cost about
+a token per character, where English costs about a quarter of one, so a flat
+characters-divided-by-four rule undercounts exactly the languages most likely
+to overflow the context. Counts are memoized per text, so the precomputed
+content chunks are only tokenized once per process.
+
+Set ``TIKTOKEN_CACHE_DIR`` to a directory holding the encoding file to use
+exact counts on hosts without internet access.
+"""
+
+import math
+import re
+from functools import lru_cache
+
+from language_id import SCRIPTS, script_indices
+
+# Encoding of gpt-3.5-turbo and gpt-4
+ENCODING_NAME = "cl100k_base"
+
+# Estimated tokens per character of each script, rounded up so budgets err on the safe side
+SCRIPT_TOKEN_RATES = {
+    "other": 0.3,
+    "latin": 0.25,
+    "arabic": 0.6,
+    "thai": 1.0,
+    "devanagari": 1.0,
+    "han": 1.2,
+    "kana": 1.0,
+    "hangul": 1.0,
+    "cyrillic": 0.5
+}
+
+WORD_RE = re.compile(r"\S+")
+
+# Chat format overhead: every message is wrapped in role markers, and the reply is primed
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """The tiktoken encoding, or None when tiktoken or its encoding file is unavailable"""
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(ENCODING_NAME)
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=1)
+def token_rate_table():
+    """SCRIPT_TOKEN_RATES as an array indexed like SCRIPTS, built on first use so numpy stays off startup"""
+    import numpy as np
+
+    return np.array([SCRIPT_TOKEN_RATES[script] for script in SCRIPTS])
+
+
+def _character_costs(text):
+    """Estimated token cost of each character of text"""
+    return token_rate_table()[script_indices(text)]
+
+
+def estimate_tokens(text):
+    """Per-script token estimate, for when the encoding is unavailable"""
+    return math.ceil(_character_costs(text).sum()) if text else 0
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text):
+    """Number of tokens in text"""
+    encoding = get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages):
+    """Prompt tokens of a chat completion request with these messages"""
+    return sum(TOKENS_PER_MESSAGE + count_tokens(msg["content"]) for msg in messages) + TOKENS_PER_REPLY
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Longest prefix of text that fits in max_tokens"""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    encoding = get_encoding()
+    if encoding is None:
+        import numpy as np
+
+        # The first character whose running cost exceeds the budget ends the prefix
+        cumulative_costs = np.cumsum(_character_costs(text))
+        return text[:int(np.searchsorted(cumulative_costs, max_tokens, side="right"))]
+
+    # Drop any multi-byte character cut in half at the boundary
+    token_bytes = encoding.decode_bytes(encoding.encode(text, disallowed_special=())[:max_tokens])
+    return token_bytes.decode("utf-8", errors="ignore")
+
+
+def truncate_to_words(text, max_tokens):
+    """Longest prefix of whole words of text that fits in max_tokens
+
+    The text is tokenized once; the token count of every word-end prefix comes
+    from a prefix sum over token or character positions, and a binary search
+    finds the last word that fits.
+    """
+    import numpy as np
+
+    word_ends = np.array([match.end() for match in WORD_RE.finditer(text)], dtype=np.int64)
+    if max_tokens <= 0 or not len(word_ends):
+        return ""
+
+    encoding = get_encoding()
+    if encoding is None:
+        prefix_tokens = np.cumsum(_character_costs(text))[word_ends - 1]
+    else:
+        _, token_starts = encoding.decode_with_offsets(encoding.encode(text, disallowed_special=()))
+        # Tokens of a prefix are the ones starting before its end
+        prefix_tokens = np.searchsorted(token_starts, word_ends)
+
+    fitting_words = int(np.searchsorted(prefix_tokens, max_tokens, side="right"))
+    return text[:word_ends[fitting_words - 1]] if fitting_words else ""